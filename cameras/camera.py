@@ -12,7 +12,11 @@ class Camera(ABC):
     - capture_frame
 
     This allows for a consistent interface for all camera classes.
+
+    Cameras whose capture_frame returns a (color, depth) pair set `provides_depth` to True.
     """
+    provides_depth = False
+
     @abstractmethod
     def start_camera(self):
         pass
@@ -28,6 +32,7 @@ class Camera(ABC):
 
         Returns:
             For RGB cameras: np.ndarray (the frame)
-            For depth cameras: Tuple[np.ndarray, np.ndarray] (color frame, depth frame)
+            For depth cameras: Tuple[np.ndarray, np.ndarray] (color frame, depth frame), or a
+            Frame (see frame.py) that unpacks the same way and carries the capture metadata
         """
         pass
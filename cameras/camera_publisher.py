@@ -1,48 +1,290 @@
 import time
-from collections import deque
+from collections import deque, namedtuple
 import threading
 from typing import Type, Union, Callable, List
 import cv2
 import numpy as np
 from hi_robotics.vision_ai import Camera
 from hi_robotics.network_utils.mqtt_comms import MQTTServer
+from RAIT.cameras import frame_protocol
+from RAIT.cameras.frame import Frame
+from RAIT.cameras.shared_frame_bus import SharedFrameBus
+
+
+QueuedImage = namedtuple("QueuedImage", ["sequence", "timestamp", "image"])
+
+
+def retain_images(images):
+    """
+    Takes a lease on pooled frames (see frame_pool.py), other images are left alone.
+    """
+    if isinstance(images, Frame):
+        images.retain()
+    return images
+
+
+def release_images(images):
+    if isinstance(images, Frame):
+        images.release()
 
 
 class ImageQueue:
+    """
+    Fixed-size ring of the most recent images. Every image gets a monotonically increasing sequence
+    number and a capture timestamp, so consumers can wait for the next unseen frame and look frames
+    up by time. Index 0 is always the newest image.
+
+    The queue holds a lease on pooled frames while they are stored. Consumers that keep an image after
+    it may have been overwritten pass lease=True to get_image/wait_for_next and release it when done.
+    """
     def __init__(self, max_size: int = 3):
         self.max_size = max_size
-        self.queue = deque()
+        self._images = [None] * max_size
+        self._sequences = [0] * max_size
+        self._timestamps = [0.0] * max_size
+        self.latest_sequence = 0
         self.lock = threading.Lock()
         self.condition = threading.Condition(self.lock)
 
     def __len__(self):
         with self.lock:
-            return len(self.queue)
+            return min(self.latest_sequence, self.max_size)
 
-    def put_image(self, image):
+    def _entry(self, sequence):
+        slot = sequence % self.max_size
+        if sequence <= 0 or self._sequences[slot] != sequence:
+            return None
+        return QueuedImage(sequence, self._timestamps[slot], self._images[slot])
+
+    def put_image(self, image, timestamp: float = None) -> int:
         with self.condition:
-            if len(self.queue) == self.max_size:
-                self.queue.pop()
-            self.queue.appendleft(image)
+            sequence = self.latest_sequence + 1
+            slot = sequence % self.max_size
+            release_images(self._images[slot])
+            self._images[slot] = retain_images(image)
+            self._sequences[slot] = sequence
+            self._timestamps[slot] = time.time() if timestamp is None else timestamp
+            self.latest_sequence = sequence
             self.condition.notify_all()  # Notify any waiting threads that a new image is available
+            return sequence
 
-    def get_image(self):
+    def get_image(self, lease: bool = False):
         with self.condition:
-            while len(self.queue) == 0:
+            while self.latest_sequence == 0:
                 self.condition.wait()  # Wait until there is an image available in the queue
-            return self.queue[0]
+            image = self._images[self.latest_sequence % self.max_size]
+            return retain_images(image) if lease else image
 
     def get_by_index(self, index):
         with self.lock:
-            return self.queue[index]
+            length = min(self.latest_sequence, self.max_size)
+            if index < 0:
+                index += length
+            if not 0 <= index < length:
+                raise IndexError("ImageQueue index out of range")
+            return self._images[(self.latest_sequence - index) % self.max_size]
 
     def get_length(self):
-        with self.lock:
-            return len(self.queue)
+        return len(self)
 
     def get_all_images(self):
         with self.lock:
-            return list(self.queue)
+            oldest = max(1, self.latest_sequence - self.max_size + 1)
+            return [self._images[sequence % self.max_size] for sequence in range(self.latest_sequence, oldest - 1, -1)]
+
+    def wait_for_next(self, after_sequence: int, timeout: float = None, latest: bool = False, lease: bool = False):
+        """
+        Blocks until an image newer than `after_sequence` is available.
+
+        :param after_sequence: int, Sequence number of the last image the consumer processed (0 for none).
+        :param timeout: float, Maximum time to wait in seconds, None waits forever.
+        :param latest: bool, Return the newest image instead of the next one in order.
+        :param lease: bool, Take a lease on a pooled image, which the caller must release.
+        :return: QueuedImage(sequence, timestamp, image), or None on timeout. When the consumer fell
+                 behind further than the queue size, the oldest image still held is returned.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.latest_sequence > after_sequence, timeout):
+                return None
+            if latest:
+                entry = self._entry(self.latest_sequence)
+            else:
+                oldest = max(1, self.latest_sequence - self.max_size + 1)
+                entry = self._entry(max(after_sequence + 1, oldest))
+            if lease and entry is not None:
+                retain_images(entry.image)
+            return entry
+
+    def get_closest(self, timestamp: float, lease: bool = False):
+        """
+        Returns the held image whose capture timestamp is closest to `timestamp`, e.g. the frame
+        matching a robot event time.
+
+        :param timestamp: float, Time in seconds since the epoch.
+        :param lease: bool, Take a lease on a pooled image, which the caller must release.
+        :return: QueuedImage or None if the queue is empty.
+        """
+        with self.lock:
+            if self.latest_sequence == 0:
+                return None
+            low = max(1, self.latest_sequence - self.max_size + 1)
+            high = self.latest_sequence
+            # Timestamps increase with the sequence number, so binary search the held range
+            while low < high:
+                middle = (low + high) // 2
+                if self._timestamps[middle % self.max_size] < timestamp:
+                    low = middle + 1
+                else:
+                    high = middle
+            candidates = [entry for entry in (self._entry(low - 1), self._entry(low)) if entry is not None]
+            entry = min(candidates, key=lambda entry: abs(entry.timestamp - timestamp))
+            if lease:
+                retain_images(entry.image)
+            return entry
+
+    def snapshot(self):
+        """
+        Returns a view of the images currently held without copying them. Entries overwritten after
+        the snapshot was taken are skipped when iterating.
+
+        :return: ImageQueueSnapshot
+        """
+        with self.lock:
+            oldest = max(1, self.latest_sequence - self.max_size + 1)
+            return ImageQueueSnapshot(self, oldest, self.latest_sequence)
+
+
+class ImageQueueSnapshot:
+    """
+    Sequence range of an ImageQueue, resolved lazily against the live ring. Iterates newest first.
+    """
+    def __init__(self, queue: ImageQueue, first_sequence: int, last_sequence: int):
+        self.queue = queue
+        self.first_sequence = first_sequence
+        self.last_sequence = last_sequence
+
+    def __len__(self):
+        return max(0, self.last_sequence - self.first_sequence + 1)
+
+    def get(self, sequence: int):
+        """
+        Returns the QueuedImage with the given sequence number, or None if it is outside the snapshot
+        or has been overwritten since.
+        """
+        if not self.first_sequence <= sequence <= self.last_sequence:
+            return None
+        with self.queue.lock:
+            return self.queue._entry(sequence)
+
+    def __iter__(self):
+        for sequence in range(self.last_sequence, self.first_sequence - 1, -1):
+            entry = self.get(sequence)
+            if entry is not None:
+                yield entry
+
+
+class Subscriber:
+    """
+    Delivers frames to one subscriber callback on its own worker thread through a bounded queue,
+    so a slow or failing callback cannot stall the capture loop.
+
+    Overflow policies when the queue is full:
+        - drop_oldest: discard the oldest pending frame (the callback always sees recent frames).
+        - drop_newest: discard the incoming frame (the callback sees a contiguous backlog).
+        - block: make the capture thread wait for space (lossless, but couples capture to the callback).
+    """
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    def __init__(self, callback: Callable, image_queue: ImageQueue, max_pending: int = 2,
+                 overflow: str = "drop_oldest"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {self.OVERFLOW_POLICIES}.")
+        self.callback = callback
+        self.image_queue = image_queue
+        self.max_pending = max(1, max_pending)
+        self.overflow = overflow
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.worker = None
+        self.last_sequence = 0
+        self.stats = {"delivered": 0, "dropped": 0, "errors": 0, "lag": 0, "max_lag": 0, "callback_ms": 0.0}
+
+    @property
+    def name(self):
+        return getattr(self.callback, "__qualname__", repr(self.callback))
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.worker = threading.Thread(target=self._run, name=f"subscriber-{self.name}", daemon=True)
+        self.worker.start()
+
+    def stop(self, timeout: float = 1.0):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.worker is not None and self.worker is not threading.current_thread():
+            self.worker.join(timeout)
+        self.worker = None
+        with self.condition:
+            while self.pending:
+                release_images(self.pending.popleft()[1])
+
+    def offer(self, sequence: int, images):
+        """
+        Queues a frame for the callback, applying the overflow policy when the queue is full. Pooled
+        frames are leased until the callback returns or the frame is dropped.
+
+        :param sequence: int, Sequence number of the frame in the image queue.
+        :param images: The images returned by camera.capture_frame().
+        """
+        with self.condition:
+            if len(self.pending) >= self.max_pending:
+                if self.overflow == "drop_oldest":
+                    release_images(self.pending.popleft()[1])
+                    self.stats["dropped"] += 1
+                elif self.overflow == "drop_newest":
+                    self.stats["dropped"] += 1
+                    return
+                else:
+                    while self.running and len(self.pending) >= self.max_pending:
+                        self.condition.wait(0.1)
+                    if not self.running:
+                        return
+            self.pending.append((sequence, retain_images(images)))
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                sequence, images = self.pending.popleft()
+                self.condition.notify_all()  # Wake a capture thread blocked on a full queue
+
+            lag = self.image_queue.latest_sequence - sequence
+            self.stats["lag"] = lag
+            self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+            start = time.perf_counter()
+            try:
+                self.callback(images, self.image_queue)
+                self.stats["delivered"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Error in subscriber {self.name}: {e}")
+            finally:
+                release_images(images)
+            self.stats["callback_ms"] = (time.perf_counter() - start) * 1000
+            self.last_sequence = sequence
+
+    def get_stats(self):
+        with self.condition:
+            return {**self.stats, "pending": len(self.pending), "overflow": self.overflow}
 
 
 class CameraPublisher:
@@ -52,15 +294,42 @@ class CameraPublisher:
                  host: str = "",
                  topic_name: str = None,
                  start_publisher: bool = False,
-                 debug=False):
+                 debug=False,
+                 color_codec: str = "jpeg",
+                 depth_codec: str = "raw",
+                 jpeg_quality: int = 90,
+                 shared_bus_name: str = None,
+                 shared_bus_slots: int = 4,
+                 mqtt_mode: str = "raw",
+                 mqtt_depth_decimation: int = 1):
         self.camera = camera
+        # Cameras that return (color, depth) pairs declare it; RealSense cameras built on older base classes are recognised by name
+        self.provides_depth = getattr(camera, "provides_depth", camera.__class__.__name__ == 'IntelRealSenseCamera')
+        # Cameras with a frame pool hand out leased frames on request, the publisher releases them after distributing
+        self.leased_capture = getattr(camera, "supports_frame_leases", False)
         self.image_queue = ImageQueue(queue_size)
-        self.subscribers: List[Callable] = []
+        self.subscribers: List[Subscriber] = []
         self.publisher_thread = None
         self.opened_publisher = False
         self.debug_mode = debug
+        self.frame_count = 0
+
+        # Codecs used when frames are encoded with the binary frame protocol
+        self.color_codec = color_codec
+        self.depth_codec = depth_codec
+        self.jpeg_quality = jpeg_quality
 
-        # Optional MQTT server setup
+        # Optional shared-memory frame bus for consumers in other processes, created on the first frame
+        self.shared_bus_name = shared_bus_name
+        self.shared_bus_slots = shared_bus_slots
+        self.shared_bus = None
+
+        # Optional MQTT server setup. 'raw' publishes color and depth buffers as two messages (legacy),
+        # 'packed' publishes one binary frame protocol message per frame, see frame_protocol.decode_packed_message
+        if mqtt_mode not in ("raw", "packed"):
+            raise ValueError(f"Unknown MQTT mode '{mqtt_mode}', expected 'raw' or 'packed'.")
+        self.mqtt_mode = mqtt_mode
+        self.mqtt_depth_decimation = max(1, int(mqtt_depth_decimation))
         self.mqtt_server = None
         if topic_name:
             self.mqtt_server = MQTTServer(server=host, topic_name=topic_name)
@@ -69,29 +338,75 @@ class CameraPublisher:
             self.start_publisher()
             self.wait_until_ready()  # Ensure the queue has frames before consumers access it
 
-    def subscribe(self, callback: Callable):
-        self.subscribers.append(callback)
+    @classmethod
+    def from_config(cls, camera: Type[Camera], config: dict, **kwargs) -> "CameraPublisher":
+        """
+        Creates a publisher that encodes frames with the settings of the config's Stream section, the
+        section CameraReceiver reads, so both ends of a stream are configured in one place.
+
+        :param camera: Camera, The camera to publish.
+        :param config: dict, The loaded config.yaml.
+        :param kwargs: Further CameraPublisher arguments, they take precedence over the config.
+        :return: CameraPublisher, The publisher.
+        """
+        stream_config = config.get("Stream", {})
+        kwargs.setdefault("depth_codec", stream_config.get("Depth_codec", "raw"))
+        return cls(camera, **kwargs)
+
+    def subscribe(self, callback: Callable, max_pending: int = 2, overflow: str = "drop_oldest") -> Subscriber:
+        """
+        Registers a callback(images, image_queue) that is called on its own worker thread for every frame.
+
+        :param callback: Callable, The subscriber callback.
+        :param max_pending: int, Frames buffered for the callback before the overflow policy applies.
+        :param overflow: str, One of 'drop_oldest', 'drop_newest' or 'block', see Subscriber.
+        :return: Subscriber, Handle exposing the subscriber's stats.
+        """
+        subscriber = Subscriber(callback, self.image_queue, max_pending=max_pending, overflow=overflow)
+        self.subscribers.append(subscriber)
+        if self.opened_publisher:
+            subscriber.start()
+        return subscriber
 
     def unsubscribe(self, callback: Callable):
-        self.subscribers.remove(callback)
+        for subscriber in [s for s in self.subscribers if s.callback == callback or s is callback]:
+            subscriber.stop()
+            self.subscribers.remove(subscriber)
+
+    def notify_subscribers(self, images, sequence: int = None):
+        sequence = self.frame_count if sequence is None else sequence
+        for subscriber in list(self.subscribers):
+            subscriber.offer(sequence, images)
 
-    def notify_subscribers(self, images):
-        for subscriber in self.subscribers:
-            subscriber(images, self.image_queue)
+    def get_subscriber_stats(self):
+        """
+        Returns delivered/dropped/error counts, current and maximum lag in frames, and the duration of
+        the last callback for every subscriber.
+        """
+        stats = {}
+        for index, subscriber in enumerate(self.subscribers):
+            name = subscriber.name if subscriber.name not in stats else f"{subscriber.name}#{index}"
+            stats[name] = subscriber.get_stats()
+        return stats
 
     def start_publisher(self):
         if not self.opened_publisher:
             self.opened_publisher = True
+            for subscriber in self.subscribers:
+                subscriber.start()
             self.publisher_thread = threading.Thread(target=self.publish_frames, daemon=True)
             self.publisher_thread.start()
 
     def publish_frames(self):
         while self.opened_publisher:
+            images = None
             try:
-                images = self.camera.capture_frame()
+                images = self.camera.capture_frame(lease=True) if self.leased_capture else self.camera.capture_frame()
                 if images is not None:
-                    self.image_queue.put_image(images)
-                    self.notify_subscribers(images)
+                    self.frame_count = self.image_queue.put_image(images, timestamp=getattr(images, "timestamp", None))
+                    if self.shared_bus_name:
+                        self.write_to_shared_bus(images)
+                    self.notify_subscribers(images, self.frame_count)
 
                     # Optionally, publish via MQTT
                     if self.mqtt_server:
@@ -108,10 +423,15 @@ class CameraPublisher:
                     import traceback
                     traceback.print_exc()
                 break
+            finally:
+                # The queue and the subscribers hold their own leases, give back the capture lease
+                release_images(images)
 
     def publish_via_mqtt(self, images):
         try:
-            if self.camera.__class__.__name__ == 'IntelRealSenseCamera':
+            if self.mqtt_mode == "packed":
+                self.mqtt_server.publish(self.encode_frame(images, depth_decimation=self.mqtt_depth_decimation))
+            elif self.provides_depth:
                 self.mqtt_server.publish(images[0].tobytes())
                 self.mqtt_server.publish(images[1].tobytes(), topic_name=self.mqtt_server.topic_name + "_depth")
             else:
@@ -125,11 +445,76 @@ class CameraPublisher:
                 import traceback
                 traceback.print_exc()
 
+    def split_images(self, images):
+        """
+        Splits the output of camera.capture_frame() into color and depth.
+
+        :param images: The images returned by camera.capture_frame().
+        :return: Tuple[np.ndarray, Optional[np.ndarray]], The color image and the depth image or None.
+        """
+        if self.provides_depth:
+            return images[0], images[1]
+        return images, None
+
+    def encode_frame(self, images, depth_codec: str = None, depth_decimation: int = 1, sequence: int = None) -> bytes:
+        """
+        Encodes captured images into a binary frame protocol message (see frame_protocol.py).
+
+        :param images: The images returned by camera.capture_frame().
+        :param depth_codec: Overrides the publisher's depth codec, e.g. the one a client asked for.
+        :param depth_decimation: int, Keep every n-th depth pixel in both directions. The factor is
+                                 written to the message metadata as 'depth_decimation'.
+        :param sequence: int, Sequence number written to the header. Defaults to the sequence of the Frame,
+                         or to the publisher's frame count for cameras that return plain images. Subscribers
+                         may run behind the capture thread, so the frame count is only right on that thread.
+        :return: bytes, The encoded message.
+        """
+        color, depth = self.split_images(images)
+        # Frames from cameras that return a Frame (see frame.py) keep their capture time and metadata
+        metadata = images.to_metadata() if isinstance(images, Frame) else {}
+        if depth is not None and depth_decimation > 1:
+            depth = depth[::depth_decimation, ::depth_decimation]
+            metadata["depth_decimation"] = depth_decimation
+        return frame_protocol.encode_frame(color, depth, timestamp=getattr(images, "timestamp", None),
+                                           sequence=sequence if sequence is not None else getattr(images, "sequence", self.frame_count),
+                                           color_codec=self.color_codec,
+                                           depth_codec=depth_codec or self.depth_codec,
+                                           jpeg_quality=self.jpeg_quality, metadata=metadata or None)
+
+    def write_to_shared_bus(self, images):
+        """
+        Copies the captured images into the shared-memory frame bus. Reader processes attach with
+        SharedFrameBus.attach(shared_bus_name). When the resolution or dtype changes, or depth appears
+        or disappears, the bus is created again under the same name and readers have to attach again.
+
+        :param images: The images returned by camera.capture_frame().
+        """
+        color, depth = self.split_images(images)
+
+        if self.shared_bus is not None and not self.shared_bus.matches(color, depth):
+            if self.debug_mode:
+                print(f"Frame layout changed, recreating shared frame bus '{self.shared_bus_name}'.")
+            self.shared_bus.close()
+            self.shared_bus = None
+        if self.shared_bus is None:
+            self.shared_bus = SharedFrameBus.create(self.shared_bus_name, color.shape,
+                                                    None if depth is None else depth.shape,
+                                                    slots=self.shared_bus_slots, color_dtype=color.dtype,
+                                                    depth_dtype=np.uint16 if depth is None else depth.dtype)
+            if self.debug_mode:
+                print(f"Created shared frame bus '{self.shared_bus_name}' with {self.shared_bus_slots} slots.")
+        self.shared_bus.write(color, depth, timestamp=getattr(images, "timestamp", None))
+
     def stop_publisher(self):
         if self.opened_publisher:
             self.opened_publisher = False
             if self.publisher_thread is not None:
                 self.publisher_thread.join()
+            for subscriber in self.subscribers:
+                subscriber.stop()
+            if self.shared_bus is not None:
+                self.shared_bus.close()
+                self.shared_bus = None
             print("Checking Camera Class.")
             if self.camera.__class__.__name__ == 'IntelRealSenseCamera':
 
@@ -160,21 +545,25 @@ class CameraPublisher:
     def show_stream(self, window_name='Stream', color=True, depth=False):
         while self.opened_publisher:
             try:
-                # This will now block until there is an image in the queue
-                image = self.image_queue.get_image()
-                if self.camera.__class__.__name__ == 'IntelRealSenseCamera':
-                    if color and not depth:
-                        cv2.imshow(window_name, image[0])
-                    elif depth and not color:
-                        cv2.imshow(window_name, image[1])
-                    elif color and depth:
-                        color_image = image[0]
-                        depth_image = image[1]
-                        depth_image_3ch = np.stack((depth_image, depth_image, depth_image), axis=-1)
-                        combined_image = np.concatenate((color_image, depth_image_3ch), axis=1)
-                        cv2.imshow(window_name, combined_image)
-                else:
-                    cv2.imshow(window_name, image)
+                # This will now block until there is an image in the queue. The lease keeps a pooled
+                # frame from being recycled while it is drawn.
+                image = self.image_queue.get_image(lease=True)
+                try:
+                    if self.provides_depth:
+                        if color and not depth:
+                            cv2.imshow(window_name, image[0])
+                        elif depth and not color:
+                            cv2.imshow(window_name, image[1])
+                        elif color and depth:
+                            color_image = image[0]
+                            depth_image = image[1]
+                            depth_image_3ch = np.stack((depth_image, depth_image, depth_image), axis=-1)
+                            combined_image = np.concatenate((color_image, depth_image_3ch), axis=1)
+                            cv2.imshow(window_name, combined_image)
+                    else:
+                        cv2.imshow(window_name, image)
+                finally:
+                    release_images(image)
 
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     cv2.destroyWindow(window_name)
@@ -185,4 +574,4 @@ class CameraPublisher:
                 if self.debug_mode:
                     import traceback
                     traceback.print_exc()
-                break
\ No newline at end of file
+                break
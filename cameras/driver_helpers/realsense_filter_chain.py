@@ -0,0 +1,190 @@
+import pyrealsense2 as rs
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from RAIT.cameras.exceptions import IntelRealSenseCameraException
+
+# Filter name -> factory. The disparity pair brackets the spatial and temporal filters, which work
+# better on disparity than on depth.
+FILTERS = {
+    "decimation": rs.decimation_filter,
+    "threshold": rs.threshold_filter,
+    "depth_to_disparity": lambda: rs.disparity_transform(True),
+    "spatial": rs.spatial_filter,
+    "temporal": rs.temporal_filter,
+    "disparity_to_depth": lambda: rs.disparity_transform(False),
+    "hole_filling": rs.hole_filling_filter,
+}
+
+DISPARITY_PAIR = ("depth_to_disparity", "disparity_to_depth")
+
+
+class FilterStage:
+    """
+    One post-processing filter of the chain with its timing.
+
+    :param name: str, Filter name, one of FILTERS.
+    :param enabled: bool, Whether the filter runs.
+    :param options: Dict[str, float], rs.option names (e.g. 'filter_magnitude', 'holes_fill') and values.
+    """
+    def __init__(self, name: str, enabled: bool = True, options: Optional[Dict[str, float]] = None):
+        if name not in FILTERS:
+            raise IntelRealSenseCameraException(f"Invalid filter: {name}. Must be one of {list(FILTERS)}.")
+        self.name = name
+        self.enabled = enabled
+        self.filter = FILTERS[name]()
+        self.options = {}
+        for option, value in (options or {}).items():
+            self.set_option(option, value)
+        self.reset_stats()
+
+    def __repr__(self):
+        return f'FilterStage(name={self.name}, enabled={self.enabled}, options={self.options})'
+
+    def set_option(self, option: str, value: float) -> None:
+        """
+        Sets a filter option.
+
+        :param option: str, The rs.option name, e.g. 'filter_smooth_alpha'.
+        :param value: float, The value to set.
+        """
+        if not hasattr(rs.option, option):
+            raise IntelRealSenseCameraException(f"Invalid option for filter {self.name}: {option}.")
+        self.filter.set_option(getattr(rs.option, option), value)
+        self.options[option] = value
+
+    def reset_stats(self) -> None:
+        self.stats = {"calls": 0, "last_ms": 0.0, "total_ms": 0.0, "max_ms": 0.0}
+
+    def process(self, frame):
+        start = time.perf_counter()
+        frame = self.filter.process(frame)
+        milliseconds = (time.perf_counter() - start) * 1000
+        self.stats["calls"] += 1
+        self.stats["last_ms"] = milliseconds
+        self.stats["total_ms"] += milliseconds
+        self.stats["max_ms"] = max(self.stats["max_ms"], milliseconds)
+        return frame
+
+
+class RealSenseFilterChain:
+    """
+    Declarative depth post-processing chain (decimation, threshold, spatial, temporal, hole filling and
+    the disparity transform) applied to framesets before alignment, with per-filter timing and filters
+    that can be switched on and off while streaming.
+
+    The chain is built from the `Camera: <model>: Post_Processing` section of config.yaml:
+
+        Post_Processing:
+          Filters:
+            - Name: threshold
+              Options: {min_distance: 0.15, max_distance: 2.0}
+            - Name: spatial
+              Options: {filter_smooth_alpha: 0.5, filter_smooth_delta: 20}
+            - Name: hole_filling
+              Enabled: false
+
+    Filters run in the order listed; librealsense recommends decimation, threshold, depth_to_disparity,
+    spatial, temporal, disparity_to_depth, hole_filling. Disabling one of the disparity pair disables both.
+
+    :param stages: List[FilterStage], The filters in processing order.
+    """
+    def __init__(self, stages: List[FilterStage]):
+        self.stages = stages
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "last_ms": 0.0, "total_ms": 0.0, "max_ms": 0.0}
+
+    def __repr__(self):
+        return f'RealSenseFilterChain({[stage.name for stage in self.stages]})'
+
+    @classmethod
+    def from_config(cls, config: Union[Dict, List]) -> "RealSenseFilterChain":
+        """
+        Builds the chain from a Post_Processing config section.
+
+        :param config: Union[Dict, List], The section, or its list of filters. Entries are filter names or
+                       dicts with Name, Enabled and Options keys.
+        :return: RealSenseFilterChain, The chain.
+        """
+        entries = config.get("Filters", []) if isinstance(config, dict) else config
+        stages = []
+        for entry in entries or []:
+            if isinstance(entry, str):
+                entry = {"Name": entry}
+            stages.append(FilterStage(entry["Name"], entry.get("Enabled", True), entry.get("Options")))
+        return cls(stages)
+
+    def get_stage(self, name: str) -> FilterStage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise IntelRealSenseCameraException(f"Filter {name} is not part of the chain {[stage.name for stage in self.stages]}.")
+
+    def has_stage(self, name: str) -> bool:
+        return any(stage.name == name for stage in self.stages)
+
+    def set_enabled(self, name: str, enabled: bool) -> None:
+        """
+        Turns a filter on or off, effective from the next frame.
+
+        :param name: str, The filter name.
+        :param enabled: bool, Whether the filter runs.
+        """
+        names = DISPARITY_PAIR if name in DISPARITY_PAIR else (name,)
+        stages = [stage for stage in self.stages if stage.name in names] or [self.get_stage(name)]
+        with self.lock:
+            for stage in stages:
+                stage.enabled = enabled
+
+    def set_option(self, name: str, option: str, value: float) -> None:
+        """
+        Sets an option of a filter in the chain.
+
+        :param name: str, The filter name.
+        :param option: str, The rs.option name.
+        :param value: float, The value to set.
+        """
+        stage = self.get_stage(name)
+        with self.lock:
+            stage.set_option(option, value)
+
+    def process(self, frames):
+        """
+        Runs the enabled filters on a frameset or depth frame.
+
+        :param frames: rs.frame, The frameset or depth frame.
+        :return: rs.frame, The filtered frame. Call as_frameset() on it when a frameset went in.
+        """
+        start = time.perf_counter()
+        with self.lock:
+            for stage in self.stages:
+                if stage.enabled:
+                    frames = stage.process(frames)
+        milliseconds = (time.perf_counter() - start) * 1000
+        self.stats["calls"] += 1
+        self.stats["last_ms"] = milliseconds
+        self.stats["total_ms"] += milliseconds
+        self.stats["max_ms"] = max(self.stats["max_ms"], milliseconds)
+        return frames
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the timing of the whole chain and of every filter.
+
+        :return: Dict[str, Dict[str, float]], Per filter: enabled, calls, last_ms, mean_ms and max_ms, and the chain total under 'chain'.
+        """
+        def summary(stats):
+            return {"calls": stats["calls"], "last_ms": stats["last_ms"],
+                    "mean_ms": stats["total_ms"] / max(stats["calls"], 1), "max_ms": stats["max_ms"]}
+
+        with self.lock:
+            result = {stage.name: {"enabled": stage.enabled, **summary(stage.stats)} for stage in self.stages}
+            result["chain"] = summary(self.stats)
+        return result
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            for stage in self.stages:
+                stage.reset_stats()
+            self.stats = {"calls": 0, "last_ms": 0.0, "total_ms": 0.0, "max_ms": 0.0}
@@ -1,4 +1,5 @@
 import pyrealsense2 as rs
+import time
 from enum import Enum
 from typing import Union, Dict
 
@@ -28,12 +29,35 @@ class RealSenseSettingsHelper:
     """
     Helper class for changing and retrieving camera settings.
 
+    Option ranges are read from the sensor once, when the helper is created, so validating and setting
+    values does not query the device for the range every time. Named settings profiles are validated
+    in memory and applied as one batch, see apply_profile.
+
     :param sensor: pyrealsense2.sensor, The sensor object.
     :param settings: Union[Enum, CameraColorSensorSettings, CameraDepthSensorSettings], The settings to use depending on the sensor type (Color or Depth sensors).
     """
     def __init__ (self, sensor: rs.sensor, settings: Union[CameraColorSensorSettings, CameraDepthSensorSettings]):
         self.settings = settings
         self.sensor = sensor
+        # rs.option -> rs.option_range, and the last value read or written for every cached option
+        self.option_ranges = {}
+        self.option_values = {}
+        for setting in settings:
+            if sensor.supports(setting.value):
+                self.option_ranges[setting.value] = sensor.get_option_range(setting.value)
+                self.option_values[setting.value] = sensor.get_option(setting.value)
+
+    def get_option_range(self, setting: Union[str, CameraColorSensorSettings, CameraDepthSensorSettings]):
+        """
+        Returns the cached range of a setting, reading it from the sensor the first time it is needed.
+
+        :param setting: Union[str, CameraColorSensorSettings, CameraDepthSensorSettings], The setting.
+        :return: rs.option_range, The min, max, step and default of the setting.
+        """
+        option = self._validate_input(setting).value
+        if option not in self.option_ranges:
+            self.option_ranges[option] = self.sensor.get_option_range(option)
+        return self.option_ranges[option]
 
     def _validate_input(self, setting: Union[str, CameraColorSensorSettings, CameraDepthSensorSettings]) -> Union[CameraColorSensorSettings, CameraDepthSensorSettings]:
         """
@@ -84,7 +108,8 @@ class RealSenseSettingsHelper:
         setting = self._validate_input(setting_name).value
         
         current_value = self.sensor.get_option(setting)
-        range = self.sensor.get_option_range(setting)
+        self.option_values[setting] = current_value
+        range = self.get_option_range(setting_name)
 
         camera_setting_values.update({
             'current_value': current_value,
@@ -106,9 +131,24 @@ class RealSenseSettingsHelper:
         :param percentage: bool, Whether the value is a percentage. Defaults to True.
         """
 
-        
         setting = self._validate_input(setting_name).value
-        range = self.sensor.get_option_range(setting)
+        value = self.validate_setting_value(setting_name, value, percentage)
+        self.sensor.set_option(setting, value)
+        self.option_values[setting] = value
+        return True
+
+    def validate_setting_value(self, setting_name: Union[str, CameraColorSensorSettings, CameraDepthSensorSettings],
+                               value: float, percentage=False) -> float:
+        """
+        Checks a value against the cached range of a setting without touching the sensor.
+
+        :param setting_name: Union[str, CameraColorSensorSettings, CameraDepthSensorSettings], The setting.
+        :param value: float, The value.
+        :param percentage: bool, Whether the value is a percentage of the range.
+
+        :return: float, The value to write to the sensor.
+        """
+        range = self.get_option_range(setting_name)
         if percentage:
             value = range.min + (range.max - range.min) * value / 100
         elif value < range.min or value > range.max:
@@ -116,6 +156,55 @@ class RealSenseSettingsHelper:
       
         if int(value%range.step) != 0:
             raise IntelRealSenseCameraException(f"Invalid value: {value}. Value must be a multiple of {range.step}.")
+        return value
 
-        self.sensor.set_option(setting, value)
-        return True
\ No newline at end of file
+    def get_default_profile(self) -> Dict[str, float]:
+        """
+        Returns the default value of every supported setting, from the cached ranges.
+
+        :return: Dict[str, float], Setting names and default values.
+        """
+        return {setting.name: self.option_ranges[setting.value].default
+                for setting in self.settings if setting.value in self.option_ranges}
+
+    def apply_profile(self, profile: Dict[str, float], percentage=False) -> Dict[str, float]:
+        """
+        Applies several settings as one batch. Every value is validated against the cached ranges before
+        the first one is written, so an invalid profile changes nothing. Writing a manual exposure, gain or
+        white balance turns the matching automatic mode off, so auto switches being turned off are written
+        first and auto switches being turned on are written last. If the sensor rejects a value, the
+        settings already written are restored to their previous values.
+
+        :param profile: Dict[str, float], Setting names (e.g. 'EXPOSURE', 'gain') and values.
+        :param percentage: bool, Whether the values are percentages of the ranges.
+
+        :return: Dict[str, float], Number of settings applied and milliseconds spent validating, applying and in total.
+        """
+        start = time.perf_counter()
+        values = {}
+        for setting_name, value in profile.items():
+            setting = self._validate_input(setting_name)
+            values[setting.value] = self.validate_setting_value(setting, value, percentage)
+        automatic = (rs.option.enable_auto_exposure, rs.option.enable_auto_white_balance)
+        order = sorted(values, key=lambda option: 1 if option not in automatic else (2 if values[option] else 0))
+        validated = time.perf_counter()
+
+        written = []
+        try:
+            for option in order:
+                self.sensor.set_option(option, values[option])
+                written.append(option)
+        except Exception as e:
+            for option in reversed(written):
+                if option in self.option_values:
+                    self.sensor.set_option(option, self.option_values[option])
+            raise IntelRealSenseCameraException(f"Failed to apply settings profile, restored {len(written)} settings: {e}")
+        self.option_values.update(values)
+        # The device may have changed auto modes on its own while the manual values were written
+        for option in automatic:
+            if option in self.option_values:
+                self.option_values[option] = self.sensor.get_option(option)
+        end = time.perf_counter()
+
+        return {"applied": len(written), "validate_ms": (validated - start) * 1000,
+                "apply_ms": (end - validated) * 1000, "total_ms": (end - start) * 1000}
\ No newline at end of file
@@ -43,4 +43,14 @@ class PerceptionException(HIComputerVisionException):
     Custom exception class for perception-related errors.
     """
     def __init__(self, message):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+class FrameProtocolException(HIComputerVisionException):
+    """
+    Raised when a streamed frame cannot be encoded or decoded.
+    """
+    def __init__(self, message):
+        super().__init__(message)
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,124 @@
+"""
+This file contains the Frame record that carries a color/depth pair together with its capture metadata
+from the camera through the publisher, the transports and the receiver.
+"""
+import time
+from typing import Optional
+
+import numpy as np
+
+
+class Frame:
+    """
+    A captured color/depth pair with its capture timestamp, sequence number, sensor metadata and the
+    key of the intrinsics it was captured with.
+
+    Frames behave like the (color, depth) tuples returned before, so `color, depth = frame` and
+    `frame[0]`, `frame[1]` keep working.
+
+    Attributes:
+        color (Optional[np.ndarray]): The color image.
+        depth (Optional[np.ndarray]): The depth image.
+        timestamp (float): Capture time in seconds since the epoch (host clock).
+        sequence (int): Frame number, monotonic per source.
+        metadata (dict): Sensor metadata, e.g. hardware timestamp, frame number, exposure.
+        intrinsics_key (Optional[str]): Identifies the camera and resolution the frame was captured with.
+        received_at (Optional[float]): Time the frame reached the consumer, set by receivers.
+        buffer (Optional[FrameBuffer]): The pooled buffer backing the images, see frame_pool.py.
+    """
+    __slots__ = ("color", "depth", "timestamp", "sequence", "metadata", "intrinsics_key", "received_at", "buffer")
+
+    def __init__(self, color: Optional[np.ndarray], depth: Optional[np.ndarray] = None,
+                 timestamp: Optional[float] = None, sequence: int = 0, metadata: Optional[dict] = None,
+                 intrinsics_key: Optional[str] = None, received_at: Optional[float] = None, buffer=None):
+        self.color = color
+        self.depth = depth
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.sequence = sequence
+        self.metadata = metadata if metadata is not None else {}
+        self.intrinsics_key = intrinsics_key
+        self.received_at = received_at
+        self.buffer = buffer
+
+    def __iter__(self):
+        yield self.color
+        yield self.depth
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        return (self.color, self.depth)[index]
+
+    def __repr__(self):
+        color_shape = None if self.color is None else self.color.shape
+        depth_shape = None if self.depth is None else self.depth.shape
+        return (f"Frame(sequence={self.sequence}, timestamp={self.timestamp:.6f}, color={color_shape}, "
+                f"depth={depth_shape}, intrinsics_key={self.intrinsics_key})")
+
+    def retain(self) -> "Frame":
+        """
+        Takes another lease on the pooled buffer backing the images. Does nothing for unpooled frames.
+        """
+        if self.buffer is not None:
+            self.buffer.retain()
+        return self
+
+    def release(self) -> None:
+        """
+        Gives back a lease on the pooled buffer; the images must not be used after the last release.
+        """
+        if self.buffer is not None:
+            self.buffer.release()
+
+    def detach(self) -> "Frame":
+        """
+        Returns a frame that owns copies of the images and gives back the lease on the pooled buffer.
+        Unpooled frames are returned as they are.
+        """
+        if self.buffer is None:
+            return self
+        frame = Frame(self.color.copy(), None if self.depth is None else self.depth.copy(), self.timestamp,
+                      self.sequence, self.metadata, self.intrinsics_key, self.received_at)
+        self.release()
+        return frame
+
+    def age(self, now: Optional[float] = None) -> float:
+        """
+        Returns the seconds elapsed since capture.
+        """
+        return (time.time() if now is None else now) - self.timestamp
+
+    def latency(self) -> Optional[float]:
+        """
+        Returns the glass-to-consumer latency in seconds, or None if the frame was not received
+        through a transport.
+        """
+        return None if self.received_at is None else self.received_at - self.timestamp
+
+    def is_stale(self, max_age: float, now: Optional[float] = None) -> bool:
+        """
+        Checks whether the frame is older than `max_age` seconds.
+        """
+        return self.age(now) > max_age
+
+    def to_metadata(self) -> dict:
+        """
+        Returns the JSON serialisable fields that travel with an encoded frame. The timestamp and
+        sequence number travel in the frame protocol header.
+        """
+        metadata = dict(self.metadata)
+        if self.intrinsics_key is not None:
+            metadata["intrinsics_key"] = self.intrinsics_key
+        return metadata
+
+    @classmethod
+    def from_metadata(cls, color: Optional[np.ndarray], depth: Optional[np.ndarray], timestamp: float,
+                      sequence: int, metadata: Optional[dict] = None, received_at: Optional[float] = None) -> "Frame":
+        """
+        Rebuilds a frame from decoded images and the metadata written by `to_metadata`.
+        """
+        metadata = dict(metadata or {})
+        intrinsics_key = metadata.pop("intrinsics_key", None)
+        return cls(color, depth, timestamp=timestamp, sequence=sequence, metadata=metadata,
+                   intrinsics_key=intrinsics_key, received_at=received_at)
@@ -0,0 +1,155 @@
+"""
+This file contains a pool of preallocated, reference-counted frame buffers.
+
+Cameras copy each capture once into a pooled buffer instead of handing out views of driver memory
+that the driver recycles, or fresh arrays that every consumer copies again to be safe. Whoever holds a
+Frame backed by the pool holds a lease on its buffer: `retain()` takes another lease, `release()` gives
+one back, and the buffer returns to the pool when the last lease is released.
+
+Lease rules used by CameraPublisher:
+    - capture_frame(lease=True) returns a Frame with one lease owned by the caller. Without lease=True
+      the camera returns a detached copy, so direct callers never hold pooled buffers by accident.
+    - ImageQueue holds a lease for every frame it stores and releases it when the slot is overwritten.
+    - Subscriber holds a lease for every pending frame until its callback returns.
+    - Anyone keeping a frame past those points calls frame.retain() and later frame.release(), or keeps
+      frame.detach() instead.
+
+Frames that are dropped without being released are garbage collected as usual; the pool then simply
+allocates a replacement, which shows up in the 'allocated' count.
+"""
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from RAIT.cameras.exceptions import HIComputerVisionException
+from RAIT.cameras.frame import Frame
+
+
+class FrameBuffer:
+    """
+    A color/depth buffer pair owned by a FramePool, with a reference count.
+    """
+    __slots__ = ("pool", "color", "depth", "refs")
+
+    def __init__(self, pool: "FramePool", color: np.ndarray, depth: Optional[np.ndarray]):
+        self.pool = pool
+        self.color = color
+        self.depth = depth
+        self.refs = 0
+
+    def retain(self) -> "FrameBuffer":
+        with self.pool.lock:
+            if self.refs <= 0:
+                raise HIComputerVisionException("Cannot retain a frame buffer that was already returned to its pool.")
+            self.refs += 1
+        return self
+
+    def release(self) -> None:
+        self.pool._release(self)
+
+
+class FramePool:
+    """
+    Preallocated color/depth buffers of one shape and dtype, handed out with a lease.
+
+    Args:
+        color_shape (Tuple[int, ...]): Shape of the color buffers.
+        color_dtype: dtype of the color buffers.
+        depth_shape (Optional[Tuple[int, ...]]): Shape of the depth buffers, None for color-only cameras.
+        depth_dtype: dtype of the depth buffers.
+        size (int): Buffers allocated up front.
+        max_size (int): Most buffers kept for reuse. When every buffer is leased the pool allocates a new
+            one instead of blocking capture; buffers released beyond max_size are dropped.
+    """
+    def __init__(self, color_shape: Tuple[int, ...], color_dtype=np.uint8, depth_shape: Optional[Tuple[int, ...]] = None,
+                 depth_dtype=np.uint16, size: int = 8, max_size: Optional[int] = None):
+        self.color_shape = tuple(color_shape)
+        self.color_dtype = np.dtype(color_dtype)
+        self.depth_shape = None if depth_shape is None else tuple(depth_shape)
+        self.depth_dtype = np.dtype(depth_dtype)
+        self.size = size
+        self.max_size = max(size, max_size if max_size is not None else 2 * size)
+        self.lock = threading.Lock()
+        self.stats = {"allocated": 0, "acquired": 0, "reused": 0, "released": 0, "exhausted": 0, "discarded": 0,
+                      "in_use": 0, "peak_in_use": 0}
+        self.free = [self._allocate() for _ in range(size)]
+
+    def __repr__(self):
+        return f'FramePool(color={self.color_shape}, depth={self.depth_shape}, size={self.size}, max_size={self.max_size})'
+
+    def matches(self, color: np.ndarray, depth: Optional[np.ndarray]) -> bool:
+        """
+        Checks whether images fit the buffers of this pool.
+        """
+        if color.shape != self.color_shape or color.dtype != self.color_dtype:
+            return False
+        if depth is None:
+            return self.depth_shape is None
+        return depth.shape == self.depth_shape and depth.dtype == self.depth_dtype
+
+    def _allocate(self) -> FrameBuffer:
+        self.stats["allocated"] += 1
+        depth = None if self.depth_shape is None else np.empty(self.depth_shape, dtype=self.depth_dtype)
+        return FrameBuffer(self, np.empty(self.color_shape, dtype=self.color_dtype), depth)
+
+    def acquire(self) -> FrameBuffer:
+        """
+        Leases a free buffer, allocating one if every buffer is in use.
+
+        Returns:
+            FrameBuffer: A buffer with one lease held by the caller.
+        """
+        with self.lock:
+            if self.free:
+                buffer = self.free.pop()
+                self.stats["reused"] += 1
+            else:
+                self.stats["exhausted"] += 1
+                buffer = self._allocate()
+            buffer.refs = 1
+            self.stats["acquired"] += 1
+            self.stats["in_use"] += 1
+            self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.stats["in_use"])
+        return buffer
+
+    def _release(self, buffer: FrameBuffer) -> None:
+        with self.lock:
+            if buffer.refs <= 0:
+                raise HIComputerVisionException("Frame buffer released more often than it was leased.")
+            buffer.refs -= 1
+            if buffer.refs:
+                return
+            self.stats["released"] += 1
+            self.stats["in_use"] -= 1
+            if len(self.free) < self.max_size:
+                self.free.append(buffer)
+            else:
+                self.stats["discarded"] += 1
+
+    def wrap(self, color: np.ndarray, depth: Optional[np.ndarray] = None, **frame_fields) -> Frame:
+        """
+        Copies images into a leased buffer and returns them as a Frame holding that lease.
+
+        Args:
+            color (np.ndarray): The color image.
+            depth (Optional[np.ndarray]): The depth image.
+            **frame_fields: timestamp, sequence, metadata and intrinsics_key of the Frame.
+
+        Returns:
+            Frame: Frame backed by the pool, release it when done.
+        """
+        buffer = self.acquire()
+        np.copyto(buffer.color, color)
+        if depth is not None:
+            np.copyto(buffer.depth, depth)
+        return Frame(buffer.color, buffer.depth, buffer=buffer, **frame_fields)
+
+    def get_stats(self) -> dict:
+        """
+        Returns allocation and lease counts: buffers allocated in total, acquisitions served from the
+        free list ('reused') or by allocating ('exhausted'), buffers currently leased and the peak.
+        """
+        with self.lock:
+            return {**self.stats, "free": len(self.free),
+                    "utilisation": self.stats["in_use"] / max(self.stats["in_use"] + len(self.free), 1)}
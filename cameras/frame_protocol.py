@@ -0,0 +1,294 @@
+"""
+This file contains the wire format used to stream color/depth frame pairs over the WebSocket.
+
+Binary messages (version 2) are laid out as:
+
+    | header (47 bytes) | color payload | depth payload | metadata (JSON, optional) |
+
+The header is little-endian and carries the magic, version, codecs, the shape and dtype of both
+images, the capture timestamp, the sequence number and the payload lengths. Version 1 headers are
+one byte shorter, they have no color dtype and their color is always uint8. Servers that still
+send the legacy text format ({"color": <base64 jpeg>, "depth": <base64 np.save blob>}) are
+handled by `decode_legacy_frame`.
+"""
+import base64
+import io
+import json
+import struct
+import time
+from collections import namedtuple
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from RAIT.cameras.exceptions import FrameProtocolException
+from RAIT.cameras.depth_codecs import get_depth_codec
+
+MAGIC = b"RFRM"
+PROTOCOL_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+# magic, version, flags, color codec, depth codec,
+# color height, color width, color channels, color dtype, depth height, depth width, depth dtype,
+# timestamp, sequence, color length, depth length, metadata length
+HEADER_STRUCT = struct.Struct("<4sBBBBHHBcHHcdQIII")
+HEADER_SIZE = HEADER_STRUCT.size
+# Version 1 has no color dtype field, its color is always uint8
+HEADER_STRUCT_V1 = struct.Struct("<4sBBBBHHBHHcdQIII")
+_HEADER_STRUCTS = {1: HEADER_STRUCT_V1, 2: HEADER_STRUCT}
+
+COLOR_CODECS = {"raw": 0, "jpeg": 1, "png": 2, "webp": 3}
+_COLOR_EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+
+FrameHeader = namedtuple("FrameHeader", [
+    "version", "flags", "color_codec", "depth_codec",
+    "color_shape", "color_dtype", "depth_shape", "depth_dtype",
+    "timestamp", "sequence", "color_length", "depth_length", "metadata_length", "header_size",
+])
+
+
+def _little_endian(dtype: np.dtype) -> np.dtype:
+    return dtype.newbyteorder("<") if dtype.byteorder == ">" else dtype
+
+
+def is_binary_frame(message: Union[bytes, bytearray, memoryview, str]) -> bool:
+    """
+    Checks whether a WebSocket message uses the binary frame format.
+
+    Args:
+        message: The raw message received from the WebSocket.
+
+    Returns:
+        bool: True for binary frames, False for legacy JSON text messages.
+    """
+    return isinstance(message, (bytes, bytearray, memoryview)) and bytes(message[:4]) == MAGIC
+
+
+def hello_message(depth_codec: str = "raw") -> str:
+    """
+    Builds the message a client sends after connecting to announce the formats it understands.
+    Servers that do not know about it keep sending the legacy JSON format.
+
+    Args:
+        depth_codec (str): The depth codec the client would like the server to use.
+
+    Returns:
+        str: The JSON encoded hello message.
+    """
+    return json.dumps({"type": "hello", "protocol": "binary", "versions": list(SUPPORTED_VERSIONS),
+                       "depth_codec": depth_codec})
+
+
+def _encode_color(color: np.ndarray, codec: str, quality: int) -> bytes:
+    if codec == "raw":
+        return memoryview(np.ascontiguousarray(color)).cast("B")
+    if codec == "jpeg":
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+    elif codec == "webp":
+        params = [int(cv2.IMWRITE_WEBP_QUALITY), quality]
+    else:
+        params = []
+    success, encoded = cv2.imencode(_COLOR_EXTENSIONS[codec], color, params)
+    if not success:
+        raise FrameProtocolException(f"Failed to encode color frame as {codec}.")
+    return memoryview(encoded).cast("B")
+
+
+def encode_frame(color: Optional[np.ndarray], depth: Optional[np.ndarray],
+                 timestamp: Optional[float] = None, sequence: int = 0,
+                 color_codec: str = "jpeg", depth_codec: str = "raw",
+                 jpeg_quality: int = 90, metadata: Optional[dict] = None) -> bytes:
+    """
+    Encodes a color/depth pair into a single binary message.
+
+    Args:
+        color (np.ndarray): BGR color image, or None.
+        depth (np.ndarray): Depth image, or None.
+        timestamp (float): Capture time in seconds since the epoch. Defaults to now.
+        sequence (int): Monotonic frame sequence number.
+        color_codec (str): One of the keys of COLOR_CODECS.
+        depth_codec (str): Name of a registered depth codec, see depth_codecs.py.
+        jpeg_quality (int): Quality used when color_codec is 'jpeg' or 'webp'.
+        metadata (dict): Optional JSON serialisable metadata appended to the message.
+
+    Returns:
+        bytes: The encoded message.
+    """
+    if color_codec not in COLOR_CODECS:
+        raise FrameProtocolException(f"Unsupported color codec: {color_codec}")
+    codec = get_depth_codec(depth_codec)
+
+    color_payload, color_shape, color_dtype = b"", (0, 0, 0), np.dtype(np.uint8)
+    if color is not None:
+        color_dtype = _little_endian(color.dtype)
+        color_payload = _encode_color(np.ascontiguousarray(color, dtype=color_dtype), color_codec, jpeg_quality)
+        color_shape = (color.shape[0], color.shape[1], color.shape[2] if color.ndim == 3 else 1)
+
+    depth_payload, depth_shape, depth_dtype = b"", (0, 0), np.dtype(np.uint16)
+    if depth is not None:
+        depth_dtype = _little_endian(depth.dtype)
+        depth_payload = codec.encode(np.ascontiguousarray(depth, dtype=depth_dtype))
+        depth_shape = depth.shape[:2]
+
+    metadata_payload = json.dumps(metadata).encode() if metadata else b""
+
+    header = HEADER_STRUCT.pack(
+        MAGIC, PROTOCOL_VERSION, 0, COLOR_CODECS[color_codec], codec.codec_id,
+        color_shape[0], color_shape[1], color_shape[2], color_dtype.char.encode(), depth_shape[0], depth_shape[1],
+        depth_dtype.char.encode(),
+        time.time() if timestamp is None else timestamp, sequence,
+        len(color_payload), len(depth_payload), len(metadata_payload),
+    )
+    return b"".join((header, color_payload, depth_payload, metadata_payload))
+
+
+def parse_header(message: Union[bytes, memoryview]) -> FrameHeader:
+    """
+    Parses the fixed header of a binary frame without touching the payloads.
+
+    Args:
+        message: The binary message.
+
+    Returns:
+        FrameHeader: The parsed header.
+    """
+    if len(message) < HEADER_STRUCT_V1.size:
+        raise FrameProtocolException(f"Binary frame too short: {len(message)} bytes.")
+    if bytes(message[:4]) != MAGIC:
+        raise FrameProtocolException("Message is not a binary frame.")
+    version = message[4]
+    if version not in SUPPORTED_VERSIONS:
+        raise FrameProtocolException(f"Unsupported frame protocol version: {version}")
+    header_struct = _HEADER_STRUCTS[version]
+    if len(message) < header_struct.size:
+        raise FrameProtocolException(f"Binary frame too short: {len(message)} bytes.")
+
+    fields = list(header_struct.unpack_from(message))
+    if version == 1:
+        fields.insert(8, b"B")
+    (_, _, flags, color_codec, depth_codec, color_h, color_w, color_c, color_dtype,
+     depth_h, depth_w, depth_dtype, timestamp, sequence, color_length, depth_length, metadata_length) = fields
+    if header_struct.size + color_length + depth_length + metadata_length > len(message):
+        raise FrameProtocolException("Binary frame is truncated.")
+    return FrameHeader(version, flags, color_codec, depth_codec,
+                       (color_h, color_w, color_c), np.dtype(color_dtype.decode()),
+                       (depth_h, depth_w), np.dtype(depth_dtype.decode()),
+                       timestamp, sequence, color_length, depth_length, metadata_length, header_struct.size)
+
+
+def _decode_color(payload: memoryview, header: FrameHeader) -> Optional[np.ndarray]:
+    if header.color_length == 0:
+        return None
+    if header.color_codec == COLOR_CODECS["raw"]:
+        height, width, channels = header.color_shape
+        return np.frombuffer(payload, header.color_dtype).reshape((height, width, channels) if channels > 1 else (height, width))
+    color = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_UNCHANGED)
+    if color is None:
+        raise FrameProtocolException("Failed to decode color payload.")
+    return color
+
+
+def _decode_depth(payload: memoryview, header: FrameHeader) -> Optional[np.ndarray]:
+    if header.depth_length == 0:
+        return None
+    return get_depth_codec(header.depth_codec).decode(payload, header.depth_shape, header.depth_dtype)
+
+
+def decode_frame(message: Union[bytes, memoryview]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], FrameHeader]:
+    """
+    Decodes a binary frame. Raw payloads are returned as read-only views into the message,
+    so no intermediate copies are made; compressed depth is decoded by the codec in the header.
+
+    Args:
+        message: The binary message.
+
+    Returns:
+        tuple: (color_frame, depth_frame, header)
+    """
+    view = memoryview(message)
+    header = parse_header(view)
+    color_end = header.header_size + header.color_length
+    depth_end = color_end + header.depth_length
+    color_frame = _decode_color(view[header.header_size:color_end], header)
+    depth_frame = _decode_depth(view[color_end:depth_end], header)
+    return color_frame, depth_frame, header
+
+
+def decode_metadata(message: Union[bytes, memoryview], header: Optional[FrameHeader] = None) -> dict:
+    """
+    Returns the JSON metadata appended to a binary frame, or an empty dict.
+    """
+    header = header or parse_header(message)
+    if header.metadata_length == 0:
+        return {}
+    start = header.header_size + header.color_length + header.depth_length
+    return json.loads(bytes(memoryview(message)[start:start + header.metadata_length]))
+
+
+def decode_message(message: Union[bytes, str]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], Optional[FrameHeader]]:
+    """
+    Decodes a WebSocket message in either the binary or the legacy JSON format. Module level
+    so it can be shipped to executor workers.
+
+    Args:
+        message: The raw message.
+
+    Returns:
+        tuple: (color_frame, depth_frame, header), header is None for legacy JSON frames.
+    """
+    if is_binary_frame(message):
+        return decode_frame(message)
+    color_frame, depth_frame = decode_legacy_frame(message)
+    return color_frame, depth_frame, None
+
+
+def decode_packed_message(message: Union[bytes, memoryview]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], FrameHeader, dict]:
+    """
+    Decodes a binary frame published over MQTT (or any other transport) together with its metadata.
+    When the publisher decimated the depth image, `metadata["depth_decimation"]` holds the factor, so
+    a depth pixel (u, v) corresponds to color pixel (u * factor, v * factor).
+
+    Args:
+        message: The MQTT payload.
+
+    Returns:
+        tuple: (color_frame, depth_frame, header, metadata)
+    """
+    color_frame, depth_frame, header = decode_frame(message)
+    return color_frame, depth_frame, header, decode_metadata(message, header)
+
+
+def encode_legacy_frame(color: Optional[np.ndarray], depth: Optional[np.ndarray], jpeg_quality: int = 90) -> str:
+    """
+    Encodes a color/depth pair in the legacy JSON format for clients that did not send a hello.
+    """
+    frame_data = {}
+    if color is not None:
+        frame_data["color"] = base64.b64encode(_encode_color(color, "jpeg", jpeg_quality)).decode()
+    if depth is not None:
+        depth_bytes = io.BytesIO()
+        np.save(depth_bytes, depth)
+        frame_data["depth"] = base64.b64encode(depth_bytes.getbuffer()).decode()
+    return json.dumps(frame_data)
+
+
+def decode_legacy_frame(message: Union[str, bytes]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Decodes a legacy JSON frame with base64 encoded JPEG color and np.save depth.
+
+    Args:
+        message: The JSON text message.
+
+    Returns:
+        tuple: (color_frame, depth_frame)
+    """
+    frame_data = json.loads(message)
+
+    color_data = base64.b64decode(frame_data.get('color', ""))
+    color_frame = cv2.imdecode(np.frombuffer(color_data, np.uint8), cv2.IMREAD_COLOR) if color_data else None
+
+    depth_data = base64.b64decode(frame_data.get('depth', ""))
+    depth_frame = np.load(io.BytesIO(depth_data), allow_pickle=True) if depth_data else None
+
+    return color_frame, depth_frame
@@ -0,0 +1,246 @@
+"""
+This file contains the WebSocket server that streams frames from a CameraPublisher to CameraReceiver clients.
+
+Clients announce the formats they understand with a hello message (see frame_protocol.hello_message).
+Clients that send one get binary frames with the depth codec they asked for, all others get the legacy
+JSON format. Every frame is encoded once per format in use, and each client keeps only the newest
+encoded frame waiting, so a slow client skips stale frames instead of delaying the others.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+import websockets
+
+from RAIT.cameras import frame_protocol
+from RAIT.cameras.camera_publisher import CameraPublisher
+from RAIT.cameras.depth_codecs import available_depth_codecs
+
+LEGACY_FORMAT = ("json", None)
+
+
+class FrameClient:
+    """
+    A connected client with a single slot holding the newest frame not yet sent to it.
+    """
+    def __init__(self, websocket, frame_format):
+        self.websocket = websocket
+        self.format = frame_format
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.stats = {"sent": 0, "skipped": 0, "send_ms": 0.0}
+
+    def offer(self, message):
+        if self.pending is not None:
+            self.stats["skipped"] += 1  # The previous frame was never sent, the client is behind
+        self.pending = message
+        self.ready.set()
+
+    async def send_loop(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            message, self.pending = self.pending, None
+            start = time.perf_counter()
+            await self.websocket.send(message)
+            self.stats["send_ms"] = (time.perf_counter() - start) * 1000
+            self.stats["sent"] += 1
+
+
+class FrameServer:
+    """
+    Serves the frames of a CameraPublisher over WebSocket in the format CameraReceiver consumes.
+
+    Usage:
+        publisher = CameraPublisher(camera, start_publisher=True, depth_codec="rvl")
+        server = FrameServer(publisher, port=3000, path="/home/server")
+        asyncio.run(server.serve_forever())
+    """
+    def __init__(self, publisher: CameraPublisher, host: str = "0.0.0.0", port: int = 3000,
+                 path: Optional[str] = None, hello_timeout: float = 0.5, max_message_size: int = 16 * 1024 * 1024,
+                 depth_codec: Optional[str] = None):
+        """
+        :param publisher: CameraPublisher, The publisher whose frames are served.
+        :param host: str, Interface to listen on.
+        :param port: int, Port to listen on.
+        :param path: str, Only accept clients connecting to this path, e.g. '/home/server'. None accepts any path.
+        :param hello_timeout: float, Seconds to wait for a client hello before falling back to legacy JSON.
+        :param max_message_size: int, Largest message accepted from clients.
+        :param depth_codec: str, Codec for binary clients that do not ask for one or ask for an unavailable one.
+                            Defaults to the publisher's depth codec.
+        """
+        self.publisher = publisher
+        self.host = host
+        self.port = port
+        self.path = path
+        self.depth_codec = depth_codec or publisher.depth_codec
+        self.hello_timeout = hello_timeout
+        self.max_message_size = max_message_size
+
+        self.clients = {}
+        self.clients_lock = threading.Lock()
+        self.loop = None
+        self.server = None
+        self.subscriber = None
+        self.stats = {"frames": 0, "encodes": 0, "encode_ms": 0.0, "connections": 0}
+
+    @classmethod
+    def from_config(cls, publisher: CameraPublisher, config: dict, **kwargs) -> "FrameServer":
+        """
+        Creates a server listening on the port and path of the config's Stream section, with its
+        Depth_codec as the default codec.
+
+        :param publisher: CameraPublisher, The publisher whose frames are served.
+        :param config: dict, The loaded config.yaml.
+        :param kwargs: Further FrameServer arguments, they take precedence over the config.
+        :return: FrameServer, The server.
+        """
+        stream_config = config.get("Stream", {})
+        kwargs.setdefault("port", urlparse(stream_config.get("Websocket_server", "ws://localhost:3000")).port or 3000)
+        kwargs.setdefault("path", stream_config.get("Websocket_topic"))
+        kwargs.setdefault("depth_codec", stream_config.get("Depth_codec"))
+        return cls(publisher, **kwargs)
+
+    async def negotiate(self, websocket):
+        """
+        Reads the client hello and picks the format frames are sent in.
+
+        :param websocket: The client connection.
+        :return: Tuple[str, Optional[str]], ('binary', depth codec) or ('json', None).
+        """
+        try:
+            hello = json.loads(await asyncio.wait_for(websocket.recv(), self.hello_timeout))
+        except (asyncio.TimeoutError, ValueError, TypeError):
+            return LEGACY_FORMAT
+        if (not isinstance(hello, dict) or hello.get("type") != "hello" or hello.get("protocol") != "binary"
+                or frame_protocol.PROTOCOL_VERSION not in hello.get("versions", [])):
+            return LEGACY_FORMAT
+        depth_codec = hello.get("depth_codec", self.depth_codec)
+        if depth_codec not in available_depth_codecs():
+            print(f"Client asked for unavailable depth codec '{depth_codec}', using '{self.depth_codec}'.")
+            depth_codec = self.depth_codec
+        return ("binary", depth_codec)
+
+    async def handler(self, websocket):
+        request = getattr(websocket, "request", None)
+        path = request.path if request is not None else getattr(websocket, "path", None)
+        if self.path and path != self.path:
+            await websocket.close(1008, "Unknown path")
+            return
+
+        try:
+            client = FrameClient(websocket, await self.negotiate(websocket))
+        except websockets.exceptions.ConnectionClosed:
+            return
+        with self.clients_lock:
+            self.clients[id(client)] = client
+        self.stats["connections"] += 1
+        print(f"Client {websocket.remote_address} connected, format {client.format}.")
+
+        sender = asyncio.create_task(client.send_loop())
+        try:
+            # Keep reading so pings and the closing handshake are processed, other messages are ignored
+            async for _ in websocket:
+                pass
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            with self.clients_lock:
+                self.clients.pop(id(client), None)
+            print(f"Client {websocket.remote_address} disconnected after {client.stats['sent']} frames "
+                  f"({client.stats['skipped']} skipped).")
+
+    def encode(self, images, frame_format) -> object:
+        """
+        Encodes captured images in one client format.
+        """
+        if frame_format == LEGACY_FORMAT:
+            color, depth = self.publisher.split_images(images)
+            return frame_protocol.encode_legacy_frame(color, depth, jpeg_quality=self.publisher.jpeg_quality)
+        return self.publisher.encode_frame(images, depth_codec=frame_format[1])
+
+    def on_frame(self, images, image_queue):
+        """
+        Publisher subscriber, runs on its own worker thread. Encodes the frame once per format in use
+        and hands the messages to the event loop.
+        """
+        with self.clients_lock:
+            formats = {client.format for client in self.clients.values()}
+        if not formats or self.loop is None:
+            return
+        start = time.perf_counter()
+        messages = {frame_format: self.encode(images, frame_format) for frame_format in formats}
+        self.stats["encode_ms"] = (time.perf_counter() - start) * 1000
+        self.stats["encodes"] += len(messages)
+        self.stats["frames"] += 1
+        self.loop.call_soon_threadsafe(self.deliver, messages)
+
+    def deliver(self, messages):
+        with self.clients_lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            if client.format in messages:
+                client.offer(messages[client.format])
+
+    async def start(self):
+        """
+        Subscribes to the publisher and starts listening.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.subscriber = self.publisher.subscribe(self.on_frame, max_pending=1, overflow="drop_oldest")
+        self.server = await websockets.serve(self.handler, self.host, self.port, max_size=self.max_message_size)
+        print(f"Frame server listening on ws://{self.host}:{self.port}{self.path or ''}")
+
+    async def stop(self):
+        """
+        Unsubscribes from the publisher and closes all client connections.
+        """
+        if self.subscriber is not None:
+            self.publisher.unsubscribe(self.on_frame)
+            self.subscriber = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.Future()
+        finally:
+            await self.stop()
+
+    def get_stats(self):
+        """
+        Returns the encode statistics and the sent/skipped counts of every connected client.
+        """
+        with self.clients_lock:
+            clients = {f"{client.websocket.remote_address}": {"format": client.format, **client.stats}
+                       for client in self.clients.values()}
+        return {**self.stats, "clients": clients}
+
+
+if __name__ == "__main__":
+    from RAIT.config.config import load_config
+    from RAIT.cameras.intel_realsense_camera import IntelRealSenseCamera
+
+    config = load_config("config/config.yaml")
+    camera_config = config.get("Camera", {}).get("D435I", {})
+    imu_config = camera_config.get("IMU", {})
+    camera = IntelRealSenseCamera(post_processing=camera_config.get("Post_Processing"),
+                                  settings_profiles=camera_config.get("Settings_Profiles"),
+                                  imu=imu_config.get("Enabled", False),
+                                  imu_settings={"accel_fps": imu_config.get("Accel_FPS", 250),
+                                                "gyro_fps": imu_config.get("Gyro_FPS", 400),
+                                                "buffer_seconds": imu_config.get("Buffer_Seconds", 10.0)})
+    publisher = CameraPublisher.from_config(camera, config, start_publisher=True)
+    try:
+        asyncio.run(FrameServer.from_config(publisher, config).serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.stop_publisher()
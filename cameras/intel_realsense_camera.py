@@ -6,8 +6,16 @@ import sys
 import subprocess
 import time
 import re
+import threading
+from collections import deque
 
 from RAIT.cameras.camera import Camera
+from RAIT.cameras.frame import Frame
+from RAIT.cameras.frame_pool import FramePool
+from RAIT.cameras.depth_registration import DepthRegistration
+from RAIT.cameras.point_cloud import PointCloudGenerator
+from RAIT.cameras.realsense_imu import RealSenseImu
+from RAIT.cameras.driver_helpers.realsense_filter_chain import RealSenseFilterChain
 from RAIT.cameras.driver_helpers.realsense_settings_helper import RealSenseSettingsHelper, CameraColorSensorSettings, CameraDepthSensorSettings
 from RAIT.cameras.exceptions import IntelRealSenseCameraException
 
@@ -42,6 +50,22 @@ class IntelRealSenseCamera(Camera):
         color_sensor_helper (Optional[RealSenseSettingsHelper]): Helper for color sensor settings.
         color_settings (Optional[Type[CameraColorSensorSettings]]): Color sensor settings class.
         depth_settings (Optional[Type[CameraDepthSensorSettings]]): Depth sensor settings class.
+        capture_mode (str): 'poll' or 'queue', see capture_frame.
+        record_to (Optional[str]): .bag file every enabled stream is recorded to while the camera runs.
+        playback_from (Optional[str]): .bag file played back instead of a connected device.
+        real_time (bool): Play back at the recorded rate (frames may be skipped when the consumer is slow)
+            or, when False, as fast as frames are consumed without skipping any. Non-real-time playback is
+            only lossless in 'poll' mode; in 'queue' mode frames beyond queue_capacity are dropped.
+        imu (Optional[RealSenseImu]): Accelerometer/gyro stream of the device when started with imu=True. Frames
+            then carry the estimated rotational motion blur in metadata['motion_blur_px'].
+        capture_stats (Dict[str, float]): Framesets received, delivered, dropped by the sensor pipeline
+            (frame number gaps) or overwritten before being consumed, in queue mode.
+        registration_mode (str): How depth is registered to color when align_switch is on: 'rs' (rs.align),
+            'lut' (DepthRegistration on every frame) or 'on_demand' (unaligned depth, see depth_at_color_pixels).
+        registration (Optional[DepthRegistration]): Lookup-map registration, rebuilt on every start_camera.
+        filter_chain (Optional[RealSenseFilterChain]): Depth post-processing applied to every frameset before alignment.
+        frame_pool (Optional[FramePool]): Buffers the images of every captured Frame are copied into once.
+            Frames hold a lease on their buffer, release() them when done (CameraPublisher does).
     Methods:
         __init__(self, camera_id: Optional[int] = None, model: Optional[str] = None, width: int = 640, height: int = 480, fps: int = 30, open_pipeline: bool = True, align_switch: bool = True):
             Initializes the IntelRealSenseCamera object with the specified parameters.
@@ -51,24 +75,51 @@ class IntelRealSenseCamera(Camera):
         get_model_name(self) -> str:
         get_frames(self):
             Captures and returns the color and depth frames from the camera.
-        capture_frame(self) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        capture_frame(self, lease: bool = False) -> Frame:
+        get_capture_stats(self) -> Dict[str, float]:
+            Returns the queue mode capture statistics.
+        get_filter_stats(self) -> Dict[str, Dict[str, float]]:
+            Returns the per-filter timing of the post-processing chain.
+        set_filter_enabled(self, name: str, enabled: bool) -> None:
+            Turns a post-processing filter on or off while streaming.
+        depth_at_color_pixels(self, pixels, kernel_size=5) -> np.ndarray:
+            Returns the depth in meters at color pixels from the latest unaligned depth image.
+        align_depth_roi(self, roi) -> np.ndarray:
+            Registers the latest unaligned depth image into a color ROI.
         get_distance_at_point(self, depth_image: np.ndarray, x: int, y: int) -> float:
         get_filtered_depth(self, depth_frame, pixel: tuple[float, float], depth_scale, kernel_size=5):
             Gets the filtered depth value around a pixel using a kernel.
         get_depth_at_point(self, x: int, y: int, filtered=False) -> Tuple[float, float, float]:
+        get_point_cloud(self, roi=None, mask=None, with_color=False, min_depth=None, max_depth=None):
+            Deprojects the latest depth image, an ROI or a mask into an (N, 3) array in one pass.
         set_resolution(self, width: int, height: int) -> None:
         set_fps(self, fps: int) -> None:
+        reconfigure(self, width=None, height=None, fps=None) -> Dict[str, float]:
+            Switches the stream profile of a running camera with a single pipeline restart.
+        get_supported_profiles(self, stream: str = "color") -> list:
+            Returns the cached (width, height, fps) profiles of a stream.
         get_setting_value(self, setting_name: str, sensor_type: str) -> Dict[str, float]:
         set_setting_value(self, setting_name: str, value: float, sensor_type: str, percentage=True) -> None:
+        apply_settings_profile(self, profile, percentage=False) -> Dict[str, float]:
+            Validates and applies a named or given settings profile to both sensors as one batch.
         start_camera(self, default=True) -> None:
         release_camera(self) -> None:
             Releases camera resources with proper cleanup.
         get_intrinsics(self, depth: bool) -> Dict[str, rs.intrinsics]:
             Gets the intrinsics of the camera.
    """
+    provides_depth = True
+    # CameraPublisher captures with lease=True and releases the frames itself
+    supports_frame_leases = True
+
     def __init__(self, camera_id: Optional[int] = None, model: Optional[str] = None, 
                  width: int = 640, height: int = 480, fps: int = 30, 
-                 open_pipeline: bool = True, align_switch: bool = True):
+                 open_pipeline: bool = True, align_switch: bool = True,
+                 capture_mode: str = "poll", queue_capacity: int = 4, output_queue_size: int = 2,
+                 registration: str = "rs", post_processing=None, check_usage: bool = True,
+                 frame_pool_size: int = 8, settings_profiles: Optional[Dict[str, dict]] = None,
+                 record_to: Optional[str] = None, playback_from: Optional[str] = None, real_time: bool = True,
+                 repeat_playback: bool = False, imu: bool = False, imu_settings: Optional[dict] = None):
         
         self.camera_id = camera_id
         self.model = model
@@ -78,15 +129,78 @@ class IntelRealSenseCamera(Camera):
         self.streaming = False
         self.align_switch = align_switch
         self.pipeline_started = False
+        # RealSenseDeviceManager runs several cameras in one process, where lsof would report the process itself
+        self.check_usage = check_usage
 
         self.pipeline = rs.pipeline()
         self.config = rs.config()
         self.model_name = None
 
+        # Capture mode: 'poll' waits for framesets in capture_frame, 'queue' lets librealsense push framesets
+        # into an rs.frame_queue that a worker thread aligns and converts, so slow consumers never stall ingestion
+        if capture_mode not in ("poll", "queue"):
+            raise IntelRealSenseCameraException(f"Invalid capture mode: {capture_mode}. Must be either 'poll' or 'queue'.")
+        self.capture_mode = capture_mode
+        self.queue_capacity = queue_capacity
+        self.frame_queue = None
+        self.capture_thread = None
+        self.capture_running = False
+        self.frame_lock = threading.Lock()
+        self.ready_frames = deque(maxlen=max(1, output_queue_size))
+        self.frame_condition = threading.Condition(self.frame_lock)
+        self.capture_stats = {"framesets": 0, "delivered": 0, "color_drops": 0, "depth_drops": 0,
+                              "output_overwritten": 0, "timeouts": 0, "process_ms": 0.0}
+        self._last_frame_numbers = {}
+
+        # Registration: 'rs' runs rs.align on every frameset, 'lut' maps full depth frames with precomputed
+        # lookup maps, 'on_demand' leaves depth unaligned and only maps the pixels or ROIs asked for
+        if registration not in ("rs", "lut", "on_demand"):
+            raise IntelRealSenseCameraException(f"Invalid registration: {registration}. Must be one of 'rs', 'lut' or 'on_demand'.")
+        self.registration_mode = registration
+        self.registration = None
+        self.raw_depth_image = None
+        self.color_image = None
+        self.depth_image = None
+        # Captured images are copied once into pooled buffers with an explicit lifetime instead of
+        # exposing librealsense memory that the driver recycles. 0 disables the pool.
+        self.frame_pool_size = frame_pool_size
+        self.frame_pool = None
+        self._latest_frame = None
+        # Named settings profiles, e.g. the Camera: <model>: Settings_Profiles section of config.yaml
+        self.settings_profiles = settings_profiles or {}
+
+        # .bag recording and playback through librealsense. Playback streams whatever the file contains,
+        # so width, height and fps are taken from the recording once started.
+        if record_to and playback_from:
+            raise IntelRealSenseCameraException("A camera cannot record and play back at the same time.")
+        self.record_to = record_to
+        self.playback_from = playback_from
+        self.real_time = real_time
+        self.repeat_playback = repeat_playback
+        self.playback = None
+        self.recorder = None
+
+        # High-rate accelerometer/gyro on their own pipeline, see realsense_imu.py
+        if imu and playback_from:
+            raise IntelRealSenseCameraException("IMU streaming is not supported during .bag playback.")
+        self.imu_enabled = imu
+        self.imu_settings = imu_settings or {}
+        self.imu = None
+        # Supported (width, height, fps, format) per stream, queried once when the camera first starts
+        self.supported_profiles = None
+        # Point cloud generator for the current intrinsics, created on the first get_point_cloud call
+        self.point_cloud = None
+
+        # Post-processing: the Camera: <model>: Post_Processing section of config.yaml or a RealSenseFilterChain
+        if post_processing is None or isinstance(post_processing, RealSenseFilterChain):
+            self.filter_chain = post_processing
+        else:
+            self.filter_chain = RealSenseFilterChain.from_config(post_processing)
+        if self.filter_chain is not None and registration != "rs" and self.filter_chain.has_stage("decimation"):
+            raise IntelRealSenseCameraException("The decimation filter changes the depth resolution and cannot be used with lookup-map registration.")
+
         if open_pipeline:
             self.start_camera(default=True)
-        
-        self.depth_intrinsics = rs.video_stream_profile(self.pipeline.get_active_profile().get_stream(rs.stream.depth)).get_intrinsics()
 
     def __repr__(self):
         return f'DepthCamera(camera_id={self.camera_id}, width={self.width}, height={self.height}, fps={self.fps})'
@@ -143,8 +257,10 @@ class IntelRealSenseCamera(Camera):
 
     def get_frames(self):
         frames = self.pipeline.wait_for_frames()
+        if self.filter_chain is not None:
+            frames = self.filter_chain.process(frames).as_frameset()
         
-        if self.align_switch:
+        if self.align_switch and self.registration_mode == "rs":
             aligned_frames = self.align.process(frames)
 
             self.color_frame = aligned_frames.get_color_frame()
@@ -156,19 +272,284 @@ class IntelRealSenseCamera(Camera):
 
         return self.color_frame, self.depth_frame
     
-    def capture_frame(self) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    def capture_frame(self, lease: bool = False) -> Frame:
         """
-        Retrieves the color and/or depth images from the camera.
+        Retrieves the color and depth images from the camera together with their capture metadata.
 
-        :return: Union[np.ndarray, Tuple[np.ndarray, np.ndarray]], Color image, depth image, or both as specified.
+        In 'poll' mode the next frameset is read and aligned on the calling thread. In 'queue' mode the
+        oldest frame prepared by the capture worker is returned, waiting for one if none is ready.
+
+        :param lease: bool, Return the frame backed by the frame pool with a lease the caller must release().
+                      Otherwise the frame owns copies of the images and can be kept freely; in 'poll' mode they
+                      are copied straight out of the librealsense buffers, bypassing the pool.
+        :return: Frame, Unpacks like (color image, depth image) and carries the capture timestamp,
+                 frame number, sensor metadata and intrinsics key. None at the end of a .bag playback.
         """
+        frame = self._capture_frame(lease)
+        return frame if lease or frame is None else frame.detach()
 
-        self.get_frames()
-        
-        self.color_image =  np.asanyarray(self.color_frame.get_data())
-        self.depth_image = np.asanyarray(self.depth_frame.get_data())
+    def _capture_frame(self, lease: bool = True) -> Optional[Frame]:
+        if self.capture_mode == "queue":
+            with self.frame_condition:
+                if not self.frame_condition.wait_for(lambda: self.ready_frames or not self.capture_running, timeout=5):
+                    raise IntelRealSenseCameraException("Timed out waiting for frames from the capture worker.")
+                if not self.ready_frames:
+                    if self.playback_finished():
+                        return None
+                    raise IntelRealSenseCameraException("The capture worker is not running.")
+                self.capture_stats["delivered"] += 1
+                return self.ready_frames.popleft()
+
+        try:
+            self.get_frames()
+        except RuntimeError:
+            if self.playback_finished():
+                return None
+            raise
+        return self._to_frame(self.color_frame, self.depth_frame, copy=not lease, pooled=lease)
+
+    # D400 color sensors report the actual_exposure metadata in units of 100 us, like the EXPOSURE option
+    COLOR_EXPOSURE_UNIT_S = 1e-4
+
+    def _to_frame(self, color_frame, depth_frame, copy: bool = False, pooled: bool = True) -> Frame:
+        """
+        Converts a color/depth frame pair into a Frame. With the frame pool enabled the images are
+        copied once into a pooled buffer and the Frame holds a lease on it.
+
+        :param copy: bool, Copy the images out of the librealsense buffers so they can be returned to its pool.
+        :param pooled: bool, Use the frame pool if it is enabled. Unpooled frames own their images.
+        """
+        color_image = np.asanyarray(color_frame.get_data())
+        depth_image = np.asanyarray(depth_frame.get_data())
+        if self.registration is not None:
+            # Unaligned depth, kept for depth_at_color_pixels and align_depth_roi
+            self.raw_depth_image = depth_image.copy() if copy else depth_image
+            if self.registration_mode == "lut":
+                depth_image = self.registration.align(self.raw_depth_image)
+
+        metadata = self.get_frame_metadata(color_frame)
+        metadata["depth_frame_number"] = depth_frame.get_frame_number()
+        fields = dict(timestamp=self.get_frame_timestamp(color_frame), sequence=metadata["frame_number"],
+                      metadata=metadata, intrinsics_key=f"{self.camera_id}/{self.width}x{self.height}")
+        if self.imu is not None:
+            metadata["motion_blur_px"] = self.get_motion_blur(fields["timestamp"], metadata)
+        if not self.frame_pool_size or not pooled:
+            if copy:
+                color_image, depth_image = color_image.copy(), depth_image.copy()
+            frame = Frame(color_image, depth_image, **fields)
+            # The latest images are owned by this frame now, the lease on the previous pooled one can go
+            if self._latest_frame is not None:
+                self._latest_frame.release()
+                self._latest_frame = None
+        else:
+            if self.frame_pool is None or not self.frame_pool.matches(color_image, depth_image):
+                self.frame_pool = FramePool(color_image.shape, color_image.dtype, depth_image.shape,
+                                            depth_image.dtype, size=self.frame_pool_size)
+            frame = self.frame_pool.wrap(color_image, depth_image, **fields)
+            # The camera keeps a lease on its latest frame for get_point_cloud and friends
+            frame.retain()
+            if self._latest_frame is not None:
+                self._latest_frame.release()
+            self._latest_frame = frame
+        self.color_image, self.depth_image = frame.color, frame.depth
+        return frame
+
+    def _count_sensor_drops(self, frames) -> None:
+        """
+        Counts frames skipped by the device or librealsense from gaps in the per-stream frame numbers.
+        """
+        for name, frame in (("color", frames.get_color_frame()), ("depth", frames.get_depth_frame())):
+            if not frame:
+                continue
+            number = frame.get_frame_number()
+            last = self._last_frame_numbers.get(name)
+            if last is not None and number > last + 1:
+                self.capture_stats[f"{name}_drops"] += number - last - 1
+            self._last_frame_numbers[name] = number
+
+    def _capture_worker(self) -> None:
+        """
+        Takes framesets from the frame queue, aligns and converts them, and keeps the newest
+        `output_queue_size` frames ready for capture_frame.
+        """
+        while self.capture_running:
+            try:
+                frames = self.frame_queue.wait_for_frame(1000).as_frameset()
+            except RuntimeError:
+                self.capture_stats["timeouts"] += 1
+                if self.playback_finished():
+                    with self.frame_condition:
+                        self.capture_running = False
+                        self.frame_condition.notify_all()
+                continue
+
+            start = time.perf_counter()
+            self.capture_stats["framesets"] += 1
+            self._count_sensor_drops(frames)
+            if self.filter_chain is not None:
+                frames = self.filter_chain.process(frames).as_frameset()
+            if self.align_switch and self.registration_mode == "rs":
+                frames = self.align.process(frames)
+            color_frame, depth_frame = frames.get_color_frame(), frames.get_depth_frame()
+            if not color_frame or not depth_frame:
+                continue
+            frame = self._to_frame(color_frame, depth_frame, copy=True)
+            self.capture_stats["process_ms"] = (time.perf_counter() - start) * 1000
+
+            with self.frame_condition:
+                # The last rs frames are kept for get_depth_at_point
+                self.color_frame, self.depth_frame = color_frame, depth_frame
+                if len(self.ready_frames) == self.ready_frames.maxlen:
+                    self.capture_stats["output_overwritten"] += 1
+                    self.ready_frames.popleft().release()
+                self.ready_frames.append(frame)
+                self.frame_condition.notify_all()
+
+    def _stop_capture_worker(self) -> None:
+        with self.frame_condition:
+            self.capture_running = False
+            self.frame_condition.notify_all()
+        if self.capture_thread is not None:
+            self.capture_thread.join()
+            self.capture_thread = None
+        while self.ready_frames:
+            self.ready_frames.popleft().release()
 
-        return self.color_image, self.depth_image
+    def get_capture_stats(self) -> Dict[str, float]:
+        """
+        Returns the capture statistics of queue mode.
+
+        :return: Dict[str, float], framesets, delivered, color_drops, depth_drops, output_overwritten, timeouts and process_ms,
+                 and the frame pool allocation and lease counts under 'frame_pool'.
+        """
+        with self.frame_lock:
+            stats = {**self.capture_stats, "ready": len(self.ready_frames)}
+        if self.frame_pool is not None:
+            stats["frame_pool"] = self.frame_pool.get_stats()
+        return stats
+
+    def get_filter_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the timing of the post-processing chain.
+
+        :return: Dict[str, Dict[str, float]], Per filter and for the whole chain: calls, last_ms, mean_ms and max_ms.
+        """
+        if self.filter_chain is None:
+            return {}
+        return self.filter_chain.get_stats()
+
+    def set_filter_enabled(self, name: str, enabled: bool) -> None:
+        """
+        Turns a post-processing filter on or off, effective from the next frame.
+
+        :param name: str, The filter name, e.g. 'spatial' or 'hole_filling'.
+        :param enabled: bool, Whether the filter runs.
+        """
+        if self.filter_chain is None:
+            raise IntelRealSenseCameraException("No post-processing chain configured.")
+        self.filter_chain.set_enabled(name, enabled)
+
+    def _get_registration(self) -> DepthRegistration:
+        if self.registration is None:
+            raise IntelRealSenseCameraException("Depth registration is only available with align_switch on and registration 'lut' or 'on_demand'.")
+        if self.raw_depth_image is None:
+            raise IntelRealSenseCameraException("No depth frame has been captured yet.")
+        return self.registration
+
+    def depth_at_color_pixels(self, pixels, kernel_size: int = 5) -> np.ndarray:
+        """
+        Retrieves the depth at color pixels from the latest captured depth frame, registering only the
+        depth pixels around each requested pixel.
+
+        :param pixels: Sequence[Tuple[float, float]], Color pixels (x, y).
+        :param kernel_size: int, Size of the median kernel around each pixel.
+        :return: np.ndarray, Depth in meters per pixel, 0 where no valid depth was found.
+        """
+        registration = self._get_registration()
+        return registration.depth_at_color_pixels(self.raw_depth_image, pixels, kernel_size)
+
+    def align_depth_roi(self, roi: Tuple[int, int, int, int]) -> np.ndarray:
+        """
+        Registers the latest captured depth frame into a region of the color image.
+
+        :param roi: Tuple[int, int, int, int], Color ROI (x0, y0, x1, y1), end exclusive.
+        :return: np.ndarray, Depth in depth units shaped like the ROI, 0 where unknown.
+        """
+        registration = self._get_registration()
+        return registration.align(self.raw_depth_image, roi)
+
+    @staticmethod
+    def get_frame_timestamp(frame) -> float:
+        """
+        Returns the capture time of a frame in seconds on the host clock. Frames stamped in the
+        global or system time domain use the device timestamp, otherwise the arrival time is used.
+
+        :param frame: rs.frame, The frame.
+        :return: float, Capture time in seconds since the epoch.
+        """
+        if frame.get_frame_timestamp_domain() in (rs.timestamp_domain.global_time, rs.timestamp_domain.system_time):
+            return frame.get_timestamp() / 1000.0
+        return time.time()
+
+    @staticmethod
+    def get_frame_metadata(frame) -> Dict[str, float]:
+        """
+        Reads the frame number, hardware timestamp and the exposure/gain metadata the device reports.
+
+        :param frame: rs.frame, The frame.
+        :return: Dict[str, float], The metadata values.
+        """
+        metadata = {
+            "frame_number": frame.get_frame_number(),
+            "hardware_timestamp_ms": frame.get_timestamp(),
+            "timestamp_domain": str(frame.get_frame_timestamp_domain()),
+        }
+        for name, value in (("exposure", rs.frame_metadata_value.actual_exposure),
+                            ("gain", rs.frame_metadata_value.gain_level),
+                            ("sensor_timestamp_us", rs.frame_metadata_value.sensor_timestamp)):
+            if frame.supports_frame_metadata(value):
+                metadata[name] = frame.get_frame_metadata(value)
+        return metadata
+
+    def get_motion_blur(self, timestamp: float, metadata: Optional[dict] = None) -> Optional[float]:
+        """
+        Estimates the blur, in color pixels, that camera rotation caused in the frame captured at timestamp.
+
+        :param timestamp: float, Frame capture time in seconds, e.g. Frame.timestamp.
+        :param metadata: dict, Frame metadata; its exposure is used, otherwise a full frame interval is assumed.
+        :return: float, Blur length in pixels, or None without IMU samples.
+        """
+        if self.imu is None:
+            raise IntelRealSenseCameraException("IMU streaming is not enabled, start the camera with imu=True.")
+        exposure = (metadata or {}).get("exposure")
+        exposure_s = exposure * self.COLOR_EXPOSURE_UNIT_S if exposure else 1.0 / self.fps
+        return self.imu.motion_blur_px(timestamp, exposure_s, self.color_intrinsics.fx)
+
+    def is_frame_blurred(self, frame: Frame, max_blur_px: float = 1.5) -> bool:
+        """
+        Checks whether camera motion blurred a frame, to skip it before running inference.
+
+        :param frame: Frame, A frame captured by this camera.
+        :param max_blur_px: float, Largest acceptable blur in pixels.
+        :return: bool, True if the estimated blur exceeds max_blur_px.
+        """
+        blur = frame.metadata.get("motion_blur_px")
+        if blur is None:
+            blur = self.get_motion_blur(frame.timestamp, frame.metadata)
+        return blur is not None and blur > max_blur_px
+
+    def get_orientation(self, timestamp: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Returns the device orientation (w, x, y, z) from the IMU at a capture time, default the newest sample.
+        """
+        if self.imu is None:
+            raise IntelRealSenseCameraException("IMU streaming is not enabled, start the camera with imu=True.")
+        if timestamp is None:
+            span = self.imu.orientation.time_span()
+            if span is None:
+                return None
+            timestamp = span[1]
+        return self.imu.get_orientation(timestamp)
 
     def get_distance_at_point(self, depth_image:np.ndarray, x:int, y:int) -> float:
         """
@@ -252,21 +633,52 @@ class IntelRealSenseCamera(Camera):
             print(f"Depth error at ({x}, {y}): {e}")
             return (0.0, 0.0, 0.0)
 
+    def get_point_cloud(self, roi: Optional[Tuple[int, int, int, int]] = None, mask: Optional[np.ndarray] = None,
+                        with_color: bool = False, min_depth: Optional[float] = None,
+                        max_depth: Optional[float] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Deprojects the latest captured depth image into camera coordinates in one vectorized pass.
+
+        The returned arrays are reused by the next call, copy them to keep them.
+
+        :param roi: Tuple[int, int, int, int], Region (x0, y0, x1, y1) in image pixels, end exclusive. None uses the full frame.
+        :param mask: np.ndarray, Boolean image selecting pixels, e.g. a segmentation mask.
+        :param with_color: bool, Also return the color of every point. Needs depth aligned to color.
+        :param min_depth: float, Closest depth in meters kept.
+        :param max_depth: float, Farthest depth in meters kept.
+        :return: Tuple[np.ndarray, Optional[np.ndarray]], (N, 3) float32 points in meters and (N, 3) uint8 BGR colors or None.
+        """
+        if self.depth_image is None:
+            raise IntelRealSenseCameraException("No depth frame has been captured yet.")
+        aligned = self.align_switch and self.registration_mode != "on_demand"
+        if with_color and not aligned:
+            raise IntelRealSenseCameraException("Colored point clouds need depth aligned to color.")
+        if self.point_cloud is None:
+            intrinsics = self.color_intrinsics if aligned else self.depth_intrinsics
+            self.point_cloud = PointCloudGenerator(intrinsics, self.depth_scale)
+        return self.point_cloud.compute(self.depth_image, self.color_image if with_color else None,
+                                        roi=roi, mask=mask, min_depth=min_depth, max_depth=max_depth)
+
     def set_resolution(self, width: int, height: int) -> None:
         """
-        Sets the resolution of the camera frame.
+        Sets the resolution of the camera frame. A running camera is switched with reconfigure.
         """
-        self.release_camera()
-        self.width = width
-        self.height = height
-        self.start_camera()
+        if self.pipeline_started:
+            self.reconfigure(width=width, height=height)
+        else:
+            self.width = width
+            self.height = height
+            self.start_camera()
 
     def set_fps(self, fps: int) -> None:
         """
-        Sets the frames per second of the camera feed.
+        Sets the frames per second of the camera feed. A running camera is switched with reconfigure.
         """
-        self.fps = fps
-        self.set_resolution(self.width, self.height)
+        if self.pipeline_started:
+            self.reconfigure(fps=fps)
+        else:
+            self.fps = fps
+            self.start_camera()
 
     def get_setting_value(self, setting_name: str, sensor_type: str) -> Dict[str, float]:
         """
@@ -277,6 +689,8 @@ class IntelRealSenseCamera(Camera):
 
         :return: Dict[str, float], The current value, minimum value, maximum value, step value, and default value of the setting.
         """
+        if self.playback_from:
+            raise IntelRealSenseCameraException("Sensor settings are not available during .bag playback.")
         if sensor_type == 'color':
             return self.color_sensor_helper.get_camera_setting_value(setting_name)
         elif sensor_type == 'depth':
@@ -293,6 +707,8 @@ class IntelRealSenseCamera(Camera):
         :param sensor_type: str, The sensor type. Must be either 'color' or 'depth'.
         :param percentage: bool, Whether the value is a percentage. Defaults to True.
         """
+        if self.playback_from:
+            raise IntelRealSenseCameraException("Sensor settings are not available during .bag playback.")
         if sensor_type == 'color':
             self.color_sensor_helper.set_camera_setting_value(setting_name, value, percentage)
         elif sensor_type == 'depth':
@@ -300,13 +716,46 @@ class IntelRealSenseCamera(Camera):
         else:
             raise IntelRealSenseCameraException(f"Invalid sensor type: {sensor_type}. Must be either 'color' or 'depth'.")
 
+    def apply_settings_profile(self, profile: Union[str, Dict[str, Dict[str, float]]], percentage=False) -> Dict[str, float]:
+        """
+        Applies a settings profile such as a lighting preset. Both sensors' values are validated against
+        the cached option ranges before anything is written.
+
+        :param profile: Union[str, Dict], A name from settings_profiles, or a dict with 'color' and/or 'depth'
+                        mappings of setting names to values.
+        :param percentage: bool, Whether the values are percentages of the ranges.
+        :return: Dict[str, float], The per-sensor reports of RealSenseSettingsHelper.apply_profile and total_ms.
+        """
+        if self.playback_from:
+            raise IntelRealSenseCameraException("Sensor settings are not available during .bag playback.")
+        start = time.perf_counter()
+        if isinstance(profile, str):
+            if profile not in self.settings_profiles:
+                raise IntelRealSenseCameraException(f"Unknown settings profile: {profile}. Available: {list(self.settings_profiles)}")
+            profile = self.settings_profiles[profile]
+        unknown = set(profile) - {"color", "depth"}
+        if unknown:
+            raise IntelRealSenseCameraException(f"Invalid sensor type(s) in settings profile: {unknown}. Must be 'color' or 'depth'.")
+
+        helpers = {"color": self.color_sensor_helper, "depth": self.depth_sensor_helper}
+        for sensor_type, values in profile.items():
+            for setting_name, value in values.items():
+                helpers[sensor_type].validate_setting_value(setting_name, value, percentage)
+
+        report = {sensor_type: helpers[sensor_type].apply_profile(values, percentage) for sensor_type, values in profile.items()}
+        report["total_ms"] = (time.perf_counter() - start) * 1000
+        return report
+
     def start_camera(self, default=True) -> None:
         """
         Starts the camera, initializing it based on the model name provided.
 
         :param default: bool, Whether to set the camera settings to default values. Defaults to True.
         """
-        if self.check_camera_usage():
+        if self.playback_from:
+            return self._start_playback()
+
+        if self.check_usage and self.check_camera_usage():
             raise IntelRealSenseCameraException("The camera is currently in use by another process. Please stop the other process and try again.")
 
         devices = rs.context().query_devices()
@@ -315,21 +764,20 @@ class IntelRealSenseCamera(Camera):
 
         if self.model:
             self.camera_id, self.device_name = self.find_device_by_model()
-            self.config.enable_device(self.camera_id)
         elif self.camera_id is None:
             print("No camera ID specified, selecting the first available camera.")
             first_device = devices[0]
             self.camera_id = first_device.get_info(rs.camera_info.serial_number)
             self.device_name = first_device.get_info(rs.camera_info.name)
-            self.config.enable_device(self.camera_id)
         else:
-            self.config.enable_device(str(self.camera_id))
-
-        self.config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
-        self.config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+            self.camera_id = str(self.camera_id)
+            self.device_name = next((device.get_info(rs.camera_info.name) for device in devices
+                                     if device.get_info(rs.camera_info.serial_number) == self.camera_id), None)
 
         try:
-            self.profile = self.pipeline.start(self.config)
+            self._start_pipeline()
+            if self.supported_profiles is None:
+                self.supported_profiles = self.query_supported_profiles(self.profile.get_device())
             self.depth_sensor = self.profile.get_device().first_depth_sensor()
             if self.device_name == 'Intel RealSense D405':
                 self.color_sensor = self.profile.get_device().first_depth_sensor()
@@ -348,34 +796,221 @@ class IntelRealSenseCamera(Camera):
             self.color_sensor_helper = RealSenseSettingsHelper(self.color_sensor, self.color_settings)
             self.depth_scale = self.depth_sensor.get_depth_scale()
 
-            if self.align_switch:
-                self.align = rs.align(rs.stream.color)
-                print('Aligning color and depth frames')
-
-            self.pipeline.wait_for_frames()
-            self.pipeline_started = True
+            self._prepare_alignment()
+            self._wait_for_first_frame()
+            if self.imu_enabled and self.imu is None:
+                self.imu = RealSenseImu(self.camera_id, **self.imu_settings)
 
             if default:
-                for setting in self.color_settings:
-                    setting_values = self.color_sensor_helper.get_camera_setting_value(setting)
-                    self.color_sensor_helper.set_camera_setting_value(setting, setting_values['default_value'], percentage=False)
-                    print(f'Color Option {setting} set to {setting_values["default_value"]}')
-
-                for setting in self.depth_settings:
-                    setting_values = self.depth_sensor_helper.get_camera_setting_value(setting)
-                    self.depth_sensor_helper.set_camera_setting_value(setting, setting_values['default_value'], percentage=False)
-                    print(f'Depth Setting {setting} set to {setting_values["default_value"]}')
+                report = self.apply_settings_profile({"color": self.color_sensor_helper.get_default_profile(),
+                                                      "depth": self.depth_sensor_helper.get_default_profile()})
+                print(f"Color and depth settings set to defaults in {report['total_ms']:.1f} ms")
 
         except Exception as e:
             print(f"Failed to start camera: {e}")
             self.release_camera()
             raise IntelRealSenseCameraException(f"Failed to start camera: {e}")
         
+    def _start_playback(self) -> None:
+        """
+        Starts streaming from the .bag file in playback_from. Sensor settings are part of the recording,
+        so no settings helpers are created and no defaults are applied.
+        """
+        try:
+            self._start_pipeline()
+            device = self.profile.get_device()
+            self.camera_id = device.get_info(rs.camera_info.serial_number)
+            self.device_name = device.get_info(rs.camera_info.name)
+            color_profile = self.profile.get_stream(rs.stream.color).as_video_stream_profile()
+            self.width, self.height, self.fps = color_profile.width(), color_profile.height(), color_profile.fps()
+            self.depth_sensor = device.first_depth_sensor()
+            self.depth_scale = self.depth_sensor.get_depth_scale()
+            self.color_sensor = self.depth_sensor_helper = self.color_sensor_helper = None
+
+            print(f"Playing back {self.playback_from} ({self.device_name} {self.camera_id}, "
+                  f"{self.width}x{self.height}@{self.fps}, real time: {self.real_time})")
+            self._prepare_alignment()
+            self._wait_for_first_frame()
+        except Exception as e:
+            print(f"Failed to start playback: {e}")
+            self.release_camera()
+            raise IntelRealSenseCameraException(f"Failed to start playback: {e}")
+
+    def playback_finished(self) -> bool:
+        """
+        Checks whether a .bag playback reached the end of the file.
+        """
+        return self.playback is not None and not self.repeat_playback and \
+            self.playback.current_status() == rs.playback_status.stopped
+
+    def pause_recording(self) -> None:
+        if self.recorder is None:
+            raise IntelRealSenseCameraException("The camera is not recording.")
+        self.recorder.pause()
+
+    def resume_recording(self) -> None:
+        if self.recorder is None:
+            raise IntelRealSenseCameraException("The camera is not recording.")
+        self.recorder.resume()
+
+    def _start_pipeline(self) -> None:
+        """
+        Starts the pipeline with a fresh config for the current device, resolution and frame rate, or
+        for the .bag file being played back.
+        """
+        self.config = rs.config()
+        if self.playback_from:
+            self.config.enable_device_from_file(self.playback_from, repeat_playback=self.repeat_playback)
+            self.config.enable_stream(rs.stream.depth)
+            self.config.enable_stream(rs.stream.color)
+        else:
+            self.config.enable_device(self.camera_id)
+            self.config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
+            self.config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+            if self.record_to:
+                # librealsense writes the raw sensor frames on its own thread, at the full sensor rate
+                self.config.enable_record_to_file(self.record_to)
+        if self.capture_mode == "queue":
+            # keep_frames lets the worker hold framesets while librealsense keeps streaming
+            self.frame_queue = rs.frame_queue(self.queue_capacity, keep_frames=True)
+            self.profile = self.pipeline.start(self.config, self.frame_queue)
+        else:
+            self.profile = self.pipeline.start(self.config)
+        self.pipeline_started = True
+        device = self.profile.get_device()
+        self.playback = device.as_playback() if self.playback_from else None
+        self.recorder = device.as_recorder() if self.record_to else None
+        if self.playback is not None:
+            self.playback.set_real_time(self.real_time)
+        self.depth_intrinsics = self.profile.get_stream(rs.stream.depth).as_video_stream_profile().get_intrinsics()
+        self.color_intrinsics = self.profile.get_stream(rs.stream.color).as_video_stream_profile().get_intrinsics()
+        self.point_cloud = None
+
+    def _prepare_alignment(self) -> None:
+        if self.align_switch and self.registration_mode == "rs":
+            self.align = rs.align(rs.stream.color)
+            print('Aligning color and depth frames')
+        elif self.align_switch:
+            # The lookup maps depend on the intrinsics and resolution, so they are rebuilt on every start
+            self.registration = DepthRegistration.from_profile(self.profile, self.depth_scale)
+            self.raw_depth_image = None
+            print(f"Registering depth to color with lookup maps ({self.registration_mode})")
+
+    def _wait_for_first_frame(self) -> None:
+        """
+        Waits for the first frameset and, in queue mode, starts the capture worker. Playback does not
+        wait, so the first recorded frame is not skipped.
+        """
+        if self.capture_mode == "queue":
+            if not self.playback_from:
+                self.frame_queue.wait_for_frame(5000)
+            self._last_frame_numbers = {}
+            self.capture_running = True
+            self.capture_thread = threading.Thread(target=self._capture_worker, name="realsense-capture", daemon=True)
+            self.capture_thread.start()
+        elif not self.playback_from:
+            self.pipeline.wait_for_frames()
+
+    def _stop_pipeline(self) -> None:
+        self._stop_capture_worker()
+        if self.pipeline_started:
+            self.pipeline.stop()
+            self.pipeline_started = False
+        self.playback = self.recorder = None
+
+    @staticmethod
+    def query_supported_profiles(device) -> Dict[str, set]:
+        """
+        Lists the video stream profiles a device supports.
+
+        :param device: rs.device, The device.
+        :return: Dict[str, set], Per stream ('color', 'depth', ...) the supported (width, height, fps, format) tuples.
+        """
+        profiles = {}
+        for sensor in device.query_sensors():
+            for stream_profile in sensor.get_stream_profiles():
+                if not stream_profile.is_video_stream_profile():
+                    continue
+                video_profile = stream_profile.as_video_stream_profile()
+                stream = str(stream_profile.stream_type()).split(".")[-1]
+                profiles.setdefault(stream, set()).add((video_profile.width(), video_profile.height(),
+                                                        stream_profile.fps(), str(stream_profile.format()).split(".")[-1]))
+        return profiles
+
+    def get_supported_profiles(self, stream: str = "color") -> list:
+        """
+        Returns the resolutions and frame rates the camera supports for a stream, from the cache built at startup.
+
+        :param stream: str, 'color' or 'depth'.
+        :return: list, Sorted (width, height, fps) tuples in the format this class streams (bgr8 color, z16 depth).
+        """
+        stream_format = {"color": "bgr8", "depth": "z16"}[stream]
+        return sorted({profile[:3] for profile in (self.supported_profiles or {}).get(stream, ()) if profile[3] == stream_format})
+
+    def validate_profile(self, width: int, height: int, fps: int) -> None:
+        """
+        Checks that both streams support a resolution and frame rate.
+
+        :raises IntelRealSenseCameraException: If the color or depth stream does not support the profile.
+        """
+        if self.supported_profiles is None:
+            return
+        for stream in ("color", "depth"):
+            if (width, height, fps) not in self.get_supported_profiles(stream):
+                raise IntelRealSenseCameraException(f"The {stream} stream does not support {width}x{height}@{fps}. "
+                                                    f"Supported: {self.get_supported_profiles(stream)}")
+
+    def reconfigure(self, width: Optional[int] = None, height: Optional[int] = None, fps: Optional[int] = None) -> Dict[str, float]:
+        """
+        Switches the stream profile of a running camera. The profile is validated against the cached
+        supported profiles first, then only the pipeline is restarted: sensors, settings helpers and the
+        post-processing chain are kept, and there is no settle sleep or process probing.
+
+        :param width: int, The new width, None keeps the current one.
+        :param height: int, The new height, None keeps the current one.
+        :param fps: int, The new frame rate, None keeps the current one.
+        :return: Dict[str, float], Milliseconds spent stopping, starting, waiting for the first frame and in total.
+        """
+        if self.playback_from or self.record_to:
+            raise IntelRealSenseCameraException("Stream profiles cannot be changed while recording to or playing back a .bag file.")
+        width = self.width if width is None else width
+        height = self.height if height is None else height
+        fps = self.fps if fps is None else fps
+        self.validate_profile(width, height, fps)
+        if (width, height, fps) == (self.width, self.height, self.fps) and self.pipeline_started:
+            return {"stop_ms": 0.0, "start_ms": 0.0, "first_frame_ms": 0.0, "total_ms": 0.0}
+
+        previous = (self.width, self.height, self.fps)
+        start = time.perf_counter()
+        self._stop_pipeline()
+        stopped = time.perf_counter()
+        self.width, self.height, self.fps = width, height, fps
+        try:
+            self._start_pipeline()
+            self._prepare_alignment()
+            started = time.perf_counter()
+            self._wait_for_first_frame()
+        except Exception as e:
+            print(f"Failed to switch to {width}x{height}@{fps}, restoring {previous[0]}x{previous[1]}@{previous[2]}: {e}")
+            self._stop_pipeline()
+            self.width, self.height, self.fps = previous
+            self._start_pipeline()
+            self._prepare_alignment()
+            self._wait_for_first_frame()
+            raise IntelRealSenseCameraException(f"Failed to reconfigure camera: {e}")
+        end = time.perf_counter()
+        return {"stop_ms": (stopped - start) * 1000, "start_ms": (started - stopped) * 1000,
+                "first_frame_ms": (end - started) * 1000, "total_ms": (end - start) * 1000}
+
     def release_camera(self) -> None:
         """Release camera resources with proper cleanup."""
         print("***********Releasing camera resources...")
         try:
+            if self.imu is not None:
+                self.imu.stop()
+                self.imu = None
             if hasattr(self, 'pipeline') and self.pipeline:
+                self._stop_capture_worker()
                 if self.pipeline_started:
                     print("Stopping pipeline...")
                     self.pipeline.stop()
@@ -390,6 +1025,7 @@ class IntelRealSenseCamera(Camera):
                     print("Pipeline stopped successfully")
                     
             # Clear device references
+            self.playback = self.recorder = None
             if hasattr(self, 'depth_sensor'):
                 self.depth_sensor = None
             if hasattr(self, 'color_sensor'):
@@ -414,4 +1050,56 @@ class IntelRealSenseCamera(Camera):
         if depth:
             return {"color_intrinsics":color_intrinsics,"depth_intrinsics":depth_intrinsics}
         else:
-            return {"color_intrinsics":color_intrinsics,"depth_intrinsics":None}
\ No newline at end of file
+            return {"color_intrinsics":color_intrinsics,"depth_intrinsics":None}
+
+def benchmark_reconfiguration(camera: IntelRealSenseCamera, profiles, repeats: int = 3, compare_release: bool = True) -> dict:
+    """
+    Measures how long switching stream profiles takes with reconfigure, and optionally with the
+    release_camera/start_camera cycle it replaces.
+
+    :param camera: IntelRealSenseCamera, A started camera.
+    :param profiles: List[Tuple[int, int, int]], (width, height, fps) profiles to cycle through.
+    :param repeats: int, Number of passes over the profiles.
+    :param compare_release: bool, Also time one release_camera/start_camera cycle.
+    :return: dict, Mean and max milliseconds per reconfigure with its stop/start/first frame breakdown.
+    """
+    original = (camera.width, camera.height, camera.fps)
+    timings = []
+    for _ in range(repeats):
+        for width, height, fps in profiles:
+            timings.append(camera.reconfigure(width, height, fps))
+    camera.reconfigure(*original)
+
+    result = {key: float(np.mean([timing[key] for timing in timings])) for key in timings[0]}
+    result["max_total_ms"] = max(timing["total_ms"] for timing in timings)
+    result["switches"] = len(timings)
+    if compare_release:
+        start = time.perf_counter()
+        camera.release_camera()
+        camera.start_camera(default=False)
+        result["release_start_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark stream profile switching on a RealSense camera.")
+    parser.add_argument("--profiles", default="640x480@30,1280x720@15,640x480@60",
+                        help="Comma separated WIDTHxHEIGHT@FPS profiles")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--capture-mode", default="poll")
+    args = parser.parse_args()
+
+    profiles = []
+    for profile in args.profiles.split(","):
+        resolution, fps = profile.split("@")
+        width, height = resolution.split("x")
+        profiles.append((int(width), int(height), int(fps)))
+
+    camera = IntelRealSenseCamera(capture_mode=args.capture_mode)
+    try:
+        print("Supported color profiles:", camera.get_supported_profiles("color"))
+        print(benchmark_reconfiguration(camera, profiles, args.repeats))
+    finally:
+        camera.release_camera()
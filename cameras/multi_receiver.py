@@ -0,0 +1,168 @@
+"""
+This file contains the code for receiving frames from several cameras at once and aligning them by capture time.
+"""
+import asyncio
+import logging
+from collections import namedtuple
+
+from RAIT.config.config import load_config
+from RAIT.cameras.recevier import CameraReceiver
+
+SyncedFrame = namedtuple("SyncedFrame", ["color", "depth", "timestamp", "intrinsics"])
+
+
+class MultiCameraReceiver:
+    """
+    Subscribes to several WebSocket camera streams on one event loop and yields frame sets whose
+    capture timestamps agree within a tolerance.
+
+    Cameras are listed under `Stream.Cameras`; each entry overrides the shared `Stream` settings:
+
+        Stream:
+          Websocket_server: "ws://host:3000"
+          Sync_tolerance: 0.02
+          Cameras:
+            - Name: "front"
+              Websocket_topic: "/home/front"
+              Camera_name: "D435I"
+              Location: "India"
+    """
+    def __init__(self, config):
+        """
+        Initializes one CameraReceiver per configured camera.
+
+        Args:
+            config (dict): Configuration dictionary containing the Stream and Camera sections.
+        """
+        stream_config = config.get('Stream', {})
+        self.tolerance = stream_config.get("Sync_tolerance", 0.02)
+        self.receivers = {}
+        self.camera_models = {}
+        self.intrinsics = {}
+        self.sync_stats = {"sets": 0, "unmatched": 0, "last_skew_s": None}
+
+        shared = {key: value for key, value in stream_config.items() if key != "Cameras"}
+        for index, camera in enumerate(stream_config.get("Cameras", [])):
+            name = camera.get("Name", f"camera_{index}")
+            camera_stream = {**shared, **camera, "Drain": True, "Drain_policy": "fifo"}
+            camera_stream["Ring_size"] = max(camera_stream.get("Ring_size", 1), 8)
+            receiver = CameraReceiver({"Stream": camera_stream, "Camera": config.get('Camera', {})})
+            self.receivers[name] = receiver
+            self.camera_models[name] = (camera.get("Camera_name", "D435I"), camera.get("Location", "India"))
+
+    async def connect(self):
+        """
+        Connects all receivers concurrently and resolves their intrinsics.
+
+        Returns:
+            bool: True if every camera is connected.
+        """
+        await asyncio.gather(*(receiver.connect() for receiver in self.receivers.values()))
+        for name, receiver in self.receivers.items():
+            camera_name, location = self.camera_models[name]
+            try:
+                self.intrinsics[name] = receiver._get_intrinsics(location=location, camera_name=camera_name)
+            except KeyError:
+                logging.warning(f"No intrinsics configured for {camera_name}/{location}, camera '{name}'.")
+                self.intrinsics[name] = None
+        connected = all(receiver.websocket is not None for receiver in self.receivers.values())
+        if not connected:
+            logging.error("Not every camera stream could be connected.")
+        return connected
+
+    async def _wait_for_any(self):
+        """
+        Waits until a receiver with an empty ring buffered a new frame. Receivers that already hold
+        frames are not waited on, their wait_for_frame would return at once and spin the caller
+        while another camera is idle.
+        """
+        empty = [receiver for receiver in self.receivers.values() if not receiver._ring]
+        if not empty:
+            return
+        waiters = [asyncio.ensure_future(receiver.wait_for_frame()) for receiver in empty]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def synchronized_frames(self):
+        """
+        Asynchronous generator of frame sets aligned by capture timestamp.
+
+        The newest frame of the slowest camera is used as the reference; every other camera must
+        have a buffered frame within `Sync_tolerance` seconds of it, otherwise the reference frame
+        is discarded and the next one is tried.
+
+        Yields:
+            dict: Camera name to SyncedFrame(color, depth, timestamp, intrinsics).
+        """
+        if not self.receivers:
+            logging.error("No cameras configured under Stream.Cameras.")
+            return
+
+        try:
+            while True:
+                for receiver in self.receivers.values():
+                    if not await receiver.ensure_draining():
+                        return
+
+                latest = {name: receiver.latest_timestamp() for name, receiver in self.receivers.items()}
+                if any(timestamp is None for timestamp in latest.values()):
+                    await self._wait_for_any()
+                    continue
+
+                reference_name = min(latest, key=latest.get)
+                reference = latest[reference_name]
+                closest = {name: receiver.closest_timestamp(reference) for name, receiver in self.receivers.items()}
+                skew = max(abs(timestamp - reference) for timestamp in closest.values())
+
+                if skew > self.tolerance:
+                    self.sync_stats["unmatched"] += 1
+                    self.receivers[reference_name].discard_until(reference)
+                    continue
+
+                taken = {name: receiver.take_closest(reference) for name, receiver in self.receivers.items()}
+                decoded = await asyncio.gather(*(self.receivers[name]._decode_async(message)
+                                                 for name, (_, message) in taken.items()),
+                                               return_exceptions=True)
+
+                frame_set = {}
+                for (name, (timestamp, _)), result in zip(taken.items(), decoded):
+                    if isinstance(result, Exception):
+                        logging.error(f"Error decoding frames from camera '{name}': {result}")
+                        color_frame, depth_frame = None, None
+                    else:
+                        color_frame, depth_frame = result[0]
+                    frame_set[name] = SyncedFrame(color_frame, depth_frame, timestamp, self.intrinsics[name])
+
+                self.sync_stats["sets"] += 1
+                self.sync_stats["last_skew_s"] = skew
+                yield frame_set
+        except asyncio.CancelledError:
+            logging.info("Synchronized frame loop has been cancelled.")
+        finally:
+            await self.cleanup()
+
+    async def cleanup(self):
+        """
+        Closes all camera connections.
+        """
+        await asyncio.gather(*(receiver.cleanup() for receiver in self.receivers.values()))
+
+
+if __name__ == "__main__":
+    import cv2
+
+    async def main():
+        receiver = MultiCameraReceiver(load_config("config/config.yaml"))
+        if await receiver.connect():
+            async for frame_set in receiver.synchronized_frames():
+                for name, frame in frame_set.items():
+                    if frame.color is not None:
+                        cv2.imshow(name, frame.color)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        cv2.destroyAllWindows()
+
+    asyncio.run(main())
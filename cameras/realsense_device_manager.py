@@ -0,0 +1,285 @@
+"""
+This file contains a manager that runs every RealSense camera connected to the host at the same time,
+with inter-camera hardware sync where the devices support it, and publishes them as one multi-stream
+source.
+
+Each device gets its own IntelRealSenseCamera in 'queue' capture mode (librealsense pushes framesets
+to a per-device worker thread) and its own CameraPublisher thread, so a slow device never holds up
+the others.
+
+Run this file to list the connected devices and print per-device stats while streaming:
+    python -m RAIT.cameras.realsense_device_manager --seconds 10
+"""
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import pyrealsense2 as rs
+
+from RAIT.cameras.camera_publisher import CameraPublisher
+from RAIT.cameras.exceptions import IntelRealSenseCameraException
+from RAIT.cameras.intel_realsense_camera import IntelRealSenseCamera
+
+# Values of rs.option.inter_cam_sync_mode on D400 devices
+SYNC_MODES = {"default": 0, "master": 1, "slave": 2}
+
+DeviceInfo = namedtuple("DeviceInfo", ["serial", "name", "firmware", "supports_sync"])
+
+
+def enumerate_devices() -> List[DeviceInfo]:
+    """
+    Lists the connected RealSense devices.
+
+    :return: List[DeviceInfo], Serial number, name, firmware version and hardware sync support of every device.
+    """
+    devices = []
+    for device in rs.context().query_devices():
+        sensor = device.first_depth_sensor()
+        devices.append(DeviceInfo(device.get_info(rs.camera_info.serial_number),
+                                  device.get_info(rs.camera_info.name),
+                                  device.get_info(rs.camera_info.firmware_version),
+                                  sensor.supports(rs.option.inter_cam_sync_mode)))
+    return devices
+
+
+class RealSenseDeviceManager:
+    """
+    Starts one pipeline per connected RealSense device and exposes all of them as one publisher.
+
+    With sync on, the master device drives the exposure of the others over the sync cable
+    (inter_cam_sync_mode 1 on the master, 2 on the slaves) and every sensor stamps frames in the global
+    time domain, so capture timestamps can be compared across devices. get_synced pairs the frames of
+    all devices by those timestamps.
+
+    Usage:
+        manager = RealSenseDeviceManager(width=640, height=480, fps=30)
+        frames = manager.get_synced()          # {serial: Frame} or None
+        manager.subscribe(callback)            # callback(images, image_queue) for every device
+        print(manager.get_stats())
+        manager.stop()
+    """
+    def __init__(self, serials: Optional[List[str]] = None, width: int = 640, height: int = 480, fps: int = 30,
+                 sync: bool = True, master_serial: Optional[str] = None, sync_tolerance: Optional[float] = None,
+                 queue_size: int = 3, camera_kwargs: Optional[dict] = None, start: bool = True):
+        """
+        :param serials: List[str], Serial numbers to run, None runs every connected device.
+        :param width: int, Frame width of every device.
+        :param height: int, Frame height of every device.
+        :param fps: int, Frame rate of every device.
+        :param sync: bool, Configure inter-camera hardware sync where supported.
+        :param master_serial: str, The device driving the sync signal, defaults to the first device supporting sync.
+        :param sync_tolerance: float, Seconds by which synced frames may differ, defaults to half a frame.
+        :param queue_size: int, Frames held per device for get_synced.
+        :param camera_kwargs: dict, Extra IntelRealSenseCamera arguments, e.g. post_processing or registration.
+        :param start: bool, Start all devices right away.
+        """
+        self.devices = {device.serial: device for device in enumerate_devices()}
+        if not self.devices:
+            raise IntelRealSenseCameraException("No RealSense devices connected.")
+        self.serials = list(serials) if serials else list(self.devices)
+        missing = [serial for serial in self.serials if serial not in self.devices]
+        if missing:
+            raise IntelRealSenseCameraException(f"RealSense devices {missing} not connected, found {list(self.devices)}.")
+
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.sync = sync
+        self.master_serial = master_serial
+        self.sync_tolerance = sync_tolerance if sync_tolerance is not None else 0.5 / fps
+        self.queue_size = queue_size
+        self.camera_kwargs = camera_kwargs or {}
+
+        self.cameras: Dict[str, IntelRealSenseCamera] = {}
+        self.publishers: Dict[str, CameraPublisher] = {}
+        self.sync_modes: Dict[str, str] = {}
+        self.sync_stats = {"sets": 0, "unmatched": 0, "last_skew_s": None}
+        self.lock = threading.Lock()
+        self._rate_marks = {}
+
+        if start:
+            self.start()
+
+    def __repr__(self):
+        return f'RealSenseDeviceManager(serials={self.serials}, width={self.width}, height={self.height}, fps={self.fps})'
+
+    def configure_sync(self) -> None:
+        """
+        Sets the inter-camera sync mode of every device before its pipeline starts and switches all
+        sensors to global timestamps. Devices without sync support run free.
+        """
+        devices = {device.get_info(rs.camera_info.serial_number): device for device in rs.context().query_devices()}
+        capable = [serial for serial in self.serials if self.devices[serial].supports_sync]
+        if self.master_serial is None and capable:
+            self.master_serial = capable[0]
+
+        for serial in self.serials:
+            sensors = devices[serial].query_sensors()
+            for sensor in sensors:
+                if sensor.supports(rs.option.global_time_enabled):
+                    sensor.set_option(rs.option.global_time_enabled, 1)
+
+            if not self.sync or serial not in capable:
+                self.sync_modes[serial] = "none"
+                continue
+            mode = "master" if serial == self.master_serial else "slave"
+            devices[serial].first_depth_sensor().set_option(rs.option.inter_cam_sync_mode, SYNC_MODES[mode])
+            self.sync_modes[serial] = mode
+            print(f"Device {serial}: sync mode {mode}")
+
+    def _start_device(self, serial: str) -> None:
+        camera = IntelRealSenseCamera(camera_id=serial, width=self.width, height=self.height, fps=self.fps,
+                                      capture_mode="queue", check_usage=False, **self.camera_kwargs)
+        try:
+            publisher = CameraPublisher(camera, queue_size=self.queue_size, start_publisher=True)
+        except Exception:
+            # The manager only tracks devices that started completely, release this one here
+            camera.release_camera()
+            raise
+        with self.lock:
+            self.cameras[serial] = camera
+            self.publishers[serial] = publisher
+
+    def start(self) -> None:
+        """
+        Configures sync and starts every device on its own thread. Starting a device waits for its
+        first frame, so doing it concurrently keeps start-up time close to that of a single camera.
+        """
+        self.configure_sync()
+        with ThreadPoolExecutor(max_workers=len(self.serials)) as executor:
+            results = {serial: executor.submit(self._start_device, serial) for serial in self.serials}
+        errors = {}
+        for serial, result in results.items():
+            error = result.exception()
+            if error is not None:
+                errors[serial] = error
+        if errors:
+            self.stop()
+            raise IntelRealSenseCameraException(f"Failed to start RealSense devices: {errors}")
+
+    def stop(self) -> None:
+        """
+        Stops every publisher and releases every camera, concurrently.
+        """
+        with self.lock:
+            publishers = list(self.publishers.values())
+            self.publishers.clear()
+            self.cameras.clear()
+        if publishers:
+            with ThreadPoolExecutor(max_workers=len(publishers)) as executor:
+                list(executor.map(CameraPublisher.stop_publisher, publishers))
+
+    def subscribe(self, callback: Callable, serial: Optional[str] = None, max_pending: int = 2,
+                  overflow: str = "drop_oldest") -> list:
+        """
+        Registers a callback(images, image_queue) for one device or for all of them. Every device calls
+        it from its own subscriber thread.
+
+        :param callback: Callable, The subscriber callback.
+        :param serial: str, The device, None subscribes to every device.
+        :param max_pending: int, Frames buffered per device before the overflow policy applies.
+        :param overflow: str, One of 'drop_oldest', 'drop_newest' or 'block'.
+        :return: list, The Subscriber of every device subscribed to.
+        """
+        serials = [serial] if serial is not None else list(self.publishers)
+        return [self.publishers[serial].subscribe(callback, max_pending=max_pending, overflow=overflow) for serial in serials]
+
+    def unsubscribe(self, callback: Callable) -> None:
+        for publisher in self.publishers.values():
+            publisher.unsubscribe(callback)
+
+    def get_latest(self) -> Dict[str, object]:
+        """
+        Returns the newest frame of every device that has one, copied out of the frame pool so it can
+        be kept.
+
+        :return: Dict[str, Frame], Frames by serial number.
+        """
+        latest = {}
+        for serial, publisher in self.publishers.items():
+            entry = publisher.image_queue.wait_for_next(0, timeout=0, latest=True, lease=True)
+            if entry is not None:
+                latest[serial] = entry.image.detach()
+        return latest
+
+    def get_synced(self, tolerance: Optional[float] = None) -> Optional[Dict[str, object]]:
+        """
+        Returns one frame per device captured at the same moment: the newest frame of the device that is
+        furthest behind, and the frame of every other device closest to it in time.
+
+        :param tolerance: float, Seconds by which the capture times may differ, defaults to sync_tolerance.
+        :return: Dict[str, Frame] by serial number, copied out of the frame pool, or None if some device has
+                 no frame close enough.
+        """
+        tolerance = self.sync_tolerance if tolerance is None else tolerance
+        queues = {serial: publisher.image_queue for serial, publisher in self.publishers.items()}
+        newest = [queue.wait_for_next(0, timeout=0, latest=True) for queue in queues.values()]
+        if not queues or any(entry is None for entry in newest):
+            return None
+
+        reference = min(entry.timestamp for entry in newest)
+        matched = {serial: queue.get_closest(reference, lease=True) for serial, queue in queues.items()}
+        timestamps = [entry.timestamp for entry in matched.values()]
+        skew = max(timestamps) - min(timestamps)
+        self.sync_stats["last_skew_s"] = skew
+        if skew > tolerance:
+            self.sync_stats["unmatched"] += 1
+            for entry in matched.values():
+                entry.image.release()
+            return None
+        self.sync_stats["sets"] += 1
+        return {serial: entry.image.detach() for serial, entry in matched.items()}
+
+    def get_stats(self) -> Dict[str, dict]:
+        """
+        Returns per-device statistics: sync mode, frames published, frame rate since the previous call,
+        age of the newest frame, capture worker and post-processing stats, and subscriber stats, plus the
+        frame set matching stats under 'sync'.
+        """
+        now = time.monotonic()
+        stats = {}
+        for serial, publisher in self.publishers.items():
+            camera = self.cameras[serial]
+            previous_time, previous_count = self._rate_marks.get(serial, (None, None))
+            fps = None if previous_time is None else (publisher.frame_count - previous_count) / max(now - previous_time, 1e-9)
+            self._rate_marks[serial] = (now, publisher.frame_count)
+            newest = publisher.image_queue.wait_for_next(0, timeout=0, latest=True)
+            stats[serial] = {
+                "name": self.devices[serial].name,
+                "sync_mode": self.sync_modes.get(serial, "none"),
+                "frames": publisher.frame_count,
+                "fps": fps,
+                "frame_age_s": None if newest is None else time.time() - newest.timestamp,
+                "capture": camera.get_capture_stats(),
+                "filters": camera.get_filter_stats(),
+                "subscribers": publisher.get_subscriber_stats(),
+            }
+        stats["sync"] = dict(self.sync_stats)
+        return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run every connected RealSense camera and print per-device stats.")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--no-sync", action="store_true")
+    args = parser.parse_args()
+
+    for device in enumerate_devices():
+        print(device)
+    manager = RealSenseDeviceManager(width=args.width, height=args.height, fps=args.fps, sync=not args.no_sync)
+    try:
+        manager.get_stats()
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            time.sleep(1.0)
+            manager.get_synced()
+            print(manager.get_stats())
+    finally:
+        manager.stop()
@@ -0,0 +1,432 @@
+"""
+This file contains high-rate IMU capture for RealSense devices with a motion module (D435I, D455).
+
+The accelerometer and gyro run on their own pipeline and thread, so they stream at their full rates
+(up to 250 Hz and 400 Hz on the D435I) next to the color/depth pipeline without being paired into its
+framesets. Samples are stamped in the same time base as Frame.timestamp (global time domain, seconds)
+and stored in preallocated ring buffers, which answer interpolated queries such as the angular rate
+or the orientation at the capture time of a frame. That is enough to estimate the motion blur of a
+frame from its exposure and skip blurred frames before running inference on them.
+
+Run this file to stream the IMU and print the angular rate and orientation:
+    python -m RAIT.cameras.realsense_imu --seconds 10
+"""
+import threading
+import time
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pyrealsense2 as rs
+
+from RAIT.cameras.exceptions import IntelRealSenseCameraException
+
+
+class ImuRingBuffer:
+    """
+    Fixed-size ring of timestamped samples, preallocated once, with vectorized interpolated lookups.
+
+    Samples are expected in increasing timestamp order, as the device delivers them. Queries outside
+    the buffered time span return the oldest or newest sample.
+
+    Args:
+        capacity (int): Samples kept; the oldest sample is overwritten when the ring is full.
+        channels (int): Values per sample, 3 for accel/gyro and 4 for orientation quaternions.
+    """
+    def __init__(self, capacity: int, channels: int = 3):
+        self.capacity = capacity
+        self.channels = channels
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, channels), dtype=np.float32)
+        self.head = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f'ImuRingBuffer(capacity={self.capacity}, channels={self.channels}, count={self.count})'
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp: float, values) -> None:
+        with self.lock:
+            self.times[self.head] = timestamp
+            self.values[self.head] = values
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.head = 0
+            self.count = 0
+
+    def _start(self) -> int:
+        # Physical index of the oldest sample
+        return self.head if self.count == self.capacity else 0
+
+    def _search(self, timestamps: np.ndarray, side: str = "left") -> np.ndarray:
+        """
+        Returns the logical insertion index (0 = oldest) of every timestamp, like np.searchsorted.
+        """
+        if self.count < self.capacity or self.head == 0:
+            start = self._start()
+            return np.searchsorted(self.times[start:start + self.count], timestamps, side)
+        older, newer = self.times[self.head:], self.times[:self.head]
+        return np.where(timestamps > older[-1], older.size + np.searchsorted(newer, timestamps, side),
+                        np.searchsorted(older, timestamps, side))
+
+    def _physical(self, index: np.ndarray) -> np.ndarray:
+        return (self._start() + index) % self.capacity
+
+    def interpolate(self, timestamps: Union[float, np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Linearly interpolates the samples at one or more timestamps.
+
+        Args:
+            timestamps (Union[float, np.ndarray]): Time or times in seconds.
+
+        Returns:
+            Optional[np.ndarray]: (channels,) values for a scalar time, (N, channels) for an array of
+            times, or None while the buffer is empty.
+        """
+        query = np.atleast_1d(np.asarray(timestamps, dtype=np.float64))
+        with self.lock:
+            if self.count == 0:
+                return None
+            upper = np.clip(self._search(query), 1, max(self.count - 1, 1))
+            lower = upper - 1
+            if self.count == 1:
+                upper = lower = np.zeros_like(upper)
+            lower, upper = self._physical(lower), self._physical(upper)
+            t0, t1 = self.times[lower], self.times[upper]
+            weight = np.clip((query - t0) / np.maximum(t1 - t0, 1e-12), 0.0, 1.0).astype(np.float32)[:, None]
+            result = self.values[lower] * (1 - weight) + self.values[upper] * weight
+        return result[0] if np.ndim(timestamps) == 0 else result
+
+    def window(self, start_time: float, end_time: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Copies the samples with start_time <= timestamp <= end_time.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N,) timestamps and (N, channels) values, oldest first.
+        """
+        with self.lock:
+            first = self._search(np.array(start_time))
+            last = self._search(np.array(end_time), side="right")
+            index = self._physical(np.arange(first, last))
+            return self.times[index], self.values[index]
+
+    def latest(self) -> Optional[Tuple[float, np.ndarray]]:
+        with self.lock:
+            if self.count == 0:
+                return None
+            index = (self.head - 1) % self.capacity
+            return float(self.times[index]), self.values[index].copy()
+
+    def time_span(self) -> Optional[Tuple[float, float]]:
+        """
+        Returns the timestamps of the oldest and newest buffered samples.
+        """
+        with self.lock:
+            if self.count == 0:
+                return None
+            return float(self.times[self._start()]), float(self.times[(self.head - 1) % self.capacity])
+
+
+def quaternion_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Hamilton product of (w, x, y, z) quaternions.
+    """
+    w0, x0, y0, z0 = a
+    w1, x1, y1, z1 = b
+    return np.array([w0 * w1 - x0 * x1 - y0 * y1 - z0 * z1,
+                     w0 * x1 + x0 * w1 + y0 * z1 - z0 * y1,
+                     w0 * y1 - x0 * z1 + y0 * w1 + z0 * x1,
+                     w0 * z1 + x0 * y1 - y0 * x1 + z0 * w1])
+
+
+def rotate_to_body(q: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """
+    Expresses a vector of the reference frame in the body frame of orientation q (rotation by q^-1).
+    """
+    conjugate = q * np.array([1.0, -1.0, -1.0, -1.0])
+    return quaternion_multiply(quaternion_multiply(conjugate, np.concatenate(([0.0], vector))), q)[1:]
+
+
+class RealSenseImu:
+    """
+    Streams the accelerometer and gyro of a RealSense device on a dedicated pipeline and thread.
+
+    The orientation is the gyro integrated over time, with the accelerometer slowly pulling the tilt
+    back to gravity (a complementary filter, weight accel_weight) so the roll and pitch do not drift.
+    Yaw drifts slowly, which does not matter for the short-term motion checks this is meant for. The
+    reference frame is the device pose at the first accelerometer sample, expressed in the IMU axes.
+
+    Usage:
+        imu = RealSenseImu(camera_id)
+        imu.get_angular_velocity(frame.timestamp)       # rad/s, interpolated
+        imu.get_orientation(frame.timestamp)            # (w, x, y, z)
+        if imu.motion_blur_px(frame.timestamp, exposure_s, focal_px) > 1.5:
+            skip the frame
+
+    Args:
+        camera_id (Optional[str]): Serial number of the device, None uses the first device with an IMU.
+        accel_fps (int): Accelerometer rate, 63 or 250 on the D435I.
+        gyro_fps (int): Gyro rate, 200 or 400 on the D435I.
+        buffer_seconds (float): Seconds of samples kept for queries.
+        accel_weight (float): Share of the tilt error to gravity corrected per gyro sample.
+        queue_capacity (int): Motion frames librealsense buffers for the worker thread.
+        start (bool): Start streaming right away.
+    """
+    def __init__(self, camera_id: Optional[str] = None, accel_fps: int = 250, gyro_fps: int = 400,
+                 buffer_seconds: float = 10.0, accel_weight: float = 0.02, queue_capacity: int = 64, start: bool = True):
+        self.camera_id = camera_id
+        self.accel_fps = accel_fps
+        self.gyro_fps = gyro_fps
+        self.buffer_seconds = buffer_seconds
+        self.accel_weight = accel_weight
+        self.queue_capacity = queue_capacity
+
+        self.accel = ImuRingBuffer(int(buffer_seconds * accel_fps) + 1)
+        self.gyro = ImuRingBuffer(int(buffer_seconds * gyro_fps) + 1)
+        self.orientation = ImuRingBuffer(int(buffer_seconds * gyro_fps) + 1, channels=4)
+        self._quaternion = np.array([1.0, 0.0, 0.0, 0.0])
+        self._gravity = None
+        self._last_accel = None
+        self._last_gyro_time = None
+
+        self.pipeline = None
+        self.frame_queue = None
+        self.running = False
+        self.thread = None
+        self.stats = {"accel": 0, "gyro": 0, "timeouts": 0, "process_us": 0.0}
+
+        if start:
+            self.start()
+
+    def __repr__(self):
+        return f'RealSenseImu(camera_id={self.camera_id}, accel_fps={self.accel_fps}, gyro_fps={self.gyro_fps})'
+
+    def start(self) -> None:
+        """
+        Enables the motion streams, switches the motion sensor to global timestamps and starts the worker thread.
+        """
+        if self.running:
+            return
+        config = rs.config()
+        if self.camera_id:
+            config.enable_device(self.camera_id)
+        config.enable_stream(rs.stream.accel, rs.format.motion_xyz32f, self.accel_fps)
+        config.enable_stream(rs.stream.gyro, rs.format.motion_xyz32f, self.gyro_fps)
+
+        self.pipeline = rs.pipeline()
+        self.frame_queue = rs.frame_queue(self.queue_capacity)
+        try:
+            profile = self.pipeline.start(config, self.frame_queue)
+        except RuntimeError as e:
+            raise IntelRealSenseCameraException(f"Failed to start the IMU streams: {e}")
+        device = profile.get_device()
+        self.camera_id = device.get_info(rs.camera_info.serial_number)
+        sensor = device.first_motion_sensor()
+        if sensor.supports(rs.option.global_time_enabled):
+            sensor.set_option(rs.option.global_time_enabled, 1)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="realsense-imu", daemon=True)
+        self.thread.start()
+        print(f"IMU streaming on {self.camera_id}: accel {self.accel_fps} Hz, gyro {self.gyro_fps} Hz")
+
+    def stop(self) -> None:
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+
+    @staticmethod
+    def get_sample_timestamp(frame) -> float:
+        """
+        Returns the capture time of a motion frame in seconds, in the time base of Frame.timestamp.
+        """
+        if frame.get_frame_timestamp_domain() in (rs.timestamp_domain.global_time, rs.timestamp_domain.system_time):
+            return frame.get_timestamp() / 1000.0
+        return time.time()
+
+    def _worker(self) -> None:
+        while self.running:
+            try:
+                frame = self.frame_queue.wait_for_frame(1000)
+            except RuntimeError:
+                self.stats["timeouts"] += 1
+                continue
+            start = time.perf_counter()
+            data = frame.as_motion_frame().get_motion_data()
+            sample = np.array([data.x, data.y, data.z])
+            timestamp = self.get_sample_timestamp(frame)
+            if frame.get_profile().stream_type() == rs.stream.gyro:
+                self._add_gyro(timestamp, sample)
+            else:
+                self._add_accel(timestamp, sample)
+            self.stats["process_us"] = (time.perf_counter() - start) * 1e6
+
+    def _add_accel(self, timestamp: float, sample: np.ndarray) -> None:
+        self.stats["accel"] += 1
+        self.accel.append(timestamp, sample)
+        norm = np.linalg.norm(sample)
+        if norm > 0:
+            self._last_accel = sample / norm
+            if self._gravity is None:
+                self._gravity = self._last_accel
+
+    def _add_gyro(self, timestamp: float, rate: np.ndarray) -> None:
+        self.stats["gyro"] += 1
+        self.gyro.append(timestamp, rate)
+        if self._last_gyro_time is not None and self._gravity is not None:
+            dt = min(max(timestamp - self._last_gyro_time, 0.0), 0.1)
+            if self._last_accel is not None and self.accel_weight:
+                # Turn towards the measured gravity direction: the cross product of measured and
+                # expected gravity is the axis (and, for small angles, the rate) of the correction
+                expected = rotate_to_body(self._quaternion, self._gravity)
+                rate = rate + self.accel_weight * np.cross(self._last_accel, expected) / max(dt, 1e-3)
+            angle = np.linalg.norm(rate) * dt
+            if angle > 0:
+                axis = rate / np.linalg.norm(rate)
+                delta = np.concatenate(([np.cos(angle / 2)], axis * np.sin(angle / 2)))
+                self._quaternion = quaternion_multiply(self._quaternion, delta)
+                self._quaternion /= np.linalg.norm(self._quaternion)
+        self._last_gyro_time = timestamp
+        self.orientation.append(timestamp, self._quaternion)
+
+    def get_angular_velocity(self, timestamp: Union[float, np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Returns the gyro rate (rad/s, IMU axes) interpolated at one or more times in seconds.
+        """
+        return self.gyro.interpolate(timestamp)
+
+    def get_acceleration(self, timestamp: Union[float, np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Returns the acceleration (m/s^2, IMU axes) interpolated at one or more times in seconds.
+        """
+        return self.accel.interpolate(timestamp)
+
+    def get_orientation(self, timestamp: Union[float, np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Returns the orientation (w, x, y, z) at one or more times in seconds. Neighbouring samples are
+        a few milliseconds apart, so normalized linear interpolation is as accurate as slerp.
+        """
+        orientation = self.orientation.interpolate(timestamp)
+        if orientation is None:
+            return None
+        return orientation / np.linalg.norm(orientation, axis=-1, keepdims=True)
+
+    def get_angular_speed(self, start_time: float, end_time: float) -> Optional[float]:
+        """
+        Returns the highest angular speed (rad/s) between two times, including the interpolated rates at both ends.
+        """
+        ends = self.gyro.interpolate(np.array([start_time, end_time]))
+        if ends is None:
+            return None
+        _, rates = self.gyro.window(start_time, end_time)
+        return float(np.linalg.norm(np.concatenate((rates, ends)), axis=1).max())
+
+    def get_rotation(self, start_time: float, end_time: float) -> Optional[float]:
+        """
+        Returns the angle (rad) the device turned between two times.
+        """
+        orientations = self.get_orientation(np.array([start_time, end_time]))
+        if orientations is None:
+            return None
+        dot = abs(float(np.dot(orientations[0], orientations[1])))
+        return 2 * np.arccos(min(dot, 1.0))
+
+    def motion_blur_px(self, timestamp: float, exposure_s: float, focal_px: float) -> Optional[float]:
+        """
+        Estimates the motion blur, in pixels, that camera rotation caused in a frame: the highest
+        angular speed during the exposure times the exposure time and the focal length. The exposure is
+        taken to end at the frame timestamp. Translation is ignored, it blurs far less than rotation at
+        working distances.
+
+        Args:
+            timestamp (float): Frame capture time in seconds, e.g. Frame.timestamp.
+            exposure_s (float): Exposure time in seconds.
+            focal_px (float): Focal length in pixels, e.g. the fx of the color intrinsics.
+
+        Returns:
+            Optional[float]: Blur length in pixels, or None without gyro samples.
+        """
+        speed = self.get_angular_speed(timestamp - exposure_s, timestamp)
+        return None if speed is None else speed * exposure_s * focal_px
+
+    def is_moving(self, timestamp: Optional[float] = None, window_s: float = 0.05, threshold: float = 0.05) -> bool:
+        """
+        Checks whether the device rotated faster than threshold rad/s during the window before a time (default now).
+        """
+        if timestamp is None:
+            span = self.gyro.time_span()
+            if span is None:
+                return False
+            timestamp = span[1]
+        speed = self.get_angular_speed(timestamp - window_s, timestamp)
+        return speed is not None and speed > threshold
+
+    def get_stats(self) -> dict:
+        """
+        Returns sample counts, the buffered time span and the per-sample processing time of the worker.
+        """
+        span = self.gyro.time_span()
+        return {**self.stats, "buffered_s": None if span is None else span[1] - span[0]}
+
+
+def benchmark_imu_queries(samples: int = 4000, queries: int = 1000, rate: float = 400.0) -> dict:
+    """
+    Times interpolated lookups on a full ring buffer of synthetic gyro samples.
+
+    Returns:
+        dict: Microseconds per scalar query, per query in a batch, and per window query.
+    """
+    buffer = ImuRingBuffer(samples)
+    for index in range(samples + samples // 3):
+        buffer.append(index / rate, (np.sin(index / 50), np.cos(index / 50), 0.1))
+    oldest, newest = buffer.time_span()
+    times = np.random.default_rng(0).uniform(oldest, newest, queries)
+
+    start = time.perf_counter()
+    for t in times:
+        buffer.interpolate(t)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    buffer.interpolate(times)
+    batch = time.perf_counter() - start
+    start = time.perf_counter()
+    for t in times:
+        buffer.window(t - 0.02, t)
+    window = time.perf_counter() - start
+    return {"scalar_us": scalar * 1e6 / queries, "batch_us": batch * 1e6 / queries, "window_20ms_us": window * 1e6 / queries}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream the RealSense IMU and print angular rate and orientation.")
+    parser.add_argument("--serial", default=None)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--benchmark", action="store_true", help="Only time ring buffer queries, no device needed.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        for name, value in benchmark_imu_queries().items():
+            print(f"{name:<16} {value:10.3f}")
+    else:
+        imu = RealSenseImu(args.serial)
+        try:
+            deadline = time.monotonic() + args.seconds
+            while time.monotonic() < deadline:
+                time.sleep(0.5)
+                now = imu.gyro.time_span()
+                if now is None:
+                    continue
+                print(f"rate {imu.get_angular_velocity(now[1])} rad/s, orientation {imu.get_orientation(now[1])}, "
+                      f"moving {imu.is_moving()}, {imu.get_stats()}")
+        finally:
+            imu.stop()
@@ -5,17 +5,39 @@ import asyncio
 import websockets
 import cv2
 import numpy as np
-import base64
 import json
-import io
 import logging
 import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pyrealsense2 as rs
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 from config.config import load_config
+# The frame modules are shared with the camera side and always imported through the RAIT package,
+# so scripts that import this file as cameras.recevier still get a single Frame class
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir)))
+from RAIT.cameras.exceptions import FrameProtocolException
+from RAIT.cameras.frame import Frame
+from RAIT.cameras.frame_protocol import decode_message, decode_metadata, hello_message, is_binary_frame, parse_header
+
+# Errors raised by a message that cannot be decoded. Anything else, such as a failed drain task,
+# is a receive error and propagates to the caller.
+DECODE_ERRORS = (json.JSONDecodeError, KeyError, ValueError, cv2.error, FrameProtocolException)
+
+
+def _timed_decode(message):
+    """
+    Decodes a message and its metadata and measures the time spent, runs inside the decode executor.
+    """
+    start = time.perf_counter()
+    color_frame, depth_frame, header = decode_message(message)
+    metadata = decode_metadata(message, header) if header is not None else {}
+    return color_frame, depth_frame, header, metadata, time.perf_counter() - start
+
 
 class CameraReceiver:
     """
@@ -32,17 +54,102 @@ class CameraReceiver:
         self.camera_config = config.get('Camera', {})
         self.websocket_server = self.config.get("Websocket_server", "")
         self.websocket_topic = self.config.get("Websocket_topic", "")
+        self.protocol = self.config.get("Protocol", "auto")
+        self.depth_codec = self.config.get("Depth_codec", "raw")
         self.websocket = None
+        self.wire_format = None
+        self.last_header = None
+
+        # Optional background drain of the socket into a bounded ring of (arrival_time, message)
+        self.drain = self.config.get("Drain", False)
+        self.drain_policy = self.config.get("Drain_policy", "latest")
+        self._ring = deque(maxlen=max(1, self.config.get("Ring_size", 1)))
+        self._frame_ready = asyncio.Event()
+        self._drain_task = None
+        self._drain_error = None
+        self.drain_stats = {"received": 0, "consumed": 0, "overwritten": 0, "dropped": 0}
+
+        # Optional off-loop decoding: None, "thread" or "process"
+        self.decode_executor = self.config.get("Decode_executor")
+        self.decode_workers = self.config.get("Decode_workers", 2)
+        self.pipeline_depth = max(1, self.config.get("Pipeline_depth", 2))
+        self.executor = None  # Created on the first decode, see _get_executor
+        self.stage_timings = {"receive_ms": 0.0, "decode_ms": 0.0, "handoff_ms": 0.0}
+
+        # Connection keepalive and the optional self-healing frames() generator
+        self.ping_interval = self.config.get("Ping_interval", 5)
+        self.ping_timeout = self.config.get("Ping_timeout", 5)
+        self.max_message_size = self.config.get("Max_message_size", 16 * 1024 * 1024)
+        self.reconnect = self.config.get("Reconnect", False)
+        self.reconnect_initial_delay = self.config.get("Reconnect_initial_delay", 0.5)
+        self.reconnect_max_delay = self.config.get("Reconnect_max_delay", 10)
+        self.resume_window = self.config.get("Resume_window", 60)
+        self.connection_stats = {"reconnects": 0, "failed_attempts": 0, "last_reconnect_latency_s": None,
+                                 "last_outage_s": None, "total_outage_s": 0.0}
+
+        # Background disk writes started by snapshot(save_path=...)
+        self._save_tasks = set()
     
+    def _create_executor(self):
+        """
+        Creates the executor used to decode frames off the event loop. cv2 releases the GIL while
+        decoding, so threads are usually enough; processes pay for pickling the frames back.
+        """
+        if self.decode_executor == "thread":
+            return ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="frame-decode")
+        if self.decode_executor == "process":
+            return ProcessPoolExecutor(max_workers=self.decode_workers)
+        return None
+
+    def _get_executor(self):
+        """
+        Returns the decode executor, creating it on first use so receivers that never stream start no workers.
+        """
+        if self.executor is None and self.decode_executor is not None:
+            self.executor = self._create_executor()
+        return self.executor
+
+    def shutdown_executor(self):
+        """
+        Shuts down the decode executor. It is created again by the next decode.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _record_timing(self, stage, seconds, alpha=0.1):
+        """
+        Updates the exponential moving average (in milliseconds) of a pipeline stage.
+        """
+        value = seconds * 1000
+        previous = self.stage_timings[stage]
+        self.stage_timings[stage] = value if previous == 0.0 else previous + alpha * (value - previous)
+
+    def get_stage_timings(self):
+        """
+        Returns the moving averages of the receive, decode and executor handoff stages.
+
+        Returns:
+            dict: Stage name to average duration in milliseconds.
+        """
+        return dict(self.stage_timings)
+
     async def connect(self):
         """
         Establishes a connection to the WebSocket server.
         """
         try:
             uri = f"{self.websocket_server}{self.websocket_topic}"
-            self.websocket = await websockets.connect(uri)
+            self.websocket = await websockets.connect(uri, ping_interval=self.ping_interval,
+                                                      ping_timeout=self.ping_timeout, max_size=self.max_message_size)
             logging.info(f"Connected to WebSocket server at {uri}")
-        except (websockets.exceptions.InvalidURI, websockets.exceptions.InvalidHandshake, ConnectionRefusedError) as e:
+            if self.protocol != "json":
+                # Offer the binary format; legacy servers ignore this and keep sending JSON.
+                await self.websocket.send(hello_message(self.depth_codec))
+            if self.drain:
+                self.start_drain()
+        except (websockets.exceptions.InvalidURI, websockets.exceptions.InvalidHandshake,
+                websockets.exceptions.ConnectionClosed, asyncio.TimeoutError, OSError) as e:
             logging.error(f"Error connecting to WebSocket server: {e}")
             self.websocket = None
 
@@ -52,8 +159,8 @@ class CameraReceiver:
         """
         intrinsics = rs.intrinsics()
         color_intrinsics = self.camera_config[camera_name][location]['Intrinsics']['Color_Intrinsics']
-        intrinsics.width = 640
-        intrinsics.height = 480
+        intrinsics.width = color_intrinsics.get('width', 640)
+        intrinsics.height = color_intrinsics.get('height', 480)
         intrinsics.ppx = color_intrinsics.get('ppx', 0)
         intrinsics.ppy = color_intrinsics.get('ppy', 0) 
         intrinsics.fx = color_intrinsics.get('fx', 0)
@@ -63,42 +170,286 @@ class CameraReceiver:
         return intrinsics
 
 
+    def start_drain(self):
+        """
+        Starts a background task that keeps reading the socket into the ring buffer, so slow
+        consumers get the freshest frame instead of a backlog of stale ones.
+        """
+        if self._drain_task is None or self._drain_task.done():
+            self._ring.clear()
+            self._drain_error = None
+            self._drain_task = asyncio.create_task(self._drain_loop())
+
+    async def stop_drain(self):
+        """
+        Cancels the background drain task if it is running.
+        """
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+            self._drain_task = None
+
+    async def _drain_loop(self):
+        """
+        Reads messages as fast as the server sends them. Messages are kept undecoded so frames
+        that get overwritten never cost a decode.
+        """
+        try:
+            while True:
+                message = await self.websocket.recv()
+                if len(self._ring) == self._ring.maxlen:
+                    self.drain_stats["overwritten"] += 1
+                self._ring.append((time.time(), message))
+                self.drain_stats["received"] += 1
+                self._frame_ready.set()
+        except websockets.exceptions.ConnectionClosed as e:
+            logging.warning(f"Drain task stopped, WebSocket connection closed: {e}")
+            self._drain_error = e
+            self._frame_ready.set()
+        except Exception as e:
+            logging.error(f"Drain task failed: {e}")
+            self._drain_error = e
+            self._frame_ready.set()
+
+    async def _receive_message(self):
+        """
+        Returns the next raw message, either from the drain ring or directly from the socket.
+        """
+        if self._drain_task is None:
+            return await self.websocket.recv()
+
+        while not self._ring:
+            if self._drain_error is not None:
+                raise self._drain_error
+            self._frame_ready.clear()
+            await self._frame_ready.wait()
+
+        if self.drain_policy == "fifo":
+            _, message = self._ring.popleft()
+        else:
+            _, message = self._ring.pop()
+            self.drain_stats["dropped"] += len(self._ring)
+            self._ring.clear()
+        self.drain_stats["consumed"] += 1
+        return message
+
+    async def wait_for_frame(self):
+        """
+        Waits until the drain task has buffered a new frame or stopped.
+        """
+        if not self._ring and self._drain_error is None:
+            self._frame_ready.clear()
+            await self._frame_ready.wait()
+
+    async def ensure_draining(self):
+        """
+        Restarts the drain task after a closed connection, reconnecting if Reconnect is enabled.
+
+        Returns:
+            bool: True if frames are being drained.
+        """
+        if self._drain_task is not None and not self._drain_task.done():
+            return True
+        if self._drain_error is not None and not (self.reconnect and await self._reconnect()):
+            return False
+        self.start_drain()
+        return True
+
+    @staticmethod
+    def _capture_time(entry):
+        """
+        Capture timestamp of a buffered (arrival_time, message) entry. Legacy JSON frames carry
+        no timestamp, so the arrival time is used instead.
+        """
+        arrival_time, message = entry
+        return parse_header(message).timestamp if is_binary_frame(message) else arrival_time
+
+    def latest_timestamp(self):
+        """
+        Returns the capture timestamp of the newest buffered frame, or None if the ring is empty.
+        """
+        return self._capture_time(self._ring[-1]) if self._ring else None
+
+    def closest_timestamp(self, timestamp):
+        """
+        Returns the capture timestamp of the buffered frame closest to `timestamp`, or None.
+        """
+        if not self._ring:
+            return None
+        return min((self._capture_time(entry) for entry in self._ring), key=lambda t: abs(t - timestamp))
+
+    def take_closest(self, timestamp):
+        """
+        Removes and returns the buffered message captured closest to `timestamp`. Older buffered
+        messages are discarded and counted as dropped.
+
+        Returns:
+            tuple: (capture_timestamp, message), or None if nothing is buffered.
+        """
+        if not self._ring:
+            return None
+        times = [self._capture_time(entry) for entry in self._ring]
+        index = min(range(len(times)), key=lambda i: abs(times[i] - timestamp))
+        for _ in range(index):
+            self._ring.popleft()
+        self.drain_stats["dropped"] += index
+        self.drain_stats["consumed"] += 1
+        return times[index], self._ring.popleft()[1]
+
+    def discard_until(self, timestamp):
+        """
+        Drops buffered messages captured at or before `timestamp`.
+        """
+        while self._ring and self._capture_time(self._ring[0]) <= timestamp:
+            self._ring.popleft()
+            self.drain_stats["dropped"] += 1
+
+    async def _decode_async(self, message):
+        """
+        Decodes a single WebSocket message in either the binary or the legacy JSON format,
+        on the decode executor when one is configured.
+
+        Args:
+            message (Union[bytes, str]): The raw message.
+
+        Returns:
+            tuple: (frame, header), header is None for legacy JSON frames
+        """
+        start = time.perf_counter()
+        executor = self._get_executor()
+        if executor is None:
+            color_frame, depth_frame, header, metadata, decode_time = _timed_decode(message)
+        else:
+            loop = asyncio.get_running_loop()
+            color_frame, depth_frame, header, metadata, decode_time = await loop.run_in_executor(executor, _timed_decode, message)
+        self._record_timing("decode_ms", decode_time)
+        self._record_timing("handoff_ms", time.perf_counter() - start - decode_time)
+
+        received_at = time.time()
+        if header is None:
+            # Legacy JSON frames carry no capture information
+            return Frame(color_frame, depth_frame, timestamp=received_at, received_at=received_at), None
+        return Frame.from_metadata(color_frame, depth_frame, header.timestamp, header.sequence,
+                                   metadata, received_at=received_at), header
+
+    def _set_last_header(self, header):
+        self.last_header = header
+        self.wire_format = "json" if header is None else "binary"
+
+    async def _timed_receive(self):
+        start = time.perf_counter()
+        message = await self._receive_message()
+        self._record_timing("receive_ms", time.perf_counter() - start)
+        return message
+
     async def decode_frames(self):
         """
-        Receives and decodes both color and depth frames from JSON data.
+        Receives and decodes both color and depth frames. Binary frames are decoded in place,
+        legacy JSON frames are still accepted from servers that do not speak the binary format.
+        When the drain task is running the freshest buffered frame is returned.
         
         Returns:
-            tuple: (color_frame, depth_frame) if successful, else (None, None)
+            Frame: Unpacks like (color_frame, depth_frame) and carries the capture timestamp,
+                sequence number and metadata, or (None, None) if the message could not be decoded.
+
+        Raises:
+            websockets.exceptions.ConnectionClosed: The connection was closed, also when the drain task saw it close.
+            Exception: Any other error that stopped the drain task.
         """
         if self.websocket is None:
             logging.warning("WebSocket connection is not established.")
             return None, None
         
+        message = await self._timed_receive()
         try:
-            json_data = await self.websocket.recv()
-            frame_data = json.loads(json_data)
-            
-            # Decode color frame
-            color_data = base64.b64decode(frame_data.get('color', ""))
-            color_arr = np.frombuffer(color_data, np.uint8)
-            color_frame = cv2.imdecode(color_arr, cv2.IMREAD_COLOR)
-            
-            # Decode depth frame
-            depth_data = base64.b64decode(frame_data.get('depth', ""))
-            depth_bytes = io.BytesIO(depth_data)
-            depth_frame = np.load(depth_bytes, allow_pickle=True)
-            
-            return color_frame, depth_frame
-        except (json.JSONDecodeError, KeyError, ValueError, cv2.error, Exception) as e:
+            frame, header = await self._decode_async(message)
+            self._set_last_header(header)
+            return frame
+        except DECODE_ERRORS as e:
             logging.error(f"Error decoding frames: {e}")
             return None, None
+
+    async def _pipelined_frames(self):
+        """
+        Overlaps receiving with decoding: a producer task keeps up to `pipeline_depth` decodes
+        in flight on the executor while frames are yielded in arrival order.
+        """
+        pending = asyncio.Queue(maxsize=self.pipeline_depth)
+
+        async def produce():
+            try:
+                while True:
+                    message = await self._timed_receive()
+                    await pending.put(asyncio.ensure_future(self._decode_async(message)))
+            except Exception as e:
+                # Forward every receive error, the consumer would otherwise wait on the queue forever
+                await pending.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await pending.get()
+                if isinstance(item, Exception):
+                    raise item
+                try:
+                    frame, header = await item
+                    self._set_last_header(header)
+                except DECODE_ERRORS as e:
+                    logging.error(f"Error decoding frames: {e}")
+                    frame = (None, None)
+                yield frame
+        finally:
+            producer.cancel()
+            while not pending.empty():
+                item = pending.get_nowait()
+                if isinstance(item, asyncio.Future):
+                    item.cancel()
     
+    async def _reconnect(self):
+        """
+        Reconnects with exponential backoff until the resume window runs out.
+
+        Returns:
+            bool: True if the connection was restored.
+        """
+        outage_start = time.monotonic()
+        await self.stop_drain()
+        if self.websocket is not None:
+            await self.websocket.close()
+            self.websocket = None
+
+        delay = self.reconnect_initial_delay
+        while True:
+            attempt_start = time.monotonic()
+            await self.connect()
+            if self.websocket is not None:
+                now = time.monotonic()
+                self.connection_stats["reconnects"] += 1
+                self.connection_stats["last_reconnect_latency_s"] = now - attempt_start
+                self.connection_stats["last_outage_s"] = now - outage_start
+                self.connection_stats["total_outage_s"] += now - outage_start
+                logging.info(f"Reconnected after an outage of {now - outage_start:.2f}s")
+                return True
+
+            self.connection_stats["failed_attempts"] += 1
+            remaining = self.resume_window - (time.monotonic() - outage_start)
+            if remaining <= 0:
+                logging.error(f"Could not reconnect within the {self.resume_window}s resume window.")
+                return False
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.reconnect_max_delay)
+
     async def frames(self):
         """
-        Asynchronous generator that continuously receives frames.
+        Asynchronous generator that continuously receives frames. With a decode executor
+        configured, receiving and decoding are pipelined. With Reconnect enabled, a closed
+        connection is re-established with exponential backoff instead of ending the generator.
         
         Yields:
-            tuple: (color_frame, depth_frame) until stopped.
+            Frame: Unpacks like (color_frame, depth_frame), until stopped.
         """
         if self.websocket is None:
             logging.error("WebSocket connection is missing. Exiting frame loop.")
@@ -106,12 +457,19 @@ class CameraReceiver:
 
         try:
             while True:
-                color_frame, depth_frame = await self.decode_frames()
-                yield color_frame, depth_frame
+                try:
+                    if self.decode_executor is None:
+                        while True:
+                            yield await self.decode_frames()
+                    else:
+                        async for frame in self._pipelined_frames():
+                            yield frame
+                except websockets.exceptions.ConnectionClosed as e:
+                    logging.warning(f"WebSocket connection closed unexpectedly: {e}")
+                    if not self.reconnect or not await self._reconnect():
+                        break
         except asyncio.CancelledError:
             logging.info("Frame receiving loop has been cancelled.")
-        except websockets.exceptions.ConnectionClosed as e:
-            logging.warning(f"WebSocket connection closed unexpectedly: {e}")
         finally:
             await self.cleanup()
     
@@ -119,6 +477,9 @@ class CameraReceiver:
         """
         Closes the WebSocket connection and releases resources.
         """
+        await self.stop_drain()
+        await self.wait_for_saves()
+        self.shutdown_executor()
         if self.websocket:
             await self.websocket.close()
             logging.info("WebSocket connection closed.")
@@ -143,9 +504,90 @@ class CameraReceiver:
         cv2.destroyAllWindows()
         await receiver.cleanup()
 
+    @staticmethod
+    def save_frame(color_frame, depth_frame, save_path):
+        """
+        Writes a color/depth pair to `save_path`/rgb/image_0.jpg and `save_path`/depth/image_0.npy.
+
+        Args:
+            color_frame (np.ndarray): The color frame, or None.
+            depth_frame (np.ndarray): The depth frame, or None.
+            save_path (str): Directory path where frames will be saved.
+
+        Returns:
+            dict: A dictionary containing the paths of the saved 'rgb' and 'depth' files.
+        """
+        rgb_dir = f"{save_path}/rgb"
+        depth_dir = f"{save_path}/depth"
+        os.makedirs(rgb_dir, exist_ok=True)
+        os.makedirs(depth_dir, exist_ok=True)
+
+        color_frame_path = None
+        depth_frame_path = None
+        if color_frame is not None:
+            color_frame_path = f"{rgb_dir}/image_0.jpg"
+            cv2.imwrite(color_frame_path, color_frame)
+            logging.info(f"Saved color frame to {color_frame_path}")
+        if depth_frame is not None:
+            depth_frame_path = f"{depth_dir}/image_0.npy"
+            np.save(depth_frame_path, depth_frame)
+            logging.info(f"Saved depth frame to {depth_frame_path}")
+
+        return {
+            "rgb": color_frame_path,
+            "depth": depth_frame_path
+        }
+
+    async def snapshot(self, save_path=None):
+        """
+        Returns the freshest frame from a long-lived connection. The first call connects and starts
+        the drain task; later calls reuse the connection, so no handshake is paid per request.
+
+        Args:
+            save_path (str): If given, the frame is also written to disk in the background
+                (same layout as capture_frames) without delaying the caller.
+
+        Returns:
+            Frame: Unpacks like (color_frame, depth_frame), or (None, None) if no frame could be received.
+        """
+        if self.websocket is None:
+            await self.connect()
+            if self.websocket is None:
+                return None, None
+        if not await self.ensure_draining():
+            return None, None
+
+        while not self._ring:
+            if self._drain_error is not None and not await self.ensure_draining():
+                return None, None
+            await self.wait_for_frame()
+
+        # Peek at the newest buffered message, so frames() consumers sharing the receiver are unaffected
+        _, message = self._ring[-1]
+        try:
+            frame, header = await self._decode_async(message)
+            self._set_last_header(header)
+        except DECODE_ERRORS as e:
+            logging.error(f"Error decoding snapshot: {e}")
+            return None, None
+
+        if save_path is not None:
+            task = asyncio.create_task(asyncio.to_thread(self.save_frame, frame.color, frame.depth, save_path))
+            self._save_tasks.add(task)
+            task.add_done_callback(self._save_tasks.discard)
+        return frame
+
+    async def wait_for_saves(self):
+        """
+        Waits until the background writes started by snapshot() have finished.
+        """
+        if self._save_tasks:
+            await asyncio.gather(*self._save_tasks, return_exceptions=True)
+
     async def capture_frames(self, save_path):
         """
         Connects to the WebSocket server, receives one frame, and saves it to the specified location.
+        Prefer snapshot(), which keeps the connection open and returns the frame in memory.
         
         Args:
             save_path (str): Directory path where frames will be saved.
@@ -154,39 +596,16 @@ class CameraReceiver:
             dict: A dictionary containing paths to the 'rgb' and 'depth' directories.
         """
         await self.connect()
-        
-        rgb_dir = f"{save_path}/rgb"
-        depth_dir = f"{save_path}/depth"
-        
-        if not os.path.exists(save_path) or os.path.exists(rgb_dir) or os.path.exists(depth_dir):
-            os.makedirs(rgb_dir)
-            os.makedirs(depth_dir)
-            logging.info(f"Created directories at {save_path}")
-
-        color_frame_path = None
-        depth_frame_path = None
 
+        paths = {"rgb": None, "depth": None}
         if self.websocket:
             async for color_frame, depth_frame in self.frames():
-                if color_frame is not None:
-                    color_frame_path = f"{rgb_dir}/image_0.jpg"
-                    cv2.imwrite(color_frame_path, color_frame)
-                    logging.info(f"Saved color frame to {color_frame_path}")
-                
-                if depth_frame is not None:
-                    depth_frame_path = f"{depth_dir}/image_0.npy"
-                    np.save(depth_frame_path, depth_frame)
-                    logging.info(f"Saved depth frame to {depth_frame_path}")
-                
+                paths = self.save_frame(color_frame, depth_frame, save_path)
                 break 
 
         await self.cleanup()
         
-        return {
-            "rgb": color_frame_path,
-            "depth": depth_frame_path
-        }
-
+        return paths
 
 if __name__ == "__main__":
     config = load_config("config/config.yaml")
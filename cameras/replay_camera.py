@@ -0,0 +1,268 @@
+"""
+This file contains a camera that plays back samples recorded by VideoRecorder through the Camera interface.
+
+A sample folder looks like:
+
+    sample_N/
+        rgb/<action>_image_000.png ...
+        depth/<action>_image_000.npy ...
+        frame_timestamps.json          (optional, original capture times)
+
+Run this file to serve a recording over WebSocket the way a camera host would:
+    python -m RAIT.cameras.replay_camera data/recordings/pouring/sample_1 --port 3000 --loop
+"""
+import json
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from RAIT.cameras.camera import Camera
+from RAIT.cameras.exceptions import HIComputerVisionException
+from RAIT.cameras.frame import Frame
+
+_FRAME_NUMBER = re.compile(r"(\d+)$")
+
+
+def _frame_number(path: Path) -> Optional[int]:
+    """
+    Returns the frame index VideoRecorder wrote at the end of the file name, e.g. 12 for pouring_image_012.png.
+    """
+    match = _FRAME_NUMBER.search(path.stem)
+    return int(match.group(1)) if match else None
+
+
+class ReplayCamera(Camera):
+    """
+    Streams a recorded sample at its original rate, a multiple of it, or as fast as frames can be read.
+    Frames are read from disk by a background thread into a bounded prefetch buffer, so disk latency
+    does not show up in the frame timing.
+
+    Attributes:
+        sample_path (Path): The sample folder.
+        fps (float): Playback rate used when the sample has no recorded timestamps.
+        speed (float): Playback speed multiplier, 2.0 plays twice as fast.
+        loop (bool): Restart from the first frame at the end of the sample.
+        max_speed (bool): Ignore timing and return frames as fast as they are read.
+        provides_depth (bool): True when the sample has depth frames.
+    """
+    def __init__(self, sample_path: str, fps: float = 30.0, speed: float = 1.0, loop: bool = False,
+                 max_speed: bool = False, prefetch: int = 8, open_pipeline: bool = True):
+        self.sample_path = Path(sample_path)
+        self.fps = fps
+        self.speed = speed
+        self.loop = loop
+        self.max_speed = max_speed
+        self.prefetch = max(1, prefetch)
+
+        self.color_files, self.depth_files = self._index_sample()
+        self.frame_numbers = [_frame_number(path) for path in self.color_files]
+        self.provides_depth = bool(self.depth_files)
+        self.frame_times = self._load_frame_times()
+
+        self.buffer = deque()
+        self.condition = threading.Condition()
+        self.reader_thread = None
+        self.streaming = False
+        self._read_position = 0
+        self._generation = 0
+        self._clock_start = None
+        self._clock_offset = 0.0
+        self._last_index = None
+        self.sequence = 0
+        self.stats = {"frames": 0, "loops": 0, "late_frames": 0, "buffer_underruns": 0}
+
+        if open_pipeline:
+            self.start_camera()
+
+    def __repr__(self):
+        return f'ReplayCamera(sample_path={self.sample_path}, frames={len(self)}, speed={self.speed}, loop={self.loop})'
+
+    def __len__(self):
+        return len(self.color_files)
+
+    def _index_sample(self):
+        """
+        Pairs color and depth files by name. Files are ordered by their frame number, so image_1000
+        follows image_999.
+        """
+        color_files = list((self.sample_path / "rgb").glob("*.png")) or list((self.sample_path / "rgb").glob("*.jpg"))
+        color_files.sort(key=lambda path: (_frame_number(path) is None, _frame_number(path) or 0, path.name))
+        if not color_files:
+            raise HIComputerVisionException(f"No recorded color frames found in {self.sample_path / 'rgb'}.")
+        depth_by_stem = {path.stem: path for path in (self.sample_path / "depth").glob("*.npy")}
+        depth_files: List[Optional[Path]] = [depth_by_stem.get(path.stem) for path in color_files]
+        return color_files, depth_files if any(depth_files) else []
+
+    def _load_frame_times(self) -> np.ndarray:
+        """
+        Returns the offset of every frame from the first one in seconds, from frame_timestamps.json
+        when VideoRecorder wrote one, otherwise from the configured fps.
+
+        The recorder logs an entry for every frame index, including frames without a color image that
+        have no file on disk, so entries are matched by the index in the file name and not by position.
+        """
+        timestamps_path = self.sample_path / "frame_timestamps.json"
+        if timestamps_path.exists():
+            with open(timestamps_path) as f:
+                entries = {entry["index"]: entry["timestamp"] for entry in json.load(f)}
+            if all(number in entries for number in self.frame_numbers):
+                times = np.array([entries[number] for number in self.frame_numbers], dtype=np.float64)
+                return times - times[0]
+        if None not in self.frame_numbers:
+            numbers = np.array(self.frame_numbers, dtype=np.float64)
+            return (numbers - numbers[0]) / self.fps
+        return np.arange(len(self), dtype=np.float64) / self.fps
+
+    def _read(self, index: int):
+        color = cv2.imread(str(self.color_files[index]), cv2.IMREAD_COLOR)
+        depth = np.load(self.depth_files[index]) if self.provides_depth and self.depth_files[index] else None
+        return index, color, depth
+
+    def _reader(self):
+        """
+        Prefetch thread: keeps the buffer filled with the frames following the read position.
+        """
+        while True:
+            with self.condition:
+                while self.streaming and (len(self.buffer) >= self.prefetch or self._read_position is None):
+                    self.condition.wait()
+                if not self.streaming:
+                    return
+                generation, index = self._generation, self._read_position
+
+            item = self._read(index)
+
+            with self.condition:
+                if generation != self._generation:
+                    continue  # A seek happened while reading, drop the frame
+                self.buffer.append(item)
+                if index + 1 < len(self):
+                    self._read_position = index + 1
+                elif self.loop:
+                    self._read_position = 0
+                else:
+                    self._read_position = None
+                self.condition.notify_all()
+
+    def start_camera(self) -> None:
+        """
+        Starts the prefetch thread.
+        """
+        with self.condition:
+            if self.streaming:
+                return
+            self.streaming = True
+        self._clock_start = None
+        self.reader_thread = threading.Thread(target=self._reader, name="replay-prefetch", daemon=True)
+        self.reader_thread.start()
+
+    def release_camera(self) -> None:
+        """
+        Stops the prefetch thread and clears the buffer.
+        """
+        with self.condition:
+            self.streaming = False
+            self.buffer.clear()
+            self.condition.notify_all()
+        if self.reader_thread is not None:
+            self.reader_thread.join()
+            self.reader_thread = None
+
+    def seek(self, index: int) -> None:
+        """
+        Continues playback from the given frame index. Buffered frames are discarded.
+
+        :param index: int, Frame index, negative values count from the end.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Frame index {index} out of range for {len(self)} frames.")
+        with self.condition:
+            self._generation += 1
+            self.buffer.clear()
+            self._read_position = index
+            self._clock_start = None
+            self._last_index = None
+            self.condition.notify_all()
+
+    def _next_item(self):
+        with self.condition:
+            if not self.buffer and self._read_position is not None:
+                self.stats["buffer_underruns"] += 1
+            while self.streaming and not self.buffer and self._read_position is not None:
+                self.condition.wait()
+            if not self.buffer:
+                return None
+            item = self.buffer.popleft()
+            self.condition.notify_all()
+            return item
+
+    def capture_frame(self) -> Optional[Frame]:
+        """
+        Returns the next recorded frame, waiting until it is due unless max_speed is set.
+
+        :return: Frame, or None at the end of the sample when not looping.
+        """
+        item = self._next_item()
+        if item is None:
+            return None
+        index, color, depth = item
+
+        wrapped = self._last_index is not None and index < self._last_index
+        if wrapped:
+            self.stats["loops"] += 1
+        self._last_index = index
+
+        if not self.max_speed:
+            if self._clock_start is None or wrapped:
+                self._clock_start = time.monotonic()
+                self._clock_offset = self.frame_times[index]
+            due = self._clock_start + (self.frame_times[index] - self._clock_offset) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0 / self.fps:
+                self.stats["late_frames"] += 1
+
+        self.sequence += 1
+        self.stats["frames"] += 1
+        return Frame(color, depth, sequence=self.sequence,
+                     metadata={"replay_index": index, "recorded_offset_s": float(self.frame_times[index])})
+
+    def get_stats(self):
+        with self.condition:
+            return {**self.stats, "buffered": len(self.buffer)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from RAIT.cameras.camera_publisher import CameraPublisher
+    from RAIT.cameras.frame_server import FrameServer
+
+    parser = argparse.ArgumentParser(description="Serve a recorded sample over WebSocket.")
+    parser.add_argument("sample_path")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--path", default="/home/server")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--loop", action="store_true")
+    parser.add_argument("--max-speed", action="store_true")
+    parser.add_argument("--depth-codec", default="raw")
+    args = parser.parse_args()
+
+    camera = ReplayCamera(args.sample_path, speed=args.speed, loop=args.loop, max_speed=args.max_speed)
+    publisher = CameraPublisher(camera, start_publisher=True, depth_codec=args.depth_codec)
+    try:
+        asyncio.run(FrameServer(publisher, port=args.port, path=args.path).serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.stop_publisher()
+        camera.release_camera()
@@ -0,0 +1,236 @@
+"""
+This file contains a shared-memory ring buffer that carries color/depth frames from the CameraPublisher
+process to consumers running in other processes.
+
+Memory layout of the segment:
+
+    | control block (64 B) | latest sequence (8 B) | slot table (seq, timestamp) x slots |
+    | color frames (slots x H x W x C) | depth frames (slots x H x W) |
+
+Each slot is written seqlock-style: its sequence number is cleared while the writer copies the frame
+in and set once the copy is complete, so readers can tell a finished slot from one being rewritten.
+Readers attach by name and get zero-copy np.ndarray views into the segment.
+"""
+import struct
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+_MAGIC = b"RBUS"
+_VERSION = 1
+# magic, version, slots, color height, width, channels, depth height, width, color dtype, depth dtype
+_CONTROL = struct.Struct("<4sIIIIIIIcc")
+_LATEST_OFFSET = 64
+_SLOTS_OFFSET = 128
+_SLOT_DTYPE = np.dtype([("sequence", "<u8"), ("timestamp", "<f8")])
+
+BusFrame = namedtuple("BusFrame", ["color", "depth", "sequence", "timestamp"])
+
+
+def _align(offset: int, alignment: int = 64) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _color_shape(height: int, width: int, channels: int) -> Tuple[int, ...]:
+    return (height, width, channels) if channels > 1 else (height, width)
+
+
+class SharedFrameBus:
+    """
+    Preallocated shared-memory ring of color/depth frames with per-slot sequence numbers and timestamps.
+
+    Use `SharedFrameBus.create(...)` in the writing process and `SharedFrameBus.attach(name)` in readers.
+    Views returned by `latest()` stay valid until the writer wraps around to the same slot, which takes
+    `slots - 1` further frames; call `is_current(sequence)` after processing to detect that case.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        (magic, version, self.slots, color_h, color_w, color_c, depth_h, depth_w,
+         color_dtype, depth_dtype) = _CONTROL.unpack_from(shm.buf)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Shared memory segment '{shm.name}' is not a frame bus.")
+
+        self.color_shape = _color_shape(color_h, color_w, color_c)
+        self.depth_shape = (depth_h, depth_w)
+        self.color_dtype = np.dtype(color_dtype.decode())
+        self.depth_dtype = np.dtype(depth_dtype.decode())
+
+        self._latest = np.ndarray((1,), dtype="<u8", buffer=shm.buf, offset=_LATEST_OFFSET)
+        self._slot_table = np.ndarray((self.slots,), dtype=_SLOT_DTYPE, buffer=shm.buf, offset=_SLOTS_OFFSET)
+        color_offset, depth_offset, _ = self._layout(self.slots, self.color_shape, self.color_dtype,
+                                                     self.depth_shape, self.depth_dtype)
+        self._color = np.ndarray((self.slots, *self.color_shape), dtype=self.color_dtype,
+                                 buffer=shm.buf, offset=color_offset)
+        self._depth = np.ndarray((self.slots, *self.depth_shape), dtype=self.depth_dtype,
+                                 buffer=shm.buf, offset=depth_offset)
+
+    @staticmethod
+    def _layout(slots, color_shape, color_dtype, depth_shape, depth_dtype) -> Tuple[int, int, int]:
+        """
+        Returns the color offset, depth offset and total size of a segment.
+        """
+        color_offset = _align(_SLOTS_OFFSET + slots * _SLOT_DTYPE.itemsize, 4096)
+        color_bytes = slots * int(np.prod(color_shape)) * color_dtype.itemsize
+        depth_offset = _align(color_offset + color_bytes, 4096)
+        depth_bytes = slots * int(np.prod(depth_shape)) * depth_dtype.itemsize
+        return color_offset, depth_offset, depth_offset + max(depth_bytes, 1)
+
+    @classmethod
+    def create(cls, name: str, color_shape: Tuple[int, ...], depth_shape: Optional[Tuple[int, int]] = None,
+               slots: int = 4, color_dtype=np.uint8, depth_dtype=np.uint16) -> "SharedFrameBus":
+        """
+        Creates a new frame bus segment. An existing segment with the same name is replaced.
+
+        Args:
+            name (str): Name readers use to attach.
+            color_shape (Tuple[int, ...]): Shape of the color frames, e.g. (480, 640, 3).
+            depth_shape (Tuple[int, int]): Shape of the depth frames, or None for RGB cameras.
+            slots (int): Number of frames kept in the ring.
+            color_dtype: dtype of the color frames.
+            depth_dtype: dtype of the depth frames.
+
+        Returns:
+            SharedFrameBus: The writable bus.
+        """
+        color_dtype, depth_dtype = np.dtype(color_dtype), np.dtype(depth_dtype)
+        depth_shape = depth_shape or (0, 0)
+        channels = color_shape[2] if len(color_shape) == 3 else 1
+        _, _, size = cls._layout(slots, color_shape, color_dtype, depth_shape, depth_dtype)
+
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _CONTROL.pack_into(shm.buf, 0, _MAGIC, _VERSION, slots, color_shape[0], color_shape[1], channels,
+                           depth_shape[0], depth_shape[1], color_dtype.char.encode(), depth_dtype.char.encode())
+        np.ndarray((1,), dtype="<u8", buffer=shm.buf, offset=_LATEST_OFFSET)[0] = 0
+        np.ndarray((slots,), dtype=_SLOT_DTYPE, buffer=shm.buf, offset=_SLOTS_OFFSET)[:] = (0, 0.0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameBus":
+        """
+        Attaches to an existing frame bus created by another process.
+
+        Args:
+            name (str): Name of the bus.
+
+        Returns:
+            SharedFrameBus: A read-only handle on the bus.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 registers every attached segment with the resource tracker, which would
+            # unlink it when this reader exits, so registration is skipped while attaching.
+            from multiprocessing import resource_tracker
+            register = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        return cls(shm, owner=False)
+
+    def write(self, color: np.ndarray, depth: Optional[np.ndarray] = None, timestamp: Optional[float] = None) -> int:
+        """
+        Copies a frame into the next slot.
+
+        Args:
+            color (np.ndarray): The color frame.
+            depth (np.ndarray): The depth frame, if the bus carries depth.
+            timestamp (float): Capture time, defaults to now.
+
+        Returns:
+            int: The sequence number of the written frame.
+        """
+        sequence = int(self._latest[0]) + 1
+        slot = sequence % self.slots
+        self._slot_table["sequence"][slot] = 0
+        np.copyto(self._color[slot], color)
+        if depth is not None:
+            np.copyto(self._depth[slot], depth)
+        self._slot_table["timestamp"][slot] = time.time() if timestamp is None else timestamp
+        self._slot_table["sequence"][slot] = sequence
+        self._latest[0] = sequence
+        return sequence
+
+    def matches(self, color: np.ndarray, depth: Optional[np.ndarray] = None) -> bool:
+        """
+        Checks whether a color/depth pair has the shapes and dtypes the bus was created for.
+        """
+        channels = color.shape[2] if color.ndim == 3 else 1
+        if _color_shape(color.shape[0], color.shape[1], channels) != self.color_shape or color.dtype != self.color_dtype:
+            return False
+        if depth is None:
+            return self.depth_shape == (0, 0)
+        return depth.shape == self.depth_shape and depth.dtype == self.depth_dtype
+
+    @property
+    def latest_sequence(self) -> int:
+        return int(self._latest[0])
+
+    def is_current(self, sequence: int) -> bool:
+        """
+        Checks that the slot holding `sequence` has not been overwritten since it was read.
+        """
+        return int(self._slot_table["sequence"][sequence % self.slots]) == sequence
+
+    def get(self, sequence: int) -> Optional[BusFrame]:
+        """
+        Returns zero-copy views of the frame with the given sequence number, or None if it is no
+        longer (or not yet) in the ring.
+        """
+        if sequence <= 0:
+            return None
+        slot = sequence % self.slots
+        if int(self._slot_table["sequence"][slot]) != sequence:
+            return None
+        depth = self._depth[slot] if self.depth_shape != (0, 0) else None
+        return BusFrame(self._color[slot], depth, sequence, float(self._slot_table["timestamp"][slot]))
+
+    def latest(self) -> Optional[BusFrame]:
+        """
+        Returns zero-copy views of the most recent color/depth pair, or None if nothing was written yet.
+        """
+        return self.get(self.latest_sequence)
+
+    def wait_for_next(self, after_sequence: int, timeout: float = 1.0, poll_interval: float = 0.001) -> Optional[BusFrame]:
+        """
+        Polls until a frame newer than `after_sequence` is available.
+
+        Args:
+            after_sequence (int): Sequence number of the last frame the reader processed.
+            timeout (float): Maximum time to wait in seconds.
+            poll_interval (float): Sleep between polls in seconds.
+
+        Returns:
+            Optional[BusFrame]: The newest frame, or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while self.latest_sequence <= after_sequence:
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(poll_interval)
+        return self.latest()
+
+    def close(self) -> None:
+        """
+        Detaches from the segment; the creating process also unlinks it. Views returned by
+        `get`/`latest` must be released before closing.
+        """
+        self._latest = self._slot_table = self._color = self._depth = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
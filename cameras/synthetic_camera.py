@@ -0,0 +1,221 @@
+"""
+This file contains a synthetic camera that generates color/depth frames at any resolution and frame rate
+for stress tests and benchmarks of the publishing, transport and recording pipeline.
+
+Run this file to measure how fast CameraPublisher can go on this machine:
+    python -m RAIT.cameras.synthetic_camera --width 1280 --height 720 --fps 90 --seconds 10
+or to serve synthetic frames over WebSocket:
+    python -m RAIT.cameras.synthetic_camera --fps 60 --serve 3000
+"""
+import time
+
+import numpy as np
+
+from RAIT.cameras.camera import Camera
+from RAIT.cameras.frame import Frame
+
+
+class SyntheticCamera(Camera):
+    """
+    Camera that cycles through a pool of pre-rendered frames showing shapes moving over a tilted
+    table plane, with sensor noise and the depth holes of a stereo camera (random dropouts and
+    shadows beside object edges). Rendering happens once in start_camera, so capture_frame only
+    paces and returns views into the pool.
+
+    The returned arrays are read-only views of the pool and stay valid for the life of the camera.
+
+    Attributes:
+        width (int): Frame width.
+        height (int): Frame height.
+        fps (float): Target frame rate, 0 returns frames as fast as they are requested.
+        pool_size (int): Number of distinct frames, the motion repeats every pool_size frames.
+        provides_depth (bool): Whether capture_frame returns (color, depth) pairs or only color.
+    """
+    def __init__(self, width: int = 640, height: int = 480, fps: float = 30.0, pool_size: int = 32,
+                 color_dtype=np.uint8, depth_dtype=np.uint16, provides_depth: bool = True,
+                 num_shapes: int = 3, hole_fraction: float = 0.03, seed: int = 0, open_pipeline: bool = True):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pool_size = max(1, pool_size)
+        self.color_dtype = np.dtype(color_dtype)
+        self.depth_dtype = np.dtype(depth_dtype)
+        self.provides_depth = provides_depth
+        self.num_shapes = num_shapes
+        self.hole_fraction = hole_fraction
+        self.seed = seed
+
+        self.color_pool = None
+        self.depth_pool = None
+        self.streaming = False
+        self.sequence = 0
+        self._next_time = None
+        self.stats = {"frames": 0, "late_frames": 0}
+
+        if open_pipeline:
+            self.start_camera()
+
+    def __repr__(self):
+        return f'SyntheticCamera(width={self.width}, height={self.height}, fps={self.fps}, pool_size={self.pool_size})'
+
+    def _render_pool(self):
+        """
+        Renders every frame of the pool into preallocated arrays.
+        """
+        rng = np.random.default_rng(self.seed)
+        height, width = self.height, self.width
+        self.color_pool = np.empty((self.pool_size, height, width, 3), dtype=self.color_dtype)
+        self.depth_pool = np.empty((self.pool_size, height, width), dtype=self.depth_dtype) if self.provides_depth else None
+
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+        plane_mm = 700 + ys / height * 300  # table tilting away from the camera
+        background = np.stack((60 + xs / width * 80, 90 + ys / height * 60, np.full_like(xs, 120)), axis=-1)
+
+        shapes = [{
+            "color": rng.uniform(30, 255, 3),
+            "radius": rng.uniform(0.05, 0.12) * min(height, width),
+            "height_mm": rng.uniform(60, 250),
+            "center": rng.uniform(0.25, 0.75, 2) * (width, height),
+            "amplitude": rng.uniform(0.1, 0.2, 2) * (width, height),
+            "phase": rng.uniform(0, 2 * np.pi),
+            "square": bool(rng.integers(2)),
+        } for _ in range(self.num_shapes)]
+
+        shadow = max(2, width // 80)
+        for index in range(self.pool_size):
+            angle = 2 * np.pi * index / self.pool_size
+            color = background.copy()
+            depth = plane_mm.copy()
+            holes = np.zeros((height, width), dtype=bool)
+            for shape in shapes:
+                cx = shape["center"][0] + shape["amplitude"][0] * np.cos(angle + shape["phase"])
+                cy = shape["center"][1] + shape["amplitude"][1] * np.sin(angle + shape["phase"])
+                radius = shape["radius"]
+                # Only the bounding box of the shape (plus the shadow strip) is touched
+                top, bottom = max(int(cy - radius), 0), min(int(cy + radius) + 1, height)
+                left, right = max(int(cx - radius) - shadow, 0), min(int(cx + radius) + 1, width)
+                box = (slice(top, bottom), slice(left, right))
+                if shape["square"]:
+                    inside = (np.abs(xs[box] - cx) < radius) & (np.abs(ys[box] - cy) < radius)
+                else:
+                    inside = (xs[box] - cx) ** 2 + (ys[box] - cy) ** 2 < radius ** 2
+                color[box][inside] = shape["color"]
+                depth[box][inside] = plane_mm[box][inside] - shape["height_mm"]
+                # Stereo shadow: the left camera cannot see the strip just left of an object
+                holes[box] |= np.roll(inside, -shadow, axis=1) & ~inside
+
+            color += rng.standard_normal(color.shape, dtype=np.float32) * 3
+            depth += rng.standard_normal(depth.shape, dtype=np.float32) * 2
+            block = 8
+            dropouts = rng.random((height // block + 1, width // block + 1)) < self.hole_fraction
+            holes |= np.kron(dropouts, np.ones((block, block), dtype=bool))[:height, :width]
+            holes[:, :width // 16] = True  # invalid band on the left edge of RealSense depth
+            depth[holes] = 0
+
+            if np.issubdtype(self.color_dtype, np.floating):
+                self.color_pool[index] = np.clip(color / 255.0, 0, 1)
+            else:
+                scale = (np.iinfo(self.color_dtype).max + 1) / 256
+                self.color_pool[index] = np.clip(color * scale, 0, np.iinfo(self.color_dtype).max)
+            if self.provides_depth:
+                self.depth_pool[index] = depth / 1000.0 if np.issubdtype(self.depth_dtype, np.floating) else np.clip(depth, 0, None)
+
+        self.color_pool.flags.writeable = False
+        if self.provides_depth:
+            self.depth_pool.flags.writeable = False
+
+    def start_camera(self) -> None:
+        """
+        Renders the frame pool and starts the frame clock.
+        """
+        if self.color_pool is None:
+            self._render_pool()
+        self.streaming = True
+        self._next_time = None
+
+    def release_camera(self) -> None:
+        self.streaming = False
+
+    def capture_frame(self):
+        """
+        Returns the next frame of the pool, waiting for the next frame time when fps is set.
+
+        :return: Frame for depth cameras, np.ndarray otherwise.
+        """
+        if self.fps:
+            now = time.monotonic()
+            if self._next_time is None:
+                self._next_time = now
+            delay = self._next_time - now
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0 / self.fps:
+                # Behind by more than a frame: count it and restart the clock instead of bursting
+                self.stats["late_frames"] += 1
+                self._next_time = now
+            self._next_time += 1.0 / self.fps
+
+        index = self.sequence % self.pool_size
+        self.sequence += 1
+        self.stats["frames"] += 1
+        if not self.provides_depth:
+            return self.color_pool[index]
+        return Frame(self.color_pool[index], self.depth_pool[index], sequence=self.sequence,
+                     metadata={"pool_index": index}, intrinsics_key=f"synthetic/{self.width}x{self.height}")
+
+
+def benchmark_publisher(camera: SyntheticCamera, seconds: float = 5.0, subscribers: int = 1) -> dict:
+    """
+    Runs a CameraPublisher on the camera and reports the achieved capture rate and subscriber stats.
+
+    :param camera: SyntheticCamera, The camera to publish.
+    :param seconds: float, Duration of the run.
+    :param subscribers: int, Number of no-op subscribers attached to the publisher.
+    :return: dict, Target and achieved FPS, late frames and per-subscriber stats.
+    """
+    from RAIT.cameras.camera_publisher import CameraPublisher
+
+    publisher = CameraPublisher(camera)
+    for _ in range(subscribers):
+        publisher.subscribe(lambda images, image_queue: None)
+    publisher.start_publisher()
+    try:
+        start_frames, start = publisher.frame_count, time.monotonic()
+        time.sleep(seconds)
+        frames, elapsed = publisher.frame_count - start_frames, time.monotonic() - start
+        stats = publisher.get_subscriber_stats()
+    finally:
+        publisher.stop_publisher()
+    return {"target_fps": camera.fps, "achieved_fps": frames / elapsed,
+            "late_frames": camera.stats["late_frames"], "subscribers": stats}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Benchmark or serve synthetic camera frames.")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--pool-size", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--subscribers", type=int, default=1)
+    parser.add_argument("--serve", type=int, default=None, help="Serve over WebSocket on this port instead")
+    parser.add_argument("--depth-codec", default="raw")
+    args = parser.parse_args()
+
+    camera = SyntheticCamera(args.width, args.height, args.fps, pool_size=args.pool_size)
+    if args.serve is None:
+        print(benchmark_publisher(camera, args.seconds, args.subscribers))
+    else:
+        from RAIT.cameras.camera_publisher import CameraPublisher
+        from RAIT.cameras.frame_server import FrameServer
+
+        publisher = CameraPublisher(camera, start_publisher=True, depth_codec=args.depth_codec)
+        try:
+            asyncio.run(FrameServer(publisher, port=args.serve, path="/home/server").serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            publisher.stop_publisher()
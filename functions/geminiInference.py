@@ -219,23 +219,28 @@ class Gemini_Inference:
         """
         Processes the captured images to detect an object and calculate its real-world coordinates.
         
-        :param camera: Camera instance
+        :param camera: CameraReceiver instance, reused across calls
         :param target_class: List of target objects to detect
         :return: Transformed real-world coordinates of the detected object
         """
         recording_dir = self.config.get("recording_dir")
         save_path = f"{recording_dir}/{int(time.time())}"
-        frames = await camera.capture_frames(save_path)
-        color_frame_path = frames.get('rgb')
-        depth_frame_path = frames.get('depth')
+        # The receiver keeps its connection open between calls; the frames are written to save_path in the background
+        color_frame, depth_image = await camera.snapshot(save_path)
+        if color_frame is None or depth_image is None:
+            print("No frame received from the camera.")
+            return None
 
         intrinsics = camera._get_intrinsics(location='India', camera_name='D435I')
         
         self.set_target_classes(target_class)
-        color_image = Image.open(color_frame_path)
+        color_image = Image.fromarray(cv2.cvtColor(color_frame, cv2.COLOR_BGR2RGB))
         print("Gemini Inference: Processing frame...")
         output = self.get_object_center(color_image, target_class[0],save_path)
         print(f"Output: {output}")
+        if not output:
+            print("No object detected.")
+            return None
         
         pixel_center = output.get('center')
         print(f"Pixel Center Type: {type(pixel_center)}")
@@ -245,8 +250,6 @@ class Gemini_Inference:
             print("No object detected.")
             return None
         
-        print("Depth image path: ", depth_frame_path)
-        depth_image = np.load(depth_frame_path)
         print(f"Shape of Depth: {depth_image.shape}")
         print("Deprojecting pixel to point...")
         try:
@@ -338,5 +341,6 @@ if __name__ == "__main__":
         # camera = None
         detected_objects = await gemini.detect(camera, target_class=['bottle'])
         print(f"Detected objects: {detected_objects}")
+        await camera.cleanup()
     asyncio.run(main())
     
\ No newline at end of file
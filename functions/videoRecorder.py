@@ -3,6 +3,7 @@ import cv2
 import os
 import time
 import asyncio
+import json
 import numpy as np
 import sys
 from PIL import Image
@@ -153,6 +154,7 @@ class VideoRecorder:
             next_frame_time = start_time
             print(f"Recording setup complete - frame_time: {frame_time:.4f}s")
 
+            frame_log = []
             total_frames = int(self.config['video_duration'] * self.config['video_fps'])
             print(f"Will record {total_frames} frames over {self.config['video_duration']} seconds")
 
@@ -164,7 +166,11 @@ class VideoRecorder:
                     await asyncio.sleep(wait_time)
                     continue
 
-                color_frame, depth_frame = await self.receiver.decode_frames()
+                frame = await self.receiver.decode_frames()
+                color_frame, depth_frame = frame
+                if hasattr(frame, "timestamp"):
+                    frame_log.append({"index": frame_count, "sequence": frame.sequence,
+                                      "timestamp": frame.timestamp, "latency_s": frame.latency()})
 
                 if color_frame is not None:
                     print(f"Processing color frame - Shape: {color_frame.shape}")
@@ -192,6 +198,8 @@ class VideoRecorder:
 
             print("Releasing video writer")
             out.release()
+            with open(os.path.join(sample_folder, "frame_timestamps.json"), 'w') as f:
+                json.dump(frame_log, f, indent=2)
             print(f"Recording completed - Video and frames saved in {sample_folder}")
             print(f"Final frame count: {frame_count}")
 
@@ -0,0 +1,13 @@
+import importlib.util
+import os
+import sys
+
+# Every module imports the toolkit as the RAIT package. Register the checkout under that name, whatever
+# the directory is called, instead of relying on the parent directory being on the path.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if "RAIT" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("RAIT", os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["RAIT"] = package
+    spec.loader.exec_module(package)
@@ -0,0 +1,102 @@
+"""
+Stand-ins for cameras, sockets and brokers shared by the tests.
+"""
+import asyncio
+import time
+
+import numpy as np
+from websockets.exceptions import ConnectionClosed
+
+from RAIT.cameras import frame_protocol
+from RAIT.cameras.frame import Frame
+from RAIT.cameras.frame_pool import FramePool
+
+
+class FakeCamera:
+    """
+    Returns numbered color/depth frames, the color and depth values equal the sequence number.
+    With an interval, capture_frame waits that long like a camera running at a fixed frame rate.
+    """
+    provides_depth = True
+
+    def __init__(self, height=4, width=6, interval=0.0):
+        self.shape = (height, width)
+        self.interval = interval
+        self.sequence = 0
+
+    def capture_frame(self):
+        if self.interval:
+            time.sleep(self.interval)
+        self.sequence += 1
+        return Frame(np.full((*self.shape, 3), self.sequence % 256, np.uint8),
+                     np.full(self.shape, self.sequence, np.uint16), timestamp=100.0 + self.sequence,
+                     sequence=self.sequence)
+
+    def release_camera(self):
+        pass
+
+
+class PooledFakeCamera(FakeCamera):
+    """
+    FakeCamera that copies its frames into a FramePool and hands out leases like IntelRealSenseCamera.
+    """
+    supports_frame_leases = True
+
+    def __init__(self, height=4, width=6):
+        super().__init__(height, width)
+        self.pool = FramePool((height, width, 3), np.uint8, (height, width), np.uint16, size=4)
+
+    def capture_frame(self, lease=False):
+        frame = super().capture_frame()
+        pooled = self.pool.wrap(frame.color, frame.depth, timestamp=frame.timestamp, sequence=frame.sequence)
+        return pooled if lease else pooled.detach()
+
+
+class FakeMqttServer:
+    topic_name = "frames"
+
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, payload, topic_name=None):
+        self.messages.append((topic_name or self.topic_name, payload))
+
+
+class FakeWebSocket:
+    """
+    Replays prepared messages, then raises `error` (a closed connection by default) or, with
+    hang=True, waits like an idle server until more messages are pushed.
+    """
+    def __init__(self, messages, error=None, hang=False):
+        self.messages = list(messages)
+        self.error = error
+        self.hang = hang
+        self.sent = []
+        self.closed = False
+        self.arrived = asyncio.Event()
+
+    async def recv(self):
+        await asyncio.sleep(0)
+        while self.hang and not self.messages:
+            self.arrived.clear()
+            await self.arrived.wait()
+        if self.messages:
+            return self.messages.pop(0)
+        raise self.error or ConnectionClosed(None, None)
+
+    def push(self, message):
+        self.messages.append(message)
+        self.arrived.set()
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+def frame_message(sequence, timestamp=None):
+    color = np.full((4, 6, 3), sequence, np.uint8)
+    depth = np.full((4, 6), sequence, np.uint16)
+    return frame_protocol.encode_frame(color, depth, timestamp=float(sequence) if timestamp is None else timestamp,
+                                       sequence=sequence, color_codec="raw")
@@ -0,0 +1,263 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("hi_robotics")
+
+from RAIT.cameras import frame_protocol
+from RAIT.cameras.camera_publisher import CameraPublisher, ImageQueue, Subscriber
+from RAIT.cameras.frame import Frame
+from RAIT.cameras.shared_frame_bus import SharedFrameBus
+from fakes import FakeCamera, FakeMqttServer, PooledFakeCamera
+
+
+def filled_queue(count, max_size=3):
+    """
+    ImageQueue holding images 1..count, image n captured at timestamp 10 * n.
+    """
+    queue = ImageQueue(max_size)
+    for value in range(1, count + 1):
+        queue.put_image(value, timestamp=10.0 * value)
+    return queue
+
+
+def test_queue_keeps_the_newest_images():
+    queue = filled_queue(5)
+    assert len(queue) == 3
+    assert queue.latest_sequence == 5
+    assert queue.get_all_images() == [5, 4, 3]
+    assert (queue.get_by_index(0), queue.get_by_index(-1)) == (5, 3)
+    with pytest.raises(IndexError):
+        queue.get_by_index(3)
+    assert queue.get_image() == 5
+
+
+@pytest.mark.parametrize("timestamp, expected", [(0.0, 3), (34.0, 3), (36.0, 4), (44.9, 4), (1000.0, 5)])
+def test_get_closest_searches_the_held_images(timestamp, expected):
+    entry = filled_queue(5).get_closest(timestamp)
+    assert (entry.sequence, entry.image, entry.timestamp) == (expected, expected, 10.0 * expected)
+
+
+def test_get_closest_on_an_empty_queue():
+    assert ImageQueue().get_closest(1.0) is None
+
+
+def test_wait_for_next():
+    queue = filled_queue(5)
+    assert queue.wait_for_next(3).image == 4
+    assert queue.wait_for_next(0).image == 3  # Fell behind, the oldest held image comes next
+    assert queue.wait_for_next(0, latest=True).image == 5
+    assert queue.wait_for_next(5, timeout=0.01) is None
+
+    threading.Timer(0.05, queue.put_image, args=(6,)).start()
+    entry = queue.wait_for_next(5, timeout=2)
+    assert (entry.sequence, entry.image) == (6, 6)
+
+
+def test_snapshot_skips_overwritten_images():
+    queue = filled_queue(3)
+    snapshot = queue.snapshot()
+    queue.put_image(4, timestamp=40.0)
+    assert len(snapshot) == 3
+    assert [entry.image for entry in snapshot] == [3, 2]
+    assert snapshot.get(1) is None
+    assert snapshot.get(4) is None
+
+
+def test_queue_leases_pooled_frames_until_they_are_evicted():
+    camera = PooledFakeCamera()
+    queue = ImageQueue(2)
+    frames = []
+    for _ in range(3):
+        frame = camera.capture_frame(lease=True)
+        queue.put_image(frame, timestamp=frame.timestamp)
+        frame.release()
+        frames.append(frame)
+
+    assert [frame.buffer.refs for frame in frames] == [0, 1, 1]
+    assert camera.pool.get_stats()["in_use"] == 2
+
+    entry = queue.get_closest(frames[1].timestamp, lease=True)
+    assert entry.image is frames[1]
+    assert frames[1].buffer.refs == 2
+    entry.image.release()
+
+
+def recorder(delivered, gate=None):
+    def callback(images, image_queue):
+        if gate is not None:
+            gate.wait(2)
+        delivered.append(images)
+    return callback
+
+
+@pytest.mark.parametrize("overflow, pending", [("drop_oldest", [3, 4]), ("drop_newest", [1, 2])])
+def test_dropping_overflow_policies(overflow, pending):
+    subscriber = Subscriber(recorder([]), ImageQueue(), max_pending=2, overflow=overflow)
+    for sequence in range(1, 5):
+        subscriber.offer(sequence, sequence)
+    assert [images for _, images in subscriber.pending] == pending
+    assert subscriber.get_stats()["dropped"] == 2
+
+
+def test_dropped_and_pending_frames_give_back_their_lease():
+    camera = PooledFakeCamera()
+    subscriber = Subscriber(recorder([]), ImageQueue(), max_pending=1)
+    frames = [camera.capture_frame(lease=True) for _ in range(2)]
+    for sequence, frame in enumerate(frames, 1):
+        subscriber.offer(sequence, frame)
+        frame.release()
+    assert [frame.buffer.refs for frame in frames] == [0, 1]
+    subscriber.stop()
+    assert camera.pool.get_stats()["in_use"] == 0
+
+
+def test_block_policy_waits_for_the_callback():
+    delivered, gate = [], threading.Event()
+    subscriber = Subscriber(recorder(delivered, gate), ImageQueue(), max_pending=1, overflow="block")
+    subscriber.start()
+    try:
+        subscriber.offer(1, 1)
+        while subscriber.pending:  # The worker takes frame 1 and waits on the gate
+            time.sleep(0.001)
+        subscriber.offer(2, 2)
+
+        blocked = threading.Thread(target=subscriber.offer, args=(3, 3))
+        blocked.start()
+        blocked.join(0.1)
+        assert blocked.is_alive()
+
+        gate.set()
+        blocked.join(2)
+        assert not blocked.is_alive()
+        while len(delivered) < 3:
+            time.sleep(0.001)
+    finally:
+        subscriber.stop()
+    assert delivered == [1, 2, 3]
+    assert subscriber.get_stats()["dropped"] == 0
+
+
+def test_a_failing_callback_does_not_stop_delivery():
+    delivered = []
+
+    def callback(images, image_queue):
+        if images == 1:
+            raise RuntimeError("callback broke")
+        delivered.append(images)
+
+    subscriber = Subscriber(callback, ImageQueue(), max_pending=4)
+    subscriber.start()
+    try:
+        for sequence in (1, 2):
+            subscriber.offer(sequence, sequence)
+        while len(delivered) < 1:
+            time.sleep(0.001)
+    finally:
+        subscriber.stop()
+    assert delivered == [2]
+    assert subscriber.get_stats()["errors"] == 1
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        Subscriber(recorder([]), ImageQueue(), overflow="drop_all")
+
+
+def test_from_config_uses_the_stream_depth_codec():
+    config = {"Stream": {"Depth_codec": "rvl"}}
+    assert CameraPublisher.from_config(FakeCamera(), config).depth_codec == "rvl"
+    assert CameraPublisher.from_config(FakeCamera(), config, depth_codec="png").depth_codec == "png"
+    assert CameraPublisher.from_config(FakeCamera(), {}).depth_codec == "raw"
+
+
+def test_packed_mqtt_messages_use_the_configured_codec():
+    publisher = CameraPublisher.from_config(FakeCamera(), {"Stream": {"Depth_codec": "png"}}, mqtt_mode="packed",
+                                            mqtt_depth_decimation=2)
+    publisher.mqtt_server = FakeMqttServer()
+    frame = publisher.camera.capture_frame()
+    publisher.publish_via_mqtt(frame)
+
+    (topic, payload), = publisher.mqtt_server.messages
+    color, depth, header, metadata = frame_protocol.decode_packed_message(payload)
+    assert header.depth_codec == frame_protocol.get_depth_codec("png").codec_id
+    assert header.sequence == frame.sequence
+    assert metadata["depth_decimation"] == 2
+    assert np.array_equal(depth, frame.depth[::2, ::2])
+
+
+def test_shared_bus_follows_layout_changes():
+    publisher = CameraPublisher(FakeCamera(), shared_bus_name=f"rait-test-publisher-{os.getpid()}")
+    try:
+        publisher.write_to_shared_bus(publisher.camera.capture_frame())
+        publisher.camera.shape = (8, 10)
+        frame = publisher.camera.capture_frame()
+        publisher.write_to_shared_bus(frame)
+
+        reader = SharedFrameBus.attach(publisher.shared_bus_name)
+        latest = reader.latest()
+        assert (reader.color_shape, reader.depth_shape) == ((8, 10, 3), (8, 10))
+        assert latest.sequence == 1
+        assert np.array_equal(latest.depth, frame.depth)
+        del latest
+        reader.close()
+
+        publisher.write_to_shared_bus(Frame(frame.color, None))
+        assert publisher.shared_bus.depth_shape == (0, 0)
+    finally:
+        publisher.shared_bus.close()
+
+
+def test_capture_lease_is_released_when_publishing_fails():
+    camera = PooledFakeCamera()
+    publisher = CameraPublisher(camera, queue_size=3)
+    notified = []
+
+    def notify_subscribers(images, sequence=None):
+        notified.append(sequence)
+        if len(notified) == 2:
+            raise RuntimeError("subscriber registry broke")
+
+    publisher.notify_subscribers = notify_subscribers
+    publisher.opened_publisher = True
+    publisher.publish_frames()  # Returns once publishing fails
+
+    queued = publisher.image_queue.get_all_images()
+    assert len(queued) == 2
+    assert [frame.buffer.refs for frame in queued] == [1, 1]  # Only the queue's leases are left
+    assert camera.pool.get_stats()["in_use"] == 2
+
+
+def test_raw_mqtt_mode_sends_color_and_depth_separately():
+    publisher = CameraPublisher(FakeCamera())
+    publisher.mqtt_server = FakeMqttServer()
+    frame = publisher.camera.capture_frame()
+    publisher.publish_via_mqtt(frame)
+    assert publisher.mqtt_server.messages == [("frames", frame.color.tobytes()), ("frames_depth", frame.depth.tobytes())]
+
+
+@pytest.mark.parametrize("color_codec", ["raw", "jpeg", "webp"])
+def test_packed_mqtt_messages_are_self_describing(color_codec):
+    publisher = CameraPublisher(FakeCamera(48, 64), mqtt_mode="packed", color_codec=color_codec, depth_codec="rvl")
+    publisher.mqtt_server = FakeMqttServer()
+    frame = publisher.camera.capture_frame()
+    frame.metadata["exposure"] = 80
+    frame.intrinsics_key = "SN1/64x48"
+    publisher.publish_via_mqtt(frame)
+
+    (topic, payload), = publisher.mqtt_server.messages
+    color, depth, header, metadata = frame_protocol.decode_packed_message(payload)
+    assert topic == "frames"
+    assert (header.timestamp, header.sequence) == (frame.timestamp, frame.sequence)
+    assert metadata == {"exposure": 80, "intrinsics_key": "SN1/64x48"}
+    assert color.shape == frame.color.shape
+    assert np.abs(color.astype(int) - frame.color).max() <= 2
+    assert np.array_equal(depth, frame.depth)
+
+
+def test_unknown_mqtt_mode():
+    with pytest.raises(ValueError):
+        CameraPublisher(FakeCamera(), mqtt_mode="json")
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from RAIT.cameras.depth_registration import DepthRegistration, Intrinsics
+
+WIDTH, HEIGHT = 160, 120
+# D435-like: the color camera has a ~1.6x longer focal length than the depth camera
+DEPTH_INTRINSICS = Intrinsics(WIDTH, HEIGHT, 96.3, 96.3, 80.2, 59.7)
+COLOR_INTRINSICS = Intrinsics(WIDTH, HEIGHT, 153.8, 153.6, 81.1, 60.4)
+ANGLE = np.deg2rad(0.3)
+ROTATION = np.array([[np.cos(ANGLE), 0, np.sin(ANGLE)], [0, 1, 0], [-np.sin(ANGLE), 0, np.cos(ANGLE)]])
+TRANSLATION = (0.015, 0.0001, 0.0002)
+
+
+def reference_align(depth, depth_intrinsics, color_intrinsics, rotation, translation, depth_scale=0.001):
+    """
+    Per-pixel port of align_images from librealsense (align.cpp), without distortion.
+    """
+    aligned = np.zeros((color_intrinsics.height, color_intrinsics.width), dtype=depth.dtype)
+
+    def project(x, y, z):
+        point = np.array([(x - depth_intrinsics.ppx) / depth_intrinsics.fx * z,
+                          (y - depth_intrinsics.ppy) / depth_intrinsics.fy * z, z])
+        other = rotation @ point + np.asarray(translation)
+        return (int(other[0] / other[2] * color_intrinsics.fx + color_intrinsics.ppx + 0.5),
+                int(other[1] / other[2] * color_intrinsics.fy + color_intrinsics.ppy + 0.5))
+
+    for y in range(depth_intrinsics.height):
+        for x in range(depth_intrinsics.width):
+            if not depth[y, x]:
+                continue
+            z = float(depth[y, x]) * depth_scale
+            x0, y0 = project(x - 0.5, y - 0.5, z)
+            x1, y1 = project(x + 0.5, y + 0.5, z)
+            if x0 < 0 or y0 < 0 or x1 >= color_intrinsics.width or y1 >= color_intrinsics.height:
+                continue
+            footprint = aligned[y0:y1 + 1, x0:x1 + 1]
+            np.copyto(footprint, np.where(footprint > 0, np.minimum(footprint, depth[y, x]), depth[y, x]))
+    return aligned
+
+
+@pytest.fixture(scope="module")
+def depth():
+    rng = np.random.default_rng(0)
+    image = (600 + np.mgrid[0:HEIGHT, 0:WIDTH][0] * 3 + rng.normal(0, 3, (HEIGHT, WIDTH))).astype(np.uint16)
+    image[40:70, 50:90] -= 200  # a nearer box, so occlusions are exercised
+    image[rng.random((HEIGHT, WIDTH)) < 0.05] = 0
+    return image
+
+
+@pytest.fixture(scope="module")
+def registration():
+    return DepthRegistration(DEPTH_INTRINSICS, COLOR_INTRINSICS, ROTATION, TRANSLATION)
+
+
+def test_align_matches_reference(depth, registration):
+    expected = reference_align(depth, DEPTH_INTRINSICS, COLOR_INTRINSICS, ROTATION, TRANSLATION)
+    aligned = registration.align(depth)
+    # float32 lookup maps against float64 may round a footprint edge differently in rare cases
+    assert np.mean(aligned == expected) > 0.995
+
+
+def test_align_has_no_footprint_holes(registration):
+    flat = np.full((HEIGHT, WIDTH), 800, dtype=np.uint16)
+    aligned = registration.align(flat)
+    covered = aligned[10:-10, 10:-10]
+    assert np.count_nonzero(covered == 0) == 0
+
+
+def test_roi_is_crop_of_full_frame(depth, registration):
+    full = registration.align(depth)
+    roi = (30, 20, 110, 90)
+    assert np.array_equal(registration.align(depth, roi), full[20:90, 30:110])
+
+
+def test_depth_at_color_pixels(registration):
+    flat = np.full((HEIGHT, WIDTH), 750, dtype=np.uint16)
+    distances = registration.depth_at_color_pixels(flat, [(80, 60), (40, 30), (-50, -50)])
+    assert distances[:2] == pytest.approx([0.75, 0.75])
+    assert distances[2] == 0
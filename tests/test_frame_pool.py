@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from RAIT.cameras.exceptions import HIComputerVisionException
+from RAIT.cameras.frame_pool import FramePool
+
+
+def make_pool(size=2):
+    return FramePool((4, 4, 3), np.uint8, (4, 4), np.uint16, size=size)
+
+
+def test_buffers_are_reused_after_the_last_release():
+    pool = make_pool()
+    frame = pool.wrap(np.ones((4, 4, 3), np.uint8), np.ones((4, 4), np.uint16), sequence=1)
+    frame.retain()
+    frame.release()
+    assert pool.get_stats()["in_use"] == 1
+    frame.release()
+    stats = pool.get_stats()
+    assert stats["in_use"] == 0
+    assert stats["free"] == 2
+
+    again = pool.wrap(np.zeros((4, 4, 3), np.uint8), np.zeros((4, 4), np.uint16))
+    assert again.buffer is frame.buffer
+    assert pool.get_stats()["allocated"] == 2
+
+
+def test_exhausted_pool_allocates_instead_of_blocking():
+    pool = make_pool(size=1)
+    frames = [pool.wrap(np.zeros((4, 4, 3), np.uint8), np.zeros((4, 4), np.uint16)) for _ in range(3)]
+    stats = pool.get_stats()
+    assert stats["exhausted"] == 2
+    assert stats["peak_in_use"] == 3
+    for frame in frames:
+        frame.release()
+    assert pool.get_stats()["free"] == pool.max_size
+
+
+def test_double_release_raises():
+    pool = make_pool()
+    frame = pool.wrap(np.zeros((4, 4, 3), np.uint8), np.zeros((4, 4), np.uint16))
+    frame.release()
+    with pytest.raises(HIComputerVisionException):
+        frame.release()
+    with pytest.raises(HIComputerVisionException):
+        frame.retain()
+
+
+def test_detach_copies_and_returns_the_buffer():
+    pool = make_pool()
+    frame = pool.wrap(np.full((4, 4, 3), 7, np.uint8), np.full((4, 4), 9, np.uint16), sequence=5,
+                      metadata={"exposure": 80})
+    detached = frame.detach()
+    assert detached.buffer is None
+    assert pool.get_stats()["in_use"] == 0
+
+    # The recycled buffer is overwritten, the detached copy is not
+    pool.wrap(np.zeros((4, 4, 3), np.uint8), np.zeros((4, 4), np.uint16))
+    assert (detached.color == 7).all() and (detached.depth == 9).all()
+    assert (detached.sequence, detached.metadata) == (5, {"exposure": 80})
+    assert detached.detach() is detached
+
+
+def test_matches_checks_shape_and_dtype():
+    pool = make_pool()
+    assert pool.matches(np.zeros((4, 4, 3), np.uint8), np.zeros((4, 4), np.uint16))
+    assert not pool.matches(np.zeros((4, 4, 3), np.uint8), np.zeros((4, 4), np.float32))
+    assert not pool.matches(np.zeros((8, 4, 3), np.uint8), np.zeros((4, 4), np.uint16))
+    assert not pool.matches(np.zeros((4, 4, 3), np.uint8), None)
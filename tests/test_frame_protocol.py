@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from RAIT.cameras import frame_protocol
+from RAIT.cameras.depth_codecs import DEPTH_CODECS, get_depth_codec
+from RAIT.cameras.exceptions import FrameProtocolException
+from RAIT.cameras.frame import Frame
+
+
+@pytest.fixture(scope="module")
+def images():
+    rng = np.random.default_rng(0)
+    color = rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    depth = (500 + np.mgrid[0:48, 0:64][0] * 4 + rng.integers(0, 3, (48, 64))).astype(np.uint16)
+    depth[rng.random((48, 64)) < 0.1] = 0
+    return color, depth
+
+
+@pytest.mark.parametrize("codec", sorted(DEPTH_CODECS))
+def test_depth_codecs_are_lossless(codec, images):
+    if not DEPTH_CODECS[codec].available():
+        pytest.skip(f"{codec} needs a package that is not installed")
+    _, depth = images
+    message = frame_protocol.encode_frame(None, depth, depth_codec=codec)
+    _, decoded, header = frame_protocol.decode_frame(message)
+    assert header.depth_codec == get_depth_codec(codec).codec_id
+    assert decoded.dtype == depth.dtype
+    assert np.array_equal(decoded, depth)
+
+
+@pytest.mark.parametrize("codec", ["png", "rvl"])
+@pytest.mark.parametrize("dtype", [np.float32, np.int32, np.uint8])
+def test_uint16_codecs_reject_other_dtypes(codec, dtype, images):
+    _, depth = images
+    with pytest.raises(FrameProtocolException, match="only encodes uint16"):
+        frame_protocol.encode_frame(None, depth.astype(dtype), depth_codec=codec)
+
+
+def test_raw_codec_keeps_float_depth(images):
+    _, depth = images
+    metres = depth.astype(np.float32) / 1000
+    _, decoded, header = frame_protocol.decode_frame(frame_protocol.encode_frame(None, metres))
+    assert header.depth_dtype == np.float32
+    assert np.array_equal(decoded, metres)
+
+
+@pytest.mark.parametrize("color_codec", ["raw", "png"])
+def test_lossless_color_round_trip(color_codec, images):
+    color, depth = images
+    message = frame_protocol.encode_frame(color, depth, timestamp=12.5, sequence=42, color_codec=color_codec)
+    decoded_color, decoded_depth, header = frame_protocol.decode_frame(message)
+    assert np.array_equal(decoded_color, color)
+    assert np.array_equal(decoded_depth, depth)
+    assert header.timestamp == 12.5
+    assert header.sequence == 42
+    assert header.color_shape == (48, 64, 3)
+
+
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_raw_color_keeps_its_dtype(dtype, images):
+    color, _ = images
+    color = color.astype(dtype) * 257
+    decoded, _, header = frame_protocol.decode_frame(frame_protocol.encode_frame(color, None, color_codec="raw"))
+    assert header.color_dtype == np.dtype(dtype)
+    assert decoded.dtype == np.dtype(dtype)
+    assert np.array_equal(decoded, color)
+
+
+def test_version_1_frames_still_decode(images):
+    color, depth = images
+    header = frame_protocol.HEADER_STRUCT_V1.pack(
+        frame_protocol.MAGIC, 1, 0, frame_protocol.COLOR_CODECS["raw"], 0, 48, 64, 3, 48, 64, b"H",
+        1.5, 9, color.nbytes, depth.nbytes, 0)
+    decoded_color, decoded_depth, parsed = frame_protocol.decode_frame(header + color.tobytes() + depth.tobytes())
+    assert parsed.version == 1
+    assert parsed.color_dtype == np.uint8
+    assert (parsed.timestamp, parsed.sequence) == (1.5, 9)
+    assert np.array_equal(decoded_color, color)
+    assert np.array_equal(decoded_depth, depth)
+
+
+def test_jpeg_color_is_close(images):
+    color, _ = images
+    smooth = np.repeat(np.repeat(color[::8, ::8], 8, axis=0), 8, axis=1)
+    decoded, _, _ = frame_protocol.decode_frame(frame_protocol.encode_frame(smooth, None, jpeg_quality=95))
+    assert decoded.shape == smooth.shape
+    assert np.abs(decoded.astype(int) - smooth).mean() < 10
+
+
+def test_metadata_round_trip(images):
+    color, depth = images
+    frame = Frame(color, depth, timestamp=3.25, sequence=7, metadata={"exposure": 80}, intrinsics_key="SN1/64x48")
+    message = frame_protocol.encode_frame(color, depth, timestamp=frame.timestamp, sequence=frame.sequence,
+                                          color_codec="raw", metadata=frame.to_metadata())
+    decoded_color, decoded_depth, header, metadata = frame_protocol.decode_packed_message(message)
+    rebuilt = Frame.from_metadata(decoded_color, decoded_depth, header.timestamp, header.sequence, metadata)
+    assert rebuilt.metadata == {"exposure": 80}
+    assert rebuilt.intrinsics_key == "SN1/64x48"
+    assert (rebuilt.timestamp, rebuilt.sequence) == (3.25, 7)
+
+
+def test_decode_message_accepts_both_formats(images):
+    color, depth = images
+    binary = frame_protocol.encode_frame(color, depth, color_codec="raw")
+    legacy = frame_protocol.encode_legacy_frame(color, depth)
+    assert frame_protocol.is_binary_frame(binary)
+    assert not frame_protocol.is_binary_frame(legacy)
+
+    _, legacy_depth, header = frame_protocol.decode_message(legacy)
+    assert header is None
+    assert np.array_equal(legacy_depth, depth)
+    assert frame_protocol.decode_message(binary)[2] is not None
+
+
+def test_truncated_and_foreign_messages_are_rejected(images):
+    color, depth = images
+    message = frame_protocol.encode_frame(color, depth, color_codec="raw")
+    with pytest.raises(FrameProtocolException):
+        frame_protocol.parse_header(message[:-10])
+    with pytest.raises(FrameProtocolException):
+        frame_protocol.parse_header(message[:8])
+    with pytest.raises(FrameProtocolException):
+        frame_protocol.parse_header(b"XXXX" + message[4:])
+    with pytest.raises(FrameProtocolException):
+        frame_protocol.encode_frame(color, depth, depth_codec="unknown")
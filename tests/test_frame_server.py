@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+import websockets
+
+pytest.importorskip("hi_robotics")
+
+from RAIT.cameras import frame_protocol
+from RAIT.cameras.camera_publisher import CameraPublisher
+from RAIT.cameras.frame_server import LEGACY_FORMAT, FrameClient, FrameServer
+from fakes import FakeCamera
+
+
+class HelloSocket:
+    def __init__(self, hello=None):
+        self.hello = hello
+
+    async def recv(self):
+        if self.hello is None:
+            await asyncio.Event().wait()
+        return self.hello
+
+
+def negotiate(server, hello=None):
+    return asyncio.run(server.negotiate(HelloSocket(hello)))
+
+
+def test_from_config_reads_the_stream_section():
+    config = {"Stream": {"Websocket_server": "ws://host:3100", "Websocket_topic": "/home/server", "Depth_codec": "rvl"}}
+    server = FrameServer.from_config(CameraPublisher(FakeCamera()), config)
+    assert (server.port, server.path, server.depth_codec) == (3100, "/home/server", "rvl")
+
+    defaults = FrameServer.from_config(CameraPublisher(FakeCamera(), depth_codec="png"), {})
+    assert (defaults.port, defaults.path, defaults.depth_codec) == (3000, None, "png")
+
+
+def test_clients_without_a_codec_get_the_configured_one():
+    server = FrameServer(CameraPublisher(FakeCamera()), depth_codec="rvl", hello_timeout=0.05)
+    hello = json.loads(frame_protocol.hello_message())
+    del hello["depth_codec"]
+    assert negotiate(server, json.dumps(hello)) == ("binary", "rvl")
+    assert negotiate(server, frame_protocol.hello_message("png")) == ("binary", "png")
+    assert negotiate(server, frame_protocol.hello_message("unknown")) == ("binary", "rvl")
+    assert negotiate(server) == LEGACY_FORMAT
+
+
+class RecordingSocket:
+    remote_address = ("127.0.0.1", 0)
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def test_frames_are_encoded_once_per_format():
+    async def scenario():
+        server = FrameServer(CameraPublisher(FakeCamera()))
+        server.loop = asyncio.get_running_loop()
+        formats = [("binary", "raw"), ("binary", "raw"), ("binary", "rvl"), LEGACY_FORMAT]
+        clients = [FrameClient(RecordingSocket(), frame_format) for frame_format in formats]
+        server.clients = {id(client): client for client in clients}
+        senders = [asyncio.create_task(client.send_loop()) for client in clients]
+
+        frame = server.publisher.camera.capture_frame()
+        await asyncio.to_thread(server.on_frame, frame, server.publisher.image_queue)
+        while not all(client.stats["sent"] for client in clients):
+            await asyncio.sleep(0.001)
+        for sender in senders:
+            sender.cancel()
+        return server, clients, frame
+
+    server, clients, frame = asyncio.run(scenario())
+    assert server.stats["encodes"] == 3
+    assert clients[0].websocket.sent[0] is clients[1].websocket.sent[0]
+    _, depth, header = frame_protocol.decode_frame(clients[2].websocket.sent[0])
+    assert header.depth_codec == frame_protocol.get_depth_codec("rvl").codec_id
+    assert np.array_equal(depth, frame.depth)
+    assert not frame_protocol.is_binary_frame(clients[3].websocket.sent[0])
+
+
+def test_a_slow_client_only_keeps_the_newest_frame():
+    async def scenario():
+        client = FrameClient(RecordingSocket(), ("binary", "raw"))
+        for message in (b"first", b"second", b"third"):
+            client.offer(message)
+        sender = asyncio.create_task(client.send_loop())
+        while not client.stats["sent"]:
+            await asyncio.sleep(0.001)
+        sender.cancel()
+        return client
+
+    client = asyncio.run(scenario())
+    assert client.websocket.sent == [b"third"]
+    assert client.stats["skipped"] == 2
+
+
+def test_clients_receive_frames_over_websocket():
+    async def scenario():
+        publisher = CameraPublisher(FakeCamera(interval=0.01), start_publisher=True)
+        server = FrameServer(publisher, host="127.0.0.1", port=0, path="/home/server", hello_timeout=0.1)
+        await server.start()
+        port = server.server.sockets[0].getsockname()[1]
+        uri = f"ws://127.0.0.1:{port}/home/server"
+        try:
+            async with websockets.connect(uri) as binary, websockets.connect(uri) as legacy:
+                await binary.send(frame_protocol.hello_message("rvl"))
+                color, depth, header = frame_protocol.decode_frame(await binary.recv())
+                legacy_color, legacy_depth = frame_protocol.decode_legacy_frame(await legacy.recv())
+
+            async with websockets.connect(f"ws://127.0.0.1:{port}/other") as other:
+                with pytest.raises(websockets.exceptions.ConnectionClosed) as closed:
+                    await other.recv()
+        finally:
+            await server.stop()
+            publisher.stop_publisher()
+        return header, color, depth, legacy_depth, closed.value
+
+    header, color, depth, legacy_depth, closed = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert header.depth_codec == frame_protocol.get_depth_codec("rvl").codec_id
+    assert np.all(depth == header.sequence)
+    assert color.shape == (4, 6, 3)
+    assert legacy_depth.shape == (4, 6)
+    assert closed.rcvd.code == 1008
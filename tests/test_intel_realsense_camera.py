@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyrealsense2", exc_type=ImportError)
+pytest.importorskip("hi_robotics")
+
+from RAIT.cameras.intel_realsense_camera import IntelRealSenseCamera
+
+
+@pytest.fixture
+def camera():
+    camera = IntelRealSenseCamera(check_usage=False)
+    yield camera
+    camera.pipeline.stop()
+
+
+def test_unleased_frames_are_copied_past_the_pool(camera):
+    frame = camera.capture_frame()
+    assert frame.buffer is None
+    assert camera.frame_pool is None
+    assert not np.shares_memory(frame.color, np.asanyarray(camera.color_frame.get_data()))
+    assert not np.shares_memory(frame.depth, np.asanyarray(camera.depth_frame.get_data()))
+    assert camera.depth_image is frame.depth
+
+
+def test_leased_frames_use_the_pool(camera):
+    leased = camera.capture_frame(lease=True)
+    assert leased.buffer is not None
+    assert camera.frame_pool.get_stats()["in_use"] == 1
+    leased.release()
+
+    # An unpooled capture replaces the latest frame, so the camera gives back its own lease
+    camera.capture_frame()
+    assert camera.frame_pool.get_stats()["in_use"] == 0
+    assert IntelRealSenseCamera.supports_frame_leases
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pyrealsense2", exc_type=ImportError)
+
+from RAIT.cameras.multi_receiver import MultiCameraReceiver
+from fakes import FakeWebSocket, frame_message
+
+
+def make_receiver(streams, tolerance=0.02):
+    """
+    Builds a MultiCameraReceiver whose cameras replay `streams`, a dict of camera name to
+    (sequence, timestamp) pairs. The sockets stay open once the frames are sent.
+    """
+    config = {"Stream": {"Sync_tolerance": tolerance, "Cameras": [{"Name": name} for name in streams]}}
+    multi = MultiCameraReceiver(config)
+    for name, frames in streams.items():
+        multi.receivers[name].websocket = FakeWebSocket([frame_message(sequence, timestamp)
+                                                         for sequence, timestamp in frames], hang=True)
+        multi.intrinsics[name] = None
+    return multi
+
+
+async def collect(multi, count):
+    sets = []
+    async for frame_set in multi.synchronized_frames():
+        sets.append({name: (int(frame.color[0, 0, 0]), frame.timestamp) for name, frame in frame_set.items()})
+        if len(sets) == count:
+            break
+    return sets
+
+
+def run(coroutine, timeout=5):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout))
+
+
+def test_sets_are_built_around_the_slowest_camera():
+    multi = make_receiver({"front": [(1, 1.00), (2, 1.10), (3, 1.20)], "rear": [(11, 1.105)]})
+    assert run(collect(multi, 1)) == [{"front": (2, 1.10), "rear": (11, 1.105)}]
+    assert multi.sync_stats["sets"] == 1
+    assert multi.sync_stats["last_skew_s"] == pytest.approx(0.005)
+
+
+def test_the_newest_matching_frames_are_used():
+    multi = make_receiver({"front": [(1, 1.00), (2, 1.10), (3, 1.20)], "rear": [(11, 1.005), (13, 1.205)]})
+
+    async def scenario():
+        # Let both drain tasks buffer every frame before the first set is built
+        for receiver in multi.receivers.values():
+            receiver.start_drain()
+        while sum(receiver.drain_stats["received"] for receiver in multi.receivers.values()) < 5:
+            await asyncio.sleep(0)
+        return await collect(multi, 1)
+
+    assert run(scenario()) == [{"front": (3, 1.20), "rear": (13, 1.205)}]
+
+
+def test_reference_frames_without_a_partner_are_discarded():
+    multi = make_receiver({"front": [(1, 1.00)], "rear": [(11, 1.15)]})
+
+    async def scenario():
+        task = asyncio.ensure_future(collect(multi, 1))
+        while multi.sync_stats["unmatched"] == 0:
+            await asyncio.sleep(0.001)
+        multi.receivers["front"].websocket.push(frame_message(2, 1.16))
+        return await task
+
+    assert run(scenario()) == [{"front": (2, 1.16), "rear": (11, 1.15)}]
+    assert multi.sync_stats["unmatched"] == 1
+
+
+def test_an_idle_camera_does_not_spin_the_loop():
+    multi = make_receiver({"front": [(1, 1.00), (2, 1.10), (3, 1.20)], "rear": []})
+    waits = {"count": 0}
+    for receiver in multi.receivers.values():
+        async def counted(wait_for_frame=receiver.wait_for_frame):
+            waits["count"] += 1
+            await wait_for_frame()
+
+        receiver.wait_for_frame = counted
+
+    async def scenario():
+        task = asyncio.ensure_future(collect(multi, 1))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        return await task
+
+    assert run(scenario()) == []
+    assert waits["count"] < 20
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from RAIT.cameras.depth_registration import Intrinsics
+from RAIT.cameras.point_cloud import PointCloudGenerator, get_ray_grid
+
+INTRINSICS = Intrinsics(64, 48, 60.0, 61.0, 31.7, 24.2)
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    depth = rng.integers(300, 3000, (48, 64)).astype(np.uint16)
+    depth[rng.random((48, 64)) < 0.1] = 0
+    color = rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    return depth, color
+
+
+def reference_points(depth, pixels, scale=0.001):
+    points = []
+    for y, x in pixels:
+        z = depth[y, x] * scale
+        points.append(((x - INTRINSICS.ppx) / INTRINSICS.fx * z, (y - INTRINSICS.ppy) / INTRINSICS.fy * z, z))
+    return np.array(points, dtype=np.float32).reshape(-1, 3)
+
+
+def test_full_frame_matches_per_pixel_deprojection(frame):
+    depth, color = frame
+    points, colors = PointCloudGenerator(INTRINSICS).compute(depth, color)
+    pixels = list(zip(*np.nonzero(depth)))
+    np.testing.assert_allclose(points, reference_points(depth, pixels), rtol=1e-5, atol=1e-6)
+    assert np.array_equal(colors, color[depth > 0])
+
+
+def test_roi_mask_and_depth_limits(frame):
+    depth, _ = frame
+    mask = np.zeros(depth.shape, dtype=bool)
+    mask[10:30, 20:50] = True
+    points, colors = PointCloudGenerator(INTRINSICS).compute(depth, roi=(16, 8, 40, 40), mask=mask,
+                                                             min_depth=0.5, max_depth=2.0)
+    expected = [(y, x) for y in range(10, 30) for x in range(20, 40) if 500 < depth[y, x] <= 2000]
+    assert colors is None
+    np.testing.assert_allclose(points, reference_points(depth, expected), rtol=1e-5, atol=1e-6)
+
+
+def test_roi_is_clipped_to_the_frame(frame):
+    depth, _ = frame
+    points, _ = PointCloudGenerator(INTRINSICS).compute(depth, roi=(-10, -10, 5, 5))
+    expected = [(y, x) for y in range(5) for x in range(5) if depth[y, x]]
+    np.testing.assert_allclose(points, reference_points(depth, expected), rtol=1e-5, atol=1e-6)
+
+
+def test_ray_grid_is_cached_and_read_only():
+    rays = get_ray_grid(INTRINSICS)
+    assert rays is get_ray_grid(Intrinsics(*INTRINSICS))
+    assert rays.shape == (2, 64 * 48)
+    assert not rays.flags.writeable
+
+
+def test_mismatched_depth_shape_raises():
+    with pytest.raises(ValueError):
+        PointCloudGenerator(INTRINSICS).compute(np.zeros((10, 10), np.uint16))
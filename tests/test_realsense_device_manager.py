@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("pyrealsense2", exc_type=ImportError)
+pytest.importorskip("hi_robotics")
+
+from RAIT.cameras import realsense_device_manager
+from RAIT.cameras.exceptions import IntelRealSenseCameraException
+from RAIT.cameras.realsense_device_manager import DeviceInfo, RealSenseDeviceManager
+
+# Serials whose camera or publisher raises on construction
+fail_cameras, fail_publishers = set(), set()
+
+
+class FakeRealSenseCamera:
+    instances = []
+
+    def __init__(self, camera_id, **kwargs):
+        if camera_id in fail_cameras:
+            raise RuntimeError(f"{camera_id} did not start")
+        self.camera_id = camera_id
+        self.released = False
+        FakeRealSenseCamera.instances.append(self)
+
+    def release_camera(self):
+        self.released = True
+
+
+class FakePublisher:
+    def __init__(self, camera, **kwargs):
+        if camera.camera_id in fail_publishers:
+            raise RuntimeError(f"no frames from {camera.camera_id}")
+        self.camera = camera
+
+    def stop_publisher(self):
+        self.camera.release_camera()
+
+
+@pytest.fixture
+def devices(monkeypatch):
+    FakeRealSenseCamera.instances = []
+    fail_cameras.clear()
+    fail_publishers.clear()
+    serials = ["SN1", "SN2", "SN3"]
+    monkeypatch.setattr(realsense_device_manager, "enumerate_devices",
+                        lambda: [DeviceInfo(serial, "D435I", "5.16", True) for serial in serials])
+    monkeypatch.setattr(realsense_device_manager, "IntelRealSenseCamera", FakeRealSenseCamera)
+    monkeypatch.setattr(realsense_device_manager, "CameraPublisher", FakePublisher)
+    monkeypatch.setattr(RealSenseDeviceManager, "configure_sync", lambda manager: None)
+    return serials
+
+
+def test_every_device_is_started(devices):
+    manager = RealSenseDeviceManager()
+    assert sorted(manager.cameras) == sorted(manager.publishers) == devices
+    manager.stop()
+    assert all(camera.released for camera in FakeRealSenseCamera.instances)
+
+
+def test_a_failing_device_releases_every_camera(devices):
+    fail_cameras.add("SN1")
+    fail_publishers.add("SN3")
+    with pytest.raises(IntelRealSenseCameraException) as raised:
+        RealSenseDeviceManager()
+    assert "SN1" in str(raised.value) and "SN3" in str(raised.value) and "SN2" not in str(raised.value)
+    # SN2 started and was stopped, SN3 was opened but its publisher failed
+    assert sorted(camera.camera_id for camera in FakeRealSenseCamera.instances) == ["SN2", "SN3"]
+    assert all(camera.released for camera in FakeRealSenseCamera.instances)
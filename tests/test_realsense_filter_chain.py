@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("pyrealsense2", exc_type=ImportError)
+
+from RAIT.cameras.driver_helpers.realsense_filter_chain import RealSenseFilterChain
+from RAIT.cameras.exceptions import IntelRealSenseCameraException
+
+
+class RecordingFilter:
+    """
+    Stands in for an rs filter and appends its name to the frame it processes.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def process(self, frame):
+        return frame + [self.name]
+
+
+def recording_chain(config):
+    chain = RealSenseFilterChain.from_config(config)
+    for stage in chain.stages:
+        stage.filter = RecordingFilter(stage.name)
+    return chain
+
+
+FULL_CHAIN = ["threshold", "depth_to_disparity", "spatial", "temporal", "disparity_to_depth", "hole_filling"]
+
+
+def test_from_config_keeps_order_flags_and_options():
+    chain = RealSenseFilterChain.from_config({"Filters": [
+        {"Name": "threshold", "Options": {"min_distance": 0.15, "max_distance": 2.0}},
+        "spatial",
+        {"Name": "hole_filling", "Enabled": False},
+    ]})
+    assert [stage.name for stage in chain.stages] == ["threshold", "spatial", "hole_filling"]
+    assert [stage.enabled for stage in chain.stages] == [True, True, False]
+    assert chain.get_stage("threshold").options == {"min_distance": 0.15, "max_distance": 2.0}
+    assert chain.has_stage("spatial") and not chain.has_stage("temporal")
+
+
+@pytest.mark.parametrize("config", [{}, {"Filters": None}, []])
+def test_empty_sections_build_an_empty_chain(config):
+    chain = RealSenseFilterChain.from_config(config)
+    assert chain.stages == []
+    assert chain.process(["frame"]) == ["frame"]
+
+
+def test_unknown_filters_are_rejected():
+    with pytest.raises(IntelRealSenseCameraException, match="Invalid filter"):
+        RealSenseFilterChain.from_config(["median"])
+    with pytest.raises(IntelRealSenseCameraException, match="not part of the chain"):
+        RealSenseFilterChain.from_config(["spatial"]).set_enabled("temporal", False)
+
+
+def test_enabled_filters_run_in_order():
+    chain = recording_chain(FULL_CHAIN)
+    assert chain.process([]) == FULL_CHAIN
+    chain.set_enabled("hole_filling", False)
+    assert chain.process([]) == FULL_CHAIN[:-1]
+
+
+@pytest.mark.parametrize("name", ["depth_to_disparity", "disparity_to_depth"])
+def test_disparity_pair_is_switched_together(name):
+    chain = recording_chain(FULL_CHAIN)
+    chain.set_enabled(name, False)
+    assert chain.process([]) == ["threshold", "spatial", "temporal", "hole_filling"]
+    chain.set_enabled(name, True)
+    assert chain.process([]) == FULL_CHAIN
+
+
+def test_stats_count_only_running_filters():
+    chain = recording_chain(["threshold", "spatial"])
+    chain.set_enabled("spatial", False)
+    for _ in range(3):
+        chain.process([])
+    stats = chain.get_stats()
+    assert stats["chain"]["calls"] == 3
+    assert stats["threshold"]["calls"] == 3
+    assert stats["spatial"] == {"enabled": False, "calls": 0, "last_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    chain.reset_stats()
+    assert chain.get_stats()["threshold"]["calls"] == 0
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyrealsense2", exc_type=ImportError)
+
+from RAIT.cameras.realsense_imu import ImuRingBuffer, RealSenseImu, rotate_to_body
+
+
+def filled(count, capacity, rate=100.0):
+    buffer = ImuRingBuffer(capacity)
+    for index in range(count):
+        buffer.append(index / rate, (index, 2 * index, 0))
+    return buffer
+
+
+@pytest.mark.parametrize("count", [5, 10, 13, 20, 27])
+def test_wrapped_ring_keeps_the_newest_samples_in_order(count):
+    buffer = filled(count, 10)
+    oldest = max(count - 10, 0)
+    assert len(buffer) == min(count, 10)
+    assert buffer.time_span() == pytest.approx((oldest / 100, (count - 1) / 100))
+    times, values = buffer.window(-1, 1)
+    np.testing.assert_allclose(times, np.arange(oldest, count) / 100)
+    np.testing.assert_allclose(values[:, 0], np.arange(oldest, count))
+
+
+@pytest.mark.parametrize("count", [10, 13, 27])
+def test_interpolation_across_the_wrap_point(count):
+    buffer = filled(count, 10)
+    oldest = max(count - 10, 0)
+    queries = (np.arange(oldest, count - 1) + 0.25) / 100
+    expected = np.arange(oldest, count - 1) + 0.25
+    np.testing.assert_allclose(buffer.interpolate(queries)[:, 0], expected, rtol=1e-5)
+    assert buffer.interpolate(queries[0])[1] == pytest.approx(2 * expected[0])
+
+
+def test_queries_outside_the_span_clamp_to_the_ends():
+    buffer = filled(27, 10)
+    assert buffer.interpolate(-5.0)[0] == 17
+    assert buffer.interpolate(5.0)[0] == 26
+    assert ImuRingBuffer(4).interpolate(1.0) is None
+    single = filled(1, 4)
+    assert single.interpolate(3.0)[0] == 0
+
+
+def test_window_bounds_are_inclusive():
+    buffer = filled(27, 10)
+    times, _ = buffer.window(0.2, 0.22)
+    np.testing.assert_allclose(times, [0.2, 0.21, 0.22])
+
+
+def synthetic_imu(rate=(0.0, 1.0, 0.0), seconds=1.0, accel=(0.0, -9.8, 0.0)):
+    imu = RealSenseImu(start=False)
+    for index in range(int(seconds * 400) + 1):
+        timestamp = index / 400
+        if index % 2 == 0:
+            imu._add_accel(timestamp, np.array(accel))
+        imu._add_gyro(timestamp, np.array(rate))
+    return imu
+
+
+def test_gyro_integration_about_gravity():
+    imu = synthetic_imu()
+    assert imu.get_rotation(0.0, 1.0) == pytest.approx(1.0, rel=1e-3)
+    assert imu.get_rotation(0.25, 0.5) == pytest.approx(0.25, rel=1e-3)
+    assert imu.get_angular_velocity(0.5) == pytest.approx([0, 1, 0])
+
+
+def test_accelerometer_pulls_the_tilt_back_to_gravity():
+    imu = RealSenseImu(start=False)
+    imu._add_accel(0.0, np.array([0.0, -9.8, 0.0]))
+    tilted = np.array([0.0, -9.8 * np.cos(0.2), 9.8 * np.sin(0.2)])
+    for index in range(1, 2000):
+        if index % 2 == 0:
+            imu._add_accel(index / 400, tilted)
+        imu._add_gyro(index / 400, np.zeros(3))
+    expected = rotate_to_body(imu._quaternion, imu._gravity)
+    assert np.dot(expected, tilted / 9.8) == pytest.approx(1.0, abs=1e-4)
+
+
+def test_motion_blur_and_moving():
+    imu = synthetic_imu(rate=(0.0, 2.0, 0.0))
+    assert imu.motion_blur_px(0.5, exposure_s=0.01, focal_px=600) == pytest.approx(12.0, rel=1e-3)
+    assert imu.is_moving(0.5)
+    still = synthetic_imu(rate=(0.0, 0.0, 0.0))
+    assert still.motion_blur_px(0.5, 0.01, 600) == 0
+    assert not still.is_moving()
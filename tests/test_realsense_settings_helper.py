@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+import pytest
+
+rs = pytest.importorskip("pyrealsense2", exc_type=ImportError)
+pytest.importorskip("hi_robotics")
+
+from hi_robotics.vision_ai.exceptions import IntelRealSenseCameraException
+from RAIT.cameras.driver_helpers.realsense_settings_helper import CameraColorSensorSettings, RealSenseSettingsHelper
+
+OptionRange = namedtuple("OptionRange", ["min", "max", "step", "default"])
+
+RANGES = {
+    rs.option.exposure: OptionRange(1, 10000, 1, 156),
+    rs.option.gain: OptionRange(0, 128, 1, 64),
+    rs.option.white_balance: OptionRange(2800, 6500, 10, 4600),
+    rs.option.enable_auto_exposure: OptionRange(0, 1, 1, 1),
+    rs.option.enable_auto_white_balance: OptionRange(0, 1, 1, 1),
+}
+
+
+class FakeSensor:
+    """
+    Color sensor supporting the options in RANGES. Like the device, a manual exposure or white balance
+    turns the matching auto mode off.
+    """
+    def __init__(self, reject=None):
+        self.values = {option: option_range.default for option, option_range in RANGES.items()}
+        self.writes = []
+        self.range_reads = 0
+        self.reject = reject
+
+    def supports(self, option):
+        return option in RANGES
+
+    def get_option_range(self, option):
+        self.range_reads += 1
+        return RANGES[option]
+
+    def get_option(self, option):
+        return self.values[option]
+
+    def set_option(self, option, value):
+        if option == self.reject:
+            raise RuntimeError("hardware rejected the value")
+        self.writes.append((option, value))
+        self.values[option] = value
+        if option == rs.option.exposure:
+            self.values[rs.option.enable_auto_exposure] = 0
+        elif option == rs.option.white_balance:
+            self.values[rs.option.enable_auto_white_balance] = 0
+
+
+def make_helper(**kwargs):
+    sensor = FakeSensor(**kwargs)
+    return sensor, RealSenseSettingsHelper(sensor, CameraColorSensorSettings)
+
+
+def test_ranges_are_read_once():
+    sensor, helper = make_helper()
+    assert sensor.range_reads == len(RANGES)
+    helper.apply_profile({"EXPOSURE": 80, "gain": 16})
+    helper.validate_setting_value("WHITE_BALANCE", 4000)
+    helper.get_camera_setting_value("GAIN")
+    assert sensor.range_reads == len(RANGES)
+    assert helper.get_default_profile()["GAIN"] == 64
+
+
+def test_auto_switches_are_turned_off_first_and_on_last():
+    sensor, helper = make_helper()
+    report = helper.apply_profile({"ENABLE_AUTO_EXPOSURE": 1, "EXPOSURE": 80, "GAIN": 16,
+                                   "ENABLE_AUTO_WHITE_BALANCE": 0, "WHITE_BALANCE": 4000})
+    options = [option for option, _ in sensor.writes]
+    assert options[0] == rs.option.enable_auto_white_balance
+    assert options[-1] == rs.option.enable_auto_exposure
+    assert set(options[1:-1]) == {rs.option.exposure, rs.option.gain, rs.option.white_balance}
+    assert report["applied"] == 5
+    assert sensor.values[rs.option.enable_auto_exposure] == 1
+
+
+def test_auto_modes_are_re_read_after_applying():
+    sensor, helper = make_helper()
+    helper.apply_profile({"EXPOSURE": 80})
+    assert helper.option_values[rs.option.exposure] == 80
+    # The sensor switched auto exposure off by itself, the cache follows
+    assert helper.option_values[rs.option.enable_auto_exposure] == 0
+
+
+@pytest.mark.parametrize("profile", [{"EXPOSURE": 80, "GAIN": 500}, {"EXPOSURE": 80, "WHITE_BALANCE": 4005},
+                                     {"EXPOSURE": 80, "FOCUS": 1}])
+def test_invalid_profiles_write_nothing(profile):
+    sensor, helper = make_helper()
+    with pytest.raises(IntelRealSenseCameraException):
+        helper.apply_profile(profile)
+    assert sensor.writes == []
+
+
+def test_rejected_write_restores_the_written_settings():
+    sensor, helper = make_helper(reject=rs.option.gain)
+    with pytest.raises(IntelRealSenseCameraException, match="restored 1 settings"):
+        helper.apply_profile({"EXPOSURE": 80, "GAIN": 16})
+    assert sensor.values[rs.option.exposure] == RANGES[rs.option.exposure].default
+    assert helper.option_values[rs.option.exposure] == RANGES[rs.option.exposure].default
+
+
+def test_percentages_map_onto_the_range():
+    sensor, helper = make_helper()
+    helper.apply_profile({"GAIN": 50}, percentage=True)
+    assert sensor.values[rs.option.gain] == 64
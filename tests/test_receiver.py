@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pyrealsense2", exc_type=ImportError)
+
+from RAIT.cameras.recevier import CameraReceiver
+from fakes import FakeWebSocket, frame_message
+
+
+def make_receiver(**stream):
+    return CameraReceiver({"Stream": stream})
+
+
+def run(coroutine, timeout=5):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout))
+
+
+def test_undecodable_messages_return_an_empty_frame():
+    async def scenario():
+        receiver = make_receiver()
+        receiver.websocket = FakeWebSocket([b"RFRM broken", "not json", frame_message(3)])
+        results = [await receiver.decode_frames() for _ in range(3)]
+        return results, receiver.wire_format
+
+    results, wire_format = run(scenario())
+    assert tuple(results[0]) == (None, None)
+    assert tuple(results[1]) == (None, None)
+    assert results[2].sequence == 3
+    assert wire_format == "binary"
+
+
+@pytest.mark.parametrize("policy, expected", [("latest", [3]), ("fifo", [1, 2, 3])])
+def test_drain_policies(policy, expected):
+    async def scenario():
+        receiver = make_receiver(Drain=True, Drain_policy=policy, Ring_size=4)
+        receiver.websocket = FakeWebSocket([frame_message(1), frame_message(2), frame_message(3)], hang=True)
+        receiver.start_drain()
+        while receiver.drain_stats["received"] < 3:
+            await asyncio.sleep(0)
+        sequences = [(await receiver.decode_frames()).sequence for _ in expected]
+        await receiver.stop_drain()
+        return sequences, receiver.drain_stats
+
+    sequences, stats = run(scenario())
+    assert sequences == expected
+    assert stats["consumed"] == len(expected)
+    assert stats["dropped"] == 3 - len(expected)
+
+
+def test_drain_failure_propagates_instead_of_spinning():
+    async def scenario():
+        receiver = make_receiver(Drain=True)
+        receiver.websocket = FakeWebSocket([frame_message(1)], error=RuntimeError("socket broke"))
+        receiver.start_drain()
+        received = []
+        with pytest.raises(RuntimeError, match="socket broke"):
+            async for frame in receiver.frames():
+                received.append(frame.sequence)
+        assert not await receiver.ensure_draining()
+        return received
+
+    assert run(scenario()) == [1]
+
+
+def test_closed_drain_ends_frames_without_reconnect():
+    async def scenario():
+        receiver = make_receiver(Drain=True)
+        socket = FakeWebSocket([frame_message(1), frame_message(2)])
+        receiver.websocket = socket
+        receiver.start_drain()
+        sequences = [frame.sequence async for frame in receiver.frames()]
+        return sequences, socket.closed, receiver.websocket
+
+    sequences, closed, websocket = run(scenario())
+    assert sequences[-1] == 2
+    assert closed and websocket is None
+
+
+def test_executor_is_created_on_first_decode_and_shut_down_by_cleanup():
+    async def scenario():
+        receiver = make_receiver(Decode_executor="thread")
+        assert receiver.executor is None
+        receiver.websocket = FakeWebSocket([frame_message(1)])
+        frame = await receiver.decode_frames()
+        executor = receiver.executor
+        assert executor is not None
+        await receiver.cleanup()
+        return frame, executor, receiver.executor
+
+    frame, executor, after_cleanup = run(scenario())
+    assert frame.sequence == 1
+    assert executor._shutdown
+    assert after_cleanup is None
+
+
+def test_pipelined_frames_keep_arrival_order():
+    async def scenario():
+        receiver = make_receiver(Decode_executor="thread", Pipeline_depth=3)
+        messages = [frame_message(1), frame_message(2), "not json", frame_message(4), frame_message(5)]
+        receiver.websocket = FakeWebSocket(messages)
+        frames = [frame async for frame in receiver.frames()]
+        return frames, receiver.executor
+
+    frames, executor = run(scenario())
+    assert [getattr(frame, "sequence", None) for frame in frames] == [1, 2, None, 4, 5]
+    assert executor is None
+
+
+def test_frames_reconnects_after_a_closed_connection():
+    async def scenario():
+        receiver = make_receiver(Reconnect=True, Reconnect_initial_delay=0.01, Resume_window=0.2)
+        receiver.websocket = FakeWebSocket([frame_message(1), frame_message(2)])
+        # The first attempt fails, the second gets a new socket, after that the server stays down
+        sockets = [None, FakeWebSocket([frame_message(3), frame_message(4)])]
+
+        async def connect():
+            receiver.websocket = sockets.pop(0) if sockets else None
+
+        receiver.connect = connect
+        sequences = [frame.sequence async for frame in receiver.frames()]
+        return sequences, receiver.connection_stats
+
+    sequences, stats = run(scenario())
+    assert sequences == [1, 2, 3, 4]
+    assert stats["reconnects"] == 1
+    assert stats["failed_attempts"] >= 2
+    assert stats["last_outage_s"] is not None
+
+
+def test_frames_ends_on_close_without_reconnect():
+    async def scenario():
+        receiver = make_receiver()
+        receiver.websocket = FakeWebSocket([frame_message(1)])
+        return [frame.sequence async for frame in receiver.frames()], receiver.connection_stats["reconnects"]
+
+    assert run(scenario()) == ([1], 0)
@@ -0,0 +1,78 @@
+import json
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from RAIT.cameras.replay_camera import ReplayCamera
+
+
+def record_sample(path, numbers, timestamps=None, depth=True):
+    """
+    Writes a sample the way VideoRecorder does: one png (and npy) per frame number, and optionally
+    frame_timestamps.json with an entry for every logged index.
+    """
+    (path / "rgb").mkdir(parents=True)
+    (path / "depth").mkdir()
+    for number in numbers:
+        cv2.imwrite(str(path / "rgb" / f"pouring_image_{number:03d}.png"), np.full((4, 6, 3), number % 256, np.uint8))
+        if depth:
+            np.save(path / "depth" / f"pouring_image_{number:03d}.npy", np.full((4, 6), number, np.uint16))
+    if timestamps is not None:
+        entries = [{"index": index, "sequence": index + 1, "timestamp": timestamp}
+                   for index, timestamp in enumerate(timestamps)]
+        (path / "frame_timestamps.json").write_text(json.dumps(entries))
+    return path
+
+
+def play(camera, count):
+    return [camera.capture_frame() for _ in range(count)]
+
+
+def test_timestamps_are_matched_by_frame_index(tmp_path):
+    # Frame 2 had no color image, so it has a log entry but no file
+    sample = record_sample(tmp_path / "sample", [0, 1, 3, 4], timestamps=[100.0, 100.1, 100.2, 100.5, 100.6])
+    camera = ReplayCamera(sample, open_pipeline=False)
+    assert camera.frame_numbers == [0, 1, 3, 4]
+    assert np.allclose(camera.frame_times, [0.0, 0.1, 0.5, 0.6])
+
+
+def test_gaps_keep_their_duration_without_timestamps(tmp_path):
+    camera = ReplayCamera(record_sample(tmp_path / "sample", [0, 1, 3]), fps=10, open_pipeline=False)
+    assert np.allclose(camera.frame_times, [0.0, 0.1, 0.3])
+
+
+def test_frames_are_ordered_by_number(tmp_path):
+    camera = ReplayCamera(record_sample(tmp_path / "sample", [999, 1000, 998], depth=False), open_pipeline=False)
+    assert camera.frame_numbers == [998, 999, 1000]
+    assert not camera.provides_depth
+
+
+def test_max_speed_playback_loops_and_seeks(tmp_path):
+    camera = ReplayCamera(record_sample(tmp_path / "sample", [0, 1, 2]), loop=True, max_speed=True)
+    try:
+        frames = play(camera, 5)
+        assert [frame.metadata["replay_index"] for frame in frames] == [0, 1, 2, 0, 1]
+        assert [int(frame.depth[0, 0]) for frame in frames] == [0, 1, 2, 0, 1]
+        assert [frame.sequence for frame in frames] == [1, 2, 3, 4, 5]
+        assert camera.get_stats()["loops"] == 1
+
+        camera.seek(-1)
+        assert camera.capture_frame().metadata["replay_index"] == 2
+    finally:
+        camera.release_camera()
+
+
+def test_playback_follows_the_recorded_timing(tmp_path):
+    sample = record_sample(tmp_path / "sample", [0, 1, 3], timestamps=[10.0, 10.05, 10.1, 10.3])
+    camera = ReplayCamera(sample, speed=2.0)
+    try:
+        start = time.monotonic()
+        frames = play(camera, 3)
+        elapsed = time.monotonic() - start
+        assert camera.capture_frame() is None
+    finally:
+        camera.release_camera()
+    assert [frame.metadata["recorded_offset_s"] for frame in frames] == pytest.approx([0.0, 0.05, 0.3])
+    assert 0.13 <= elapsed < 0.5
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+from RAIT.cameras.shared_frame_bus import SharedFrameBus
+
+
+@pytest.fixture
+def bus():
+    bus = SharedFrameBus.create(f"rait-test-bus-{os.getpid()}", (4, 6, 3), (4, 6), slots=3)
+    yield bus
+    bus.close()
+
+
+def frame(value):
+    return np.full((4, 6, 3), value, np.uint8), np.full((4, 6), value * 10, np.uint16)
+
+
+def test_readers_see_completed_writes(bus):
+    reader = SharedFrameBus.attach(bus.shm.name)
+    try:
+        assert reader.latest() is None
+        color, depth = frame(1)
+        sequence = bus.write(color, depth, timestamp=12.5)
+
+        latest = reader.latest()
+        assert (latest.sequence, latest.timestamp) == (sequence, 12.5)
+        assert np.array_equal(latest.color, color)
+        assert np.array_equal(latest.depth, depth)
+        assert (reader.color_shape, reader.depth_shape, reader.slots) == ((4, 6, 3), (4, 6), 3)
+        del latest
+    finally:
+        reader.close()
+
+
+def test_overwritten_slots_are_detected(bus):
+    sequences = [bus.write(*frame(value)) for value in range(1, 5)]
+    assert bus.latest_sequence == sequences[-1] == 4
+    # Three slots: frame 1 shares a slot with frame 4 and is gone, frames 2 and 3 are still readable
+    assert bus.get(1) is None
+    assert not bus.is_current(1)
+    assert bus.get(2).color[0, 0, 0] == 2
+    assert bus.is_current(3)
+
+    view = bus.get(2)
+    for value in range(5, 8):
+        bus.write(*frame(value))
+    assert not bus.is_current(view.sequence)
+
+
+def test_a_slot_being_written_is_not_returned(bus):
+    bus.write(*frame(1))
+    bus._slot_table["sequence"][1] = 0  # What readers see while the writer copies frame 1 again
+    assert bus.get(1) is None
+    assert bus.latest() is None
+
+
+def test_wait_for_next(bus):
+    assert bus.wait_for_next(0, timeout=0.01) is None
+    bus.write(*frame(1))
+    assert bus.wait_for_next(0, timeout=0.01).sequence == 1
+    assert bus.wait_for_next(1, timeout=0.01) is None
+
+
+def test_matches(bus):
+    color, depth = frame(1)
+    assert bus.matches(color, depth)
+    assert not bus.matches(color, None)
+    assert not bus.matches(color[:2], depth)
+    assert not bus.matches(color.astype(np.uint16), depth)
+    assert not bus.matches(color, depth.astype(np.float32))
+
+    rgb = SharedFrameBus.create(f"rait-test-rgb-{os.getpid()}", (4, 6))
+    try:
+        assert rgb.matches(np.zeros((4, 6), np.uint8))
+        assert rgb.matches(np.zeros((4, 6, 1), np.uint8))
+        assert not rgb.matches(np.zeros((4, 6), np.uint8), np.zeros((4, 6), np.uint16))
+    finally:
+        rgb.close()
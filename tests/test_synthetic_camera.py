@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import pytest
+
+from RAIT.cameras.frame import Frame
+from RAIT.cameras.synthetic_camera import SyntheticCamera, benchmark_publisher
+
+
+def test_frames_cycle_through_the_pool():
+    camera = SyntheticCamera(32, 24, fps=0, pool_size=4)
+    frames = [camera.capture_frame() for _ in range(5)]
+    assert all(isinstance(frame, Frame) for frame in frames)
+    assert [frame.metadata["pool_index"] for frame in frames] == [0, 1, 2, 3, 0]
+    assert [frame.sequence for frame in frames] == [1, 2, 3, 4, 5]
+    assert frames[0].color.shape == (24, 32, 3) and frames[0].depth.shape == (24, 32)
+    assert np.shares_memory(frames[0].color, frames[4].color)
+    assert not frames[0].color.flags.writeable
+
+
+def test_rendering_is_seeded():
+    first = SyntheticCamera(32, 24, fps=0, pool_size=2, seed=7)
+    second = SyntheticCamera(32, 24, fps=0, pool_size=2, seed=7)
+    other = SyntheticCamera(32, 24, fps=0, pool_size=2, seed=8)
+    assert np.array_equal(first.color_pool, second.color_pool)
+    assert np.array_equal(first.depth_pool, second.depth_pool)
+    assert not np.array_equal(first.color_pool, other.color_pool)
+
+
+def test_depth_has_stereo_holes():
+    depth = SyntheticCamera(64, 48, fps=0, pool_size=1).depth_pool[0]
+    assert (depth[:, :64 // 16] == 0).all()
+    assert depth[:, 64 // 16:].any()
+
+
+@pytest.mark.parametrize("color_dtype, depth_dtype", [(np.uint16, np.uint16), (np.float32, np.float32)])
+def test_pool_dtypes(color_dtype, depth_dtype):
+    camera = SyntheticCamera(16, 12, fps=0, pool_size=1, color_dtype=color_dtype, depth_dtype=depth_dtype)
+    frame = camera.capture_frame()
+    assert (frame.color.dtype, frame.depth.dtype) == (np.dtype(color_dtype), np.dtype(depth_dtype))
+    if np.issubdtype(color_dtype, np.floating):
+        assert 0 <= frame.color.min() and frame.color.max() <= 1
+
+
+def test_color_only_camera_returns_arrays():
+    color = SyntheticCamera(16, 12, fps=0, pool_size=1, provides_depth=False).capture_frame()
+    assert isinstance(color, np.ndarray) and color.shape == (12, 16, 3)
+
+
+def test_capture_is_paced_to_fps():
+    camera = SyntheticCamera(16, 12, fps=100, pool_size=1)
+    start = time.monotonic()
+    for _ in range(11):
+        camera.capture_frame()
+    assert time.monotonic() - start >= 0.09
+    assert camera.stats["frames"] == 11
+
+
+def test_benchmark_stops_the_publisher(monkeypatch):
+    pytest.importorskip("hi_robotics")
+    from RAIT.cameras.camera_publisher import CameraPublisher
+
+    stopped = []
+    stop_publisher = CameraPublisher.stop_publisher
+    monkeypatch.setattr(CameraPublisher, "stop_publisher",
+                        lambda publisher: (stopped.append(publisher), stop_publisher(publisher)))
+
+    camera = SyntheticCamera(32, 24, fps=200, pool_size=2)
+    result = benchmark_publisher(camera, seconds=0.2, subscribers=2)
+    assert result["target_fps"] == 200
+    assert result["achieved_fps"] > 0
+    assert len(result["subscribers"]) == 2
+
+    publisher, = stopped
+    assert not publisher.opened_publisher
+    assert not publisher.publisher_thread.is_alive()
+    assert all(subscriber.worker is None for subscriber in publisher.subscribers)